@@ -0,0 +1,100 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Shared fixtures for tests and benchmarks. Runs headless, without Blender:
+the add-on is imported against the bpy stand-in from fake_bpy.py.
+
+"""
+import os
+import sys
+import pytest
+
+# Make the add-on importable when running pytest from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+fake_bpy.install()
+
+import unitypackage_importer
+from unitypackage_generator import generate_unitypackage
+
+
+@pytest.fixture(scope='session', autouse=True)
+def index_cache_dir(tmp_path_factory):
+    """
+    Keeps the index cache of all tests in a temporary directory.
+
+    """
+    cache_dir = tmp_path_factory.mktemp('index_cache')
+    previous = os.environ.get('UNITYPACKAGE_IMPORTER_CACHE_DIR')
+    os.environ['UNITYPACKAGE_IMPORTER_CACHE_DIR'] = str(cache_dir)
+    yield str(cache_dir)
+    if previous is None:
+        del os.environ['UNITYPACKAGE_IMPORTER_CACHE_DIR']
+    else:
+        os.environ['UNITYPACKAGE_IMPORTER_CACHE_DIR'] = previous
+
+
+@pytest.fixture(scope='session', autouse=True)
+def registered_addon():
+    """
+    Registers the add-on with the bpy stand-in, which adds its properties to the window manager.
+
+    """
+    unitypackage_importer.register()
+    yield
+    unitypackage_importer.unregister()
+
+
+@pytest.fixture
+def context():
+    """
+    Fresh bpy.context with empty import lists.
+
+    """
+    return fake_bpy.new_context()
+
+
+@pytest.fixture(scope='session')
+def small_package(tmp_path_factory):
+    """
+    Compressed package with 2000 entries. Returns (filepath, { guid: pathname }).
+
+    """
+    filepath = str(tmp_path_factory.mktemp('packages') / 'small.unitypackage')
+    return filepath, generate_unitypackage(filepath, entry_count=2000, max_size=64 * 1024, seed=1)
+
+
+@pytest.fixture(scope='session')
+def large_package(tmp_path_factory):
+    """
+    Compressed package with 20000 mostly small entries. Returns (filepath, { guid: pathname }).
+
+    """
+    filepath = str(tmp_path_factory.mktemp('packages') / 'large.unitypackage')
+    return filepath, generate_unitypackage(filepath, entry_count=20000, max_size=16 * 1024, compression_level=1, seed=2)
+
+
+@pytest.fixture(scope='session')
+def uncompressed_package(tmp_path_factory):
+    """
+    Uncompressed package with 500 entries. Returns (filepath, { guid: pathname }).
+
+    """
+    filepath = str(tmp_path_factory.mktemp('packages') / 'uncompressed.unitypackage')
+    return filepath, generate_unitypackage(filepath, entry_count=500, compression_level=0, seed=3)
@@ -0,0 +1,428 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Minimal stand-in for Blender's bpy module, so the add-on's operators and import preparation can run headless.
+Only implements what the add-on uses outside of actually creating datablocks: property definitions
+(including update callbacks), collection properties, the window manager (including modal handlers and event timers, which are never fired on their own) and a few registration functions.
+Images are the exception, they're just names with custom properties and packed data, so the texture import can run.
+Other datablock collections (objects, meshes, ...) stay empty, since there are no importers to fill them.
+Previews (bpy.utils.previews) and timers (bpy.app.timers) only hold on to what they're given, run_timers calls due timers.
+
+"""
+import os
+import sys
+import time
+import types
+import tempfile
+
+
+class _Property():
+    """
+    Property definition as returned by the functions in bpy.props.
+
+    """
+    def __init__(self, default=None, update=None, type=None, items=None, **kwargs):
+        self.default = default
+        self.update = update
+        self.type = type
+        self.items = items
+
+
+class _PropertyDescriptor():
+    """
+    Attribute for a property definition on a struct class, calls the update callback on every assignment like Blender does.
+
+    """
+    def __init__(self, name : str, prop : _Property):
+        self.name = name
+        self.prop = prop
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.name not in obj.__dict__:
+            obj.__dict__[self.name] = bpy_prop_collection(self.prop.type) if self.prop.type else self.prop.default
+        return obj.__dict__[self.name]
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+        if self.prop.update:
+            self.prop.update(obj, bpy.context)
+
+
+class _StructMeta(type):
+    """
+    Turns property definitions into descriptors, both for annotations in the class body
+    and for properties added to the class afterwards (like bpy.types.WindowManager.some_list = CollectionProperty(...)).
+
+    """
+    def __init__(cls, name, bases, namespace):
+        super().__init__(name, bases, namespace)
+        for attribute, annotation in namespace.get('__annotations__', {}).items():
+            if isinstance(annotation, _Property):
+                type.__setattr__(cls, attribute, _PropertyDescriptor(attribute, annotation))
+
+    def __setattr__(cls, attribute, value):
+        if isinstance(value, _Property):
+            value = _PropertyDescriptor(attribute, value)
+        type.__setattr__(cls, attribute, value)
+
+
+class bpy_struct(metaclass=_StructMeta):
+    pass
+
+
+class bpy_prop_collection():
+    """
+    Stand-in for bpy_prop_collection, the value of a CollectionProperty.
+
+    """
+    def __init__(self, item_type):
+        self._item_type = item_type
+        self._items = []
+
+    def add(self):
+        item = self._item_type()
+        self._items.append(item)
+        return item
+
+    def remove(self, index : int):
+        del self._items[index]
+
+    def move(self, from_index : int, to_index : int):
+        self._items.insert(to_index, self._items.pop(from_index))
+
+    def clear(self):
+        self._items.clear()
+
+    def foreach_get(self, attribute : str, sequence):
+        for index, item in enumerate(self._items):
+            sequence[index] = getattr(item, attribute)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class PropertyGroup(bpy_struct):
+    pass
+
+
+class Operator(bpy_struct):
+    def report(self, type, message):
+        pass
+
+
+class Panel(bpy_struct):
+    pass
+
+
+class UIList(bpy_struct):
+    bitflag_filter_item = 1 << 30
+    filter_name = ''
+    use_filter_invert = False
+
+
+class Menu(bpy_struct):
+    _draw_functions = []
+
+    @classmethod
+    def append(cls, draw_function):
+        cls._draw_functions.append(draw_function)
+
+    @classmethod
+    def remove(cls, draw_function):
+        cls._draw_functions.remove(draw_function)
+
+
+class WindowManager(bpy_struct):
+    windows = []
+
+    def progress_begin(self, min, max):
+        pass
+
+    def progress_update(self, value):
+        pass
+
+    def progress_end(self):
+        pass
+
+    def event_timer_add(self, time_step : float, window=None):
+        return types.SimpleNamespace(time_step=time_step)
+
+    def event_timer_remove(self, timer):
+        pass
+
+    def modal_handler_add(self, operator):
+        self.modal_handlers.append(operator)
+
+
+class ID(bpy_struct):
+    remapped_to = None
+
+    def user_remap(self, new_id):
+        # Only the users registered with add_user are updated, remember where the others would've gone
+        self.remapped_to = new_id
+        for reference in bpy.data.user_references:
+            if reference.id is self:
+                reference.id = new_id
+
+
+class UserReference():
+    """
+    Stand-in for something using a datablock (a material's image node, an object's data), which ID.user_remap updates.
+
+    """
+    def __init__(self, id : ID):
+        self.id = id
+
+
+def add_user(datablock : ID) -> UserReference:
+    reference = UserReference(datablock)
+    bpy.data.user_references.append(reference)
+    return reference
+
+
+class Object(ID):
+    pass
+
+
+class Image(ID):
+    """
+    Stand-in for an image datablock. Supports custom properties like Blender's ID types do.
+
+    """
+    def __init__(self, name : str):
+        self.name = name
+        self.source = 'GENERATED'
+        self.filepath_raw = ''
+        self.packed_data = None
+        self.size = (0, 0)
+        self.colorspace_settings = types.SimpleNamespace(name='sRGB')
+        self.alpha_mode = 'STRAIGHT'
+        self.use_generated_float = False
+        self._properties = {}
+
+    def pack(self, data : bytes = None, data_len : int = 0):
+        if data is not None:
+            self.packed_data = data
+            self.size = (8, 8)
+        else:
+            # Without data Blender packs the file the image was loaded from
+            with open(self.filepath_raw, 'rb') as f:
+                self.packed_data = f.read()
+
+    def get(self, key : str, default=None):
+        return self._properties.get(key, default)
+
+    def __getitem__(self, key : str):
+        return self._properties[key]
+
+    def __setitem__(self, key : str, value):
+        self._properties[key] = value
+
+
+class BlendDataImages():
+    """
+    Stand-in for bpy.data.images. Names are made unique like Blender does (tex, tex.001, ...).
+
+    """
+    def __init__(self):
+        self._images = []
+        self.load_count = 0
+
+    def new(self, name : str, width : int, height : int, float_buffer : bool = False) -> Image:
+        names = { image.name for image in self._images }
+        unique_name = name
+        number = 0
+        while unique_name in names:
+            number += 1
+            unique_name = f"{name}.{number:03}"
+        image = Image(unique_name)
+        image.use_generated_float = float_buffer
+        self._images.append(image)
+        return image
+
+    def load(self, filepath : str) -> Image:
+        image = self.new(os.path.basename(filepath), 0, 0)
+        image.source = 'FILE'
+        image.filepath_raw = filepath
+        image.size = (8, 8)
+        self.load_count += 1
+        return image
+
+    def remove(self, image : Image):
+        self._images.remove(image)
+
+    def __len__(self):
+        return len(self._images)
+
+    def __iter__(self):
+        return iter(list(self._images))
+
+
+class ImagePreview():
+    _next_icon_id = 1
+
+    def __init__(self):
+        self.icon_id = ImagePreview._next_icon_id
+        ImagePreview._next_icon_id += 1
+        self.image_size = (0, 0)
+        self.image_pixels_float = []
+        self.filepath = None
+
+
+class ImagePreviewCollection(dict):
+    """
+    Stand-in for the collections of bpy.utils.previews.
+
+    """
+    def new(self, name : str) -> ImagePreview:
+        if name in self:
+            raise KeyError(f"Key '{name}' already exists")
+        preview = self[name] = ImagePreview()
+        return preview
+
+    def load(self, name : str, filepath : str, filetype : str) -> ImagePreview:
+        # Blender reads the file once the preview is drawn, make sure it's there now
+        assert os.path.isfile(filepath) and filetype == 'IMAGE'
+        preview = self.new(name)
+        preview.filepath = filepath
+        return preview
+
+    def close(self):
+        self.clear()
+
+
+_timers = {} # { function: due time }
+
+def _register_timer(function, first_interval : float = 0, persistent : bool = False):
+    _timers[function] = time.monotonic() + first_interval
+
+def _unregister_timer(function):
+    del _timers[function]
+
+
+def run_timers():
+    """
+    Calls all registered timer functions (whether they're due or not), like Blender's event loop would.
+    Functions returning None are unregistered, others are called again on the next run.
+
+    """
+    for function in list(_timers):
+        if function not in _timers:
+            continue
+        interval = function()
+        if interval is None:
+            del _timers[function]
+        else:
+            _timers[function] = time.monotonic() + interval
+
+
+def _new_blend_data() -> types.SimpleNamespace:
+    data = types.SimpleNamespace(images=BlendDataImages(), objects=[], meshes=[], materials=[], armatures=[], actions=[], user_references=[])
+    data.batch_remove = lambda ids: [ data.images.remove(datablock) for datablock in ids ]
+    return data
+
+
+class Workspace():
+    status_text = None
+
+    def status_text_set(self, text):
+        self.status_text = text
+
+
+class Context():
+    def __init__(self):
+        self.window_manager = WindowManager()
+        self.window_manager.modal_handlers = []
+        self.window = None
+        self.workspace = Workspace()
+
+
+def _make_property_function(default):
+    def property_function(**kwargs):
+        kwargs.setdefault('default', default)
+        return _Property(**kwargs)
+    return property_function
+
+
+bpy = types.ModuleType('bpy')
+bpy.props = types.ModuleType('bpy.props')
+bpy.props.BoolProperty = _make_property_function(False)
+bpy.props.IntProperty = _make_property_function(0)
+bpy.props.FloatProperty = _make_property_function(0.0)
+bpy.props.StringProperty = _make_property_function('')
+bpy.props.EnumProperty = _make_property_function('')
+bpy.props.CollectionProperty = lambda type, **kwargs: _Property(type=type, **kwargs)
+bpy.types = types.ModuleType('bpy.types')
+bpy.types.bpy_struct = bpy_struct
+bpy.types.PropertyGroup = PropertyGroup
+bpy.types.Operator = Operator
+bpy.types.Panel = Panel
+bpy.types.UIList = UIList
+bpy.types.WindowManager = WindowManager
+bpy.types.TOPBAR_MT_file_import = Menu
+bpy.types.ID = ID
+bpy.types.Object = Object
+bpy.types.Image = Image
+bpy.utils = types.ModuleType('bpy.utils')
+bpy.utils.register_class = lambda cls: None
+bpy.utils.unregister_class = lambda cls: None
+bpy.utils.previews = types.ModuleType('bpy.utils.previews')
+bpy.utils.previews.new = ImagePreviewCollection
+bpy.utils.previews.remove = lambda collection: collection.close()
+bpy.app = types.SimpleNamespace(tempdir=tempfile.mkdtemp(prefix='fake_bpy_'), version=(3, 6, 0))
+bpy.app.timers = types.SimpleNamespace(register=_register_timer, unregister=_unregister_timer, is_registered=lambda function: function in _timers)
+bpy.data = _new_blend_data()
+bpy.context = Context()
+
+bpy_extras = types.ModuleType('bpy_extras')
+bpy_extras.io_utils = types.ModuleType('bpy_extras.io_utils')
+bpy_extras.io_utils.ImportHelper = type('ImportHelper', (), {})
+
+
+def install():
+    """
+    Registers the stand-in as 'bpy' (and 'bpy_extras'), has to happen before the add-on is imported.
+    Returns the fake bpy module.
+
+    """
+    sys.modules['bpy'] = bpy
+    sys.modules['bpy.props'] = bpy.props
+    sys.modules['bpy.types'] = bpy.types
+    sys.modules['bpy.utils'] = bpy.utils
+    sys.modules['bpy.utils.previews'] = bpy.utils.previews
+    sys.modules['bpy_extras'] = bpy_extras
+    sys.modules['bpy_extras.io_utils'] = bpy_extras.io_utils
+    return bpy
+
+
+def new_context() -> Context:
+    """
+    Replaces bpy.context with a fresh one (with an empty window manager) and bpy.data with an empty one,
+    and returns the context.
+
+    """
+    bpy.data = _new_blend_data()
+    bpy.context = Context()
+    return bpy.context
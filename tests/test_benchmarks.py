@@ -0,0 +1,309 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Benchmarks, run with 'pytest tests/test_benchmarks.py' (requires pytest-benchmark).
+Use --benchmark-save / --benchmark-compare to compare changes against each other.
+
+"""
+import time
+import random
+import itertools
+import tarfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from unitypackage_importer.config import texture_file_extensions, model_file_extensions, unity_yaml_file_extensions
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser, AssetIndex
+from unitypackage_importer.modules.pipeline import AssetPrefetcher
+from unitypackage_importer.modules.content_hash import hash_bytes
+from unitypackage_importer.modules.unity_yaml import UnityYamlFile, get_prefab_instances
+from unitypackage_importer.modules.dependency_graph import DependencyGraph, build_dependency_graph, _scan_references
+from unitypackage_importer.importing import prepare_direct_import
+from unitypackage_importer.operators import init_import_list_hierarchy, update_import_list
+from unitypackage_generator import generate_unity_yaml
+
+pytest.importorskip('pytest_benchmark')
+
+
+def test_open_and_index(benchmark, large_package):
+    filepath, _ = large_package
+
+    def open_and_index():
+        UnitypackageParser(filepath, use_index_cache=False).close()
+
+    benchmark.pedantic(open_and_index, rounds=3, iterations=1)
+
+
+def test_open_from_index_cache(benchmark, large_package):
+    filepath, _ = large_package
+    UnitypackageParser(filepath).close() # Populate cache
+
+    def open_from_cache():
+        UnitypackageParser(filepath).close()
+
+    benchmark(open_from_cache)
+
+
+class _DictAssetEntry():
+    """
+    Asset entry the way the parser used to store them before the columnar AssetIndex:
+    an object per entry with a dictionary of values, archive members as TarInfo objects.
+
+    """
+    def __init__(self):
+        self._data = {}
+
+
+def _build_dict_index(records : list) -> dict:
+    asset_entries = {}
+    for guid, pathname, asset_offset, asset_size, meta_offset, meta_size in records:
+        asset_entry = asset_entries[guid] = _DictAssetEntry()
+        asset_entry._data['guid'] = guid
+        asset_entry._data['pathname'] = pathname
+        for key, name, offset, size in (('asset', 'asset', asset_offset, asset_size), ('asset.meta', 'asset.meta', meta_offset, meta_size)):
+            tarinfo = tarfile.TarInfo(f"{guid}/{name}")
+            tarinfo.offset_data, tarinfo.size = offset, size
+            asset_entry._data[key] = tarinfo
+    return asset_entries
+
+
+def _build_columnar_index(records : list) -> AssetIndex:
+    index = AssetIndex()
+    for record in records:
+        index.append(*record)
+    index.build_lookup_indexes()
+    return index
+
+
+def _measure_retained_memory(function, *args) -> int:
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+@pytest.fixture(scope='module')
+def index_records():
+    rnd = random.Random(0)
+    records = []
+    for index in range(80000):
+        pathname = f"Assets/Folder{index % 97}/Sub{index % 13}/Asset_{index}{rnd.choice(['.png', '.fbx', '.mat', '.prefab'])}"
+        records.append(('%032x' % rnd.getrandbits(128), pathname, index * 4096, 2048, index * 4096 + 2560, 300))
+    return records
+
+
+@pytest.mark.parametrize('build_index', [ _build_dict_index, _build_columnar_index ], ids=[ 'dict_of_objects', 'columnar' ])
+def test_index_memory(benchmark, index_records, build_index):
+    benchmark.pedantic(build_index, args=(index_records,), rounds=3, iterations=1)
+    retained = _measure_retained_memory(build_index, index_records)
+    benchmark.extra_info['retained_bytes'] = retained
+    benchmark.extra_info['bytes_per_entry'] = retained / len(index_records)
+
+
+def test_columnar_index_is_smaller(index_records):
+    assert _measure_retained_memory(_build_columnar_index, index_records) * 3 < _measure_retained_memory(_build_dict_index, index_records)
+
+
+@pytest.fixture(scope='module')
+def large_parser(large_package):
+    filepath, _ = large_package
+    parser = UnitypackageParser(filepath)
+    yield parser
+    parser.close()
+
+
+def test_query_by_extension(benchmark, large_parser):
+    result = benchmark(lambda: list(large_parser.get_asset_entries_by_extension(texture_file_extensions + model_file_extensions)))
+    assert result
+
+
+def test_query_by_prefix(benchmark, large_parser):
+    result = benchmark(lambda: list(large_parser.query_asset_entries(prefix='Assets/Folder3/')))
+    assert result
+
+
+def test_prepare_direct_import(benchmark, context, large_parser):
+    def prepare():
+        prepare_direct_import(context, large_parser)
+        init_import_list_hierarchy(context)
+        update_import_list(None, context)
+
+    benchmark.pedantic(prepare, rounds=3, iterations=1)
+    assert len(context.window_manager.unitypackage_importer_import_display_list) > 0
+
+
+@pytest.fixture
+def prepared_context(context, large_parser):
+    prepare_direct_import(context, large_parser)
+    init_import_list_hierarchy(context)
+    update_import_list(None, context)
+    return context
+
+
+def test_update_import_list_full(benchmark, prepared_context):
+    benchmark(update_import_list, None, prepared_context)
+
+
+def test_update_import_list_toggle_folder(benchmark, prepared_context):
+    import_list = prepared_context.window_manager.unitypackage_importer_import_list
+    folder = next(item for item in import_list if item.indentation == 1 and item.subtree_end > item.index + 1)
+
+    def toggle():
+        folder.is_expanded = not folder.is_expanded
+
+    benchmark(toggle)
+
+
+def test_extract_all_in_archive_order(benchmark, large_parser):
+    guids = [ asset_entry.guid for asset_entry in large_parser.get_asset_entries() ]
+
+    def extract():
+        return sum(len(data) for _, data in large_parser.iter_assets(guids))
+
+    total_bytes = benchmark.pedantic(extract, rounds=3, iterations=1)
+    benchmark.extra_info['bytes_extracted'] = total_bytes # Divide by the mean time for throughput
+
+
+def test_extract_random_access(benchmark, large_parser):
+    guids = [ asset_entry.guid for asset_entry in large_parser.get_asset_entries() ]
+    sample = random.Random(0).sample(guids, 200)
+
+    def extract():
+        return sum(len(large_parser.get_asset_entry_by_guid(guid).read_value('asset')) for guid in sample)
+
+    benchmark.pedantic(extract, rounds=3, iterations=1)
+
+
+# Stand-in for the time Blender spends creating datablocks for an asset on the main thread
+_IMPORT_WORK_SECONDS = 0.0002
+
+
+@pytest.mark.parametrize('prefetch', [ False, True ], ids=[ 'serial', 'prefetched' ])
+def test_extract_while_importing(benchmark, large_package, prefetch):
+    filepath, _ = large_package
+    with UnitypackageParser(filepath) as parser:
+        guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension(texture_file_extensions + model_file_extensions) ]
+    
+    def serial():
+        with UnitypackageParser(filepath) as parser:
+            for _, data in parser.iter_assets(guids):
+                hash_bytes(data)
+                time.sleep(_IMPORT_WORK_SECONDS)
+
+    def prefetched():
+        with UnitypackageParser(filepath) as parser, AssetPrefetcher(parser, guids, 16 * 1024 * 1024, hash_contents=True) as prefetcher:
+            for _ in prefetcher:
+                time.sleep(_IMPORT_WORK_SECONDS)
+
+    benchmark.pedantic(prefetched if prefetch else serial, rounds=3, iterations=1)
+    benchmark.extra_info['asset_count'] = len(guids)
+
+
+def _scan_chunk(chunk : list) -> list:
+    return [ (guid, _scan_references(data)) for guid, data in chunk ]
+
+
+def _build_dependency_graph_process_pool(parser : UnitypackageParser) -> DependencyGraph:
+    """
+    How build_dependency_graph used to work: Extracting on this process, scanning 4 MiB chunks of data in worker processes.
+
+    """
+    chunks = [[]]
+    chunk_size = 0
+    guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension(unity_yaml_file_extensions) ]
+    model_guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension(model_file_extensions) if asset_entry.has_keys('asset_meta') ]
+    for asset_entry, data in itertools.chain(parser.iter_assets(guids), parser.iter_assets(model_guids, 'asset_meta')):
+        chunks[-1].append((asset_entry.guid, data))
+        chunk_size += len(data)
+        if chunk_size >= 4 * 1024 * 1024:
+            chunks.append([])
+            chunk_size = 0
+    
+    edges = []
+    with ProcessPoolExecutor() as executor:
+        for results in executor.map(_scan_chunk, chunks):
+            for guid, references in results:
+                row = parser._index.find_row(guid)
+                for reference in references:
+                    try:
+                        target = parser._index.find_row(reference)
+                    except KeyError:
+                        continue
+                    if target != row:
+                        edges.append((row, target))
+    return DependencyGraph(parser, edges)
+
+
+@pytest.mark.parametrize('build_graph', [ _build_dependency_graph_process_pool, build_dependency_graph ], ids=[ 'process_pool', 'in_process' ])
+def test_build_dependency_graph(benchmark, large_package, build_graph):
+    filepath, _ = large_package
+    
+    def build():
+        with UnitypackageParser(filepath) as parser:
+            return build_graph(parser).edge_count
+
+    edge_count = benchmark.pedantic(build, rounds=3, iterations=1)
+    with UnitypackageParser(filepath) as parser:
+        assert edge_count == build_dependency_graph(parser).edge_count > 0
+
+
+@pytest.fixture(scope='module')
+def large_scene():
+    return generate_unity_yaml(random.Random(0), '.unity', 'Scene', 8 * 1024 * 1024, {})
+
+
+def test_scan_unity_yaml(benchmark, large_scene):
+    result = benchmark.pedantic(lambda: len(UnityYamlFile(large_scene).documents), rounds=5, iterations=1)
+    assert result
+
+
+@pytest.fixture(scope='module')
+def medium_scene_file(tmp_path_factory):
+    """
+    Scene small enough for unityparser to load in reasonable time. Returns its file path.
+
+    """
+    filepath = tmp_path_factory.mktemp('yaml') / 'Scene.unity'
+    filepath.write_bytes(generate_unity_yaml(random.Random(0), '.unity', 'Scene', 512 * 1024, {}))
+    return str(filepath)
+
+
+def _read_names_unityparser(filepath : str) -> list:
+    UnityDocument = pytest.importorskip('unityparser').UnityDocument
+    return [ getattr(entry, 'm_Name', None) for entry in UnityDocument.load_yaml(filepath).entries ]
+
+
+def _read_names_unity_yaml(filepath : str) -> list:
+    with open(filepath, 'rb') as f:
+        yaml_file = UnityYamlFile(f.read())
+    return [ yaml_file.get_field(document, 'm_Name', None) for document in yaml_file.documents ]
+
+
+@pytest.mark.parametrize('read_names', [ _read_names_unityparser, _read_names_unity_yaml ], ids=[ 'unityparser', 'unity_yaml' ])
+def test_read_scene_names(benchmark, medium_scene_file, read_names):
+    names = benchmark.pedantic(read_names, args=(medium_scene_file,), rounds=3, iterations=1)
+    assert names == _read_names_unity_yaml(medium_scene_file)
+
+
+def test_get_prefab_instances(benchmark, large_scene):
+    yaml_file = UnityYamlFile(large_scene)
+    result = benchmark.pedantic(lambda: len(list(get_prefab_instances(yaml_file))), rounds=3, iterations=1)
+    assert result
@@ -0,0 +1,108 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import random
+import threading
+from unitypackage_importer.modules.byte_cache import ByteBudgetCache
+
+
+def test_least_recently_used_values_are_evicted():
+    cache = ByteBudgetCache(300, 0)
+    for key in 'abc':
+        cache.put(key, key.encode('ascii') * 100)
+    assert cache.cached_bytes == 300
+    
+    # Using 'a' makes 'b' the least recently used one
+    assert cache.get('a') == b'a' * 100
+    cache.put('d', b'd' * 150)
+    assert cache.get('b') is None and cache.get('c') is None
+    assert cache.get('a') == b'a' * 100 and cache.get('d') == b'd' * 150
+    assert cache.cached_bytes == 250
+    assert cache.get_stats() == { 'hits': 3, 'misses': 2, 'evictions': 2, 'bytes': 250, 'pinned_bytes': 0 }
+
+
+def test_small_values_are_pinned():
+    cache = ByteBudgetCache(100, 10)
+    cache.put('meta', b'm' * 10)
+    for index in range(10):
+        cache.put(index, bytes(100))
+    
+    # Pinned values don't count towards the budget and are never evicted
+    assert cache.get('meta') == b'm' * 10
+    assert cache.cached_bytes == 100 and cache.pinned_bytes == 10
+    assert cache.evictions == 9
+
+
+def test_pinned_values_are_capped():
+    cache = ByteBudgetCache(100, 10, pin_max_bytes=30)
+    for index in range(10):
+        cache.put(index, bytes([ index ]) * 10)
+
+    # The first three values fill up the pinned bytes, the rest are cached within the budget like large values
+    assert cache.pinned_bytes == 30
+    assert cache.cached_bytes == 70 and cache.evictions == 0
+    for index in range(10, 15):
+        cache.put(index, bytes(10))
+    assert cache.pinned_bytes == 30 and cache.cached_bytes == 100
+    assert cache.evictions == 2
+    assert cache.get(0) == bytes(10) and cache.get(3) is None and cache.get(5) == bytes([ 5 ]) * 10
+
+
+def test_oversized_and_duplicate_values():
+    cache = ByteBudgetCache(100, 0)
+    cache.put('large', bytes(101))
+    assert cache.get('large') is None and cache.cached_bytes == 0
+
+    cache.put('a', b'first' * 10)
+    cache.put('a', b'second' * 10)
+    assert cache.get('a') == b'first' * 10
+    assert cache.cached_bytes == 50
+
+
+def test_clear_keeps_counters():
+    cache = ByteBudgetCache(100, 10)
+    cache.put('pinned', b'p')
+    cache.put('cached', bytes(50))
+    cache.get('cached')
+    cache.clear()
+    
+    assert cache.get('pinned') is None and cache.get('cached') is None
+    assert cache.get_stats() == { 'hits': 1, 'misses': 2, 'evictions': 0, 'bytes': 0, 'pinned_bytes': 0 }
+
+
+def test_concurrent_access_stays_within_budget():
+    cache = ByteBudgetCache(64 * 1024, 64)
+    values = { key: bytes([ key % 256 ]) * random.Random(key).randint(1, 8 * 1024) for key in range(200) }
+
+    def worker(seed : int):
+        rnd = random.Random(seed)
+        for _ in range(2000):
+            key = rnd.randrange(len(values))
+            value = cache.get(key)
+            if value is None:
+                cache.put(key, values[key])
+            else:
+                assert value == values[key]
+
+    threads = [ threading.Thread(target=worker, args=(seed,)) for seed in range(4) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.cached_bytes == sum(len(value) for value in cache._entries.values()) <= 64 * 1024
+    assert cache.pinned_bytes == sum(len(value) for value in cache._pinned.values())
+    assert cache.hits + cache.misses == 4 * 2000
@@ -0,0 +1,131 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import io
+import os
+import shutil
+import tarfile
+import pytest
+from unitypackage_importer.modules import index_cache
+from unitypackage_importer.modules.catalog import Catalog, CatalogRefreshJob
+from unitypackage_importer.modules.content_hash import hash_bytes, hash_stream, content_hash_algorithm, _CHUNK_SIZE
+from unitypackage_importer.modules.__main__ import main
+from unitypackage_generator import generate_unitypackage
+
+
+def _make_library(tmp_path, *packages):
+    library = tmp_path / 'library'
+    (library / 'sub').mkdir(parents=True)
+    for i, (filepath, _) in enumerate(packages):
+        shutil.copy(filepath, library / ('sub' if i % 2 else '') / os.path.basename(filepath))
+    return library
+
+
+def test_refresh_and_query(small_package, uncompressed_package, tmp_path):
+    library = _make_library(tmp_path, small_package, uncompressed_package)
+    with Catalog(str(tmp_path / 'catalog.sqlite')) as catalog:
+        assert catalog.refresh_directory(str(library), max_workers=0) == { 'indexed': 2, 'unchanged': 0, 'failed': 0, 'removed': 0 }
+        assert sorted(count for _, count in catalog.get_packages()) == [ len(uncompressed_package[1]), len(small_package[1]) ]
+
+        _, pathnames = small_package
+        expected = { guid for guid, pathname in pathnames.items() if pathname.lower().endswith('.fbx') and '_1' in pathname.rsplit('/', 1)[-1] }
+        entries = catalog.query(name='*_1*', extensions=[ '.FBX' ])
+        assert { entry.guid for entry in entries if entry.package_path.endswith('small.unitypackage') } == expected
+        
+        guid, pathname = next(iter(pathnames.items()))
+        entry, = catalog.query(guid=guid)
+        assert entry.pathname == pathname and entry.package_path == str(library / 'small.unitypackage')
+        
+        # Wildcards of SQL's LIKE are matched literally
+        assert catalog.query(name='%') == []
+
+
+def test_refresh_bypasses_index_cache(small_package, tmp_path):
+    library = _make_library(tmp_path, small_package)
+    filepath = str(library / 'small.unitypackage')
+    with Catalog(str(tmp_path / 'catalog.sqlite')) as catalog:
+        catalog.refresh_directory(str(library), max_workers=0)
+    assert not os.path.exists(index_cache._get_cache_filepath(index_cache.get_file_key(filepath)))
+
+
+def test_refresh_skips_unchanged_packages(small_package, uncompressed_package, tmp_path):
+    library = _make_library(tmp_path, small_package, uncompressed_package)
+    catalog_filepath = str(tmp_path / 'catalog.sqlite')
+    with Catalog(catalog_filepath) as catalog:
+        catalog.refresh_directory(str(library), max_workers=0)
+
+    # Replace one package, remove the other
+    changed_pathnames = generate_unitypackage(str(library / 'small.unitypackage'), entry_count=50, seed=42)
+    os.remove(library / 'sub' / 'uncompressed.unitypackage')
+    with Catalog(catalog_filepath) as catalog:
+        assert catalog.refresh_directory(str(library), max_workers=0) == { 'indexed': 1, 'unchanged': 0, 'failed': 0, 'removed': 1 }
+        assert { entry.guid for entry in catalog.query() } == set(changed_pathnames)
+        assert catalog.refresh_directory(str(library), max_workers=0)['unchanged'] == 1
+
+
+@pytest.mark.parametrize('max_workers', [ 0, 2 ])
+def test_refresh_job_steps(small_package, uncompressed_package, tmp_path, max_workers):
+    library = _make_library(tmp_path, small_package, uncompressed_package)
+    (library / 'broken.unitypackage').write_bytes(b'not a package')
+    with Catalog(str(tmp_path / 'catalog.sqlite')) as catalog:
+        with CatalogRefreshJob.for_directory(catalog, str(library), max_workers) as job:
+            assert (job.total, job.done) == (3, 0)
+            
+            # Steps without a time budget index one package without workers and never block with them
+            done = 0
+            while job.step(0.0):
+                assert job.done < job.total and 'removed' not in job.stats
+                assert job.done == done + 1 if max_workers == 0 else job.done >= done
+                done = job.done
+            assert job.done == job.total
+            assert job.stats == { 'indexed': 2, 'unchanged': 0, 'failed': 1, 'removed': 0 }
+            assert not job.step(0.0)
+        
+        assert len(catalog.get_packages()) == 2
+        assert catalog.refresh_directory(str(library), max_workers=0) == { 'indexed': 0, 'unchanged': 2, 'failed': 1, 'removed': 0 }
+
+
+def test_content_hashes(uncompressed_package, tmp_path):
+    filepath, pathnames = uncompressed_package
+    with Catalog(str(tmp_path / 'catalog.sqlite')) as catalog:
+        catalog.refresh([ filepath ], max_workers=0)
+        assert all(entry.content_hash is None for entry in catalog.query())
+        
+        # Requesting hashes re-indexes packages that were indexed without them
+        assert catalog.refresh([ filepath ], max_workers=0, hash_contents=True)['indexed'] == 1
+        guid = next(iter(pathnames))
+        with tarfile.open(filepath) as tar:
+            content_hash = hash_bytes(tar.extractfile(f"{guid}/asset").read())
+        assert guid in { entry.guid for entry in catalog.query(content_hash=content_hash) }
+
+
+def test_hash_bytes_matches_stream():
+    data = bytes(range(256)) * (_CHUNK_SIZE // 256 * 2 + 3)
+    assert hash_bytes(data) == hash_stream(io.BytesIO(data))
+    assert hash_bytes(memoryview(data)) == hash_bytes(data)
+    assert hash_bytes(b'').startswith(f"{content_hash_algorithm}:") and hash_bytes(b'') != hash_bytes(b'\0')
+
+
+def test_cli_search(small_package, tmp_path, capsys):
+    library = _make_library(tmp_path, small_package)
+    catalog_filepath = str(tmp_path / 'catalog.sqlite')
+    assert main([ 'catalog', '--catalog', catalog_filepath, 'refresh', str(library), '--jobs', '1' ]) == 0
+    capsys.readouterr()
+
+    assert main([ 'catalog', '--catalog', catalog_filepath, 'search', '--extension', '.mat', '--glob', 'assets/folder1/*' ]) == 0
+    _, pathnames = small_package
+    expected = { f"{library / 'small.unitypackage'}: {pathname}" for pathname in pathnames.values() if pathname.startswith('Assets/Folder1/') and pathname.endswith('.mat') }
+    assert set(capsys.readouterr().out.splitlines()) == expected
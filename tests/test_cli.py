@@ -0,0 +1,97 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import os
+import sys
+import tarfile
+import shutil
+import subprocess
+from unitypackage_importer.modules import unitypackage_parser
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+from unitypackage_importer.modules.__main__ import main
+
+
+def test_extract_by_extension(small_package, tmp_path):
+    filepath, pathnames = small_package
+    assert main([ 'extract', filepath, str(tmp_path), '--extension', '.png', '--meta', '--jobs', '2' ]) == 0
+
+    with tarfile.open(filepath) as tar:
+        for guid, pathname in pathnames.items():
+            output_path = tmp_path / pathname
+            if not pathname.lower().endswith('.png'):
+                assert not output_path.exists()
+                continue
+            assert output_path.read_bytes() == tar.extractfile(f"{guid}/asset").read()
+            assert (tmp_path / f"{pathname}.meta").read_bytes() == tar.extractfile(f"{guid}/asset.meta").read()
+
+
+def test_extract_with_meta_takes_single_pass(small_package, tmp_path, monkeypatch):
+    filepath, pathnames = small_package
+    UnitypackageParser(filepath).close() # Index is cached, so opening doesn't read the archive
+    # Without checkpoints, every seek back in the archive would mean decompressing it from the start again
+    monkeypatch.setattr(unitypackage_parser, 'gzip_background_checkpoints', False)
+    
+    stats = []
+    close = UnitypackageParser.close
+    def record_stats_and_close(parser):
+        stats.append(parser.get_stats())
+        close(parser)
+    monkeypatch.setattr(UnitypackageParser, 'close', record_stats_and_close)
+
+    assert main([ 'extract', filepath, str(tmp_path), '--meta' ]) == 0
+    assert stats[0]['decompression_passes'] == 1
+    assert stats[0]['checkpoint_restores'] == 0
+    assert sum(1 for _ in tmp_path.rglob('*.meta')) == len(pathnames)
+
+
+def test_index_multiple_packages(small_package, uncompressed_package, tmp_path, capsys):
+    filepaths = []
+    for index, (filepath, _) in enumerate([ small_package, uncompressed_package ]):
+        # Copies, so they aren't in the index cache yet
+        filepaths.append(str(tmp_path / f"{index}.unitypackage"))
+        shutil.copyfile(filepath, filepaths[-1])
+    
+    assert main([ 'index', *filepaths, '--jobs', '2' ]) == 0
+    output = capsys.readouterr().out.splitlines()
+    assert [ line.split(':')[0] for line in output ] == filepaths
+    assert f"{len(small_package[1])} asset entries" in output[0]
+
+
+def test_ls_by_glob_and_guid(small_package, capsys):
+    filepath, pathnames = small_package
+    guid = next(iter(pathnames))
+    assert main([ 'ls', filepath, '--glob', 'assets/folder1/*.MAT', '--guid', guid ]) == 0
+
+    expected = { pathname for pathname in pathnames.values() if pathname.startswith('Assets/Folder1/') and pathname.endswith('.mat') } | { pathnames[guid] }
+    assert set(capsys.readouterr().out.splitlines()) == expected
+
+
+def test_unknown_guid_fails(small_package, capsys):
+    filepath, _ = small_package
+    assert main([ 'ls', filepath, '--guid', '0' * 32 ]) == 1
+    assert capsys.readouterr().err == f"Error: No asset entry with GUID '{'0' * 32}'!\n"
+
+
+def test_runs_without_bpy(uncompressed_package):
+    filepath, pathnames = uncompressed_package
+    code = "import runpy, sys; sys.argv[1:] = ['stats', sys.argv[1]]; runpy.run_module('unitypackage_importer.modules', run_name='__main__', alter_sys=True)"
+    # The module exits through sys.exit, check for bpy right before that
+    code = f"import atexit, sys; atexit.register(lambda: print('bpy imported' if 'bpy' in sys.modules else 'no bpy')); {code}"
+    result = subprocess.run([ sys.executable, '-c', code, filepath ], capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    
+    assert result.returncode == 0, result.stderr
+    assert f"{len(pathnames)} asset entries" in result.stdout
+    assert result.stdout.splitlines()[-1] == 'no bpy'
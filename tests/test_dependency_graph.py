@@ -0,0 +1,140 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import re
+import tarfile
+import pytest
+from unitypackage_importer.config import unity_yaml_file_extensions
+from unitypackage_importer.modules.dependency_graph import build_dependency_graph
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+from unitypackage_generator import write_unitypackage, encode_png
+
+
+PREFAB = 'a0000000000000000000000000000000'
+MATERIAL = 'b0000000000000000000000000000000'
+MODEL = 'c0000000000000000000000000000000'
+TEXTURE = 'd0000000000000000000000000000000'
+SCENE = 'e0000000000000000000000000000000'
+BINARY_ASSET = 'f0000000000000000000000000000000'
+EYES_MATERIAL = 'a1000000000000000000000000000000'
+EYES_TEXTURE = 'b1000000000000000000000000000000'
+SHARED_MATERIAL = 'c1000000000000000000000000000000'
+EXTERNAL = 'ffff0000000000000000000000000000'
+
+
+def _yaml(*references : str) -> bytes:
+    lines = [ b"%YAML 1.1\n%TAG !u! tag:unity3d.com,2011:\n--- !u!1 &100\nGameObject:\n  m_Name: Test\n" ]
+    lines += [ f"  m_Reference{index}: {{fileID: 2100000, guid: {reference}, type: 2}}\n".encode('ascii') for index, reference in enumerate(references) ]
+    return b"".join(lines)
+
+
+def _meta(guid : str, importer : bytes = b"") -> bytes:
+    return f"fileFormatVersion: 2\nguid: {guid}\n".encode('ascii') + importer
+
+
+def write_dependency_package(filepath : str):
+    """
+    Writes a small package with known references:
+    - The scene uses the prefab, which uses the model, the material and something outside of the package
+    - The material uses a texture (and references itself, which Unity does for some properties)
+    - The model's import settings remap its material to the eyes material, which uses another texture and
+      a material referencing the eyes material again (a cycle)
+    - The binary asset contains something that looks like a reference, but can't be scanned
+
+    """
+    assets = {
+        PREFAB: ('Assets/Avatar.prefab', _yaml(MODEL, MATERIAL, EXTERNAL), _meta(PREFAB)),
+        MATERIAL: ('Assets/Materials/Body.mat', _yaml(TEXTURE, MATERIAL), _meta(MATERIAL)),
+        MODEL: ('Assets/Models/Body.fbx', b"Kaydara FBX Binary  \x00", _meta(MODEL, (
+            b"ModelImporter:\n  externalObjects:\n  - first:\n      type: UnityEngine:Material\n      name: Eyes\n"
+            b"    second: {fileID: 2100000, guid: " + EYES_MATERIAL.encode('ascii') + b", type: 2}\n"
+        ))),
+        TEXTURE: ('Assets/Textures/Body.png', encode_png(1, 1, bytes(4)), _meta(TEXTURE, b"TextureImporter:\n  maxTextureSize: 2048\n")),
+        SCENE: ('Assets/Scene.unity', _yaml(PREFAB), _meta(SCENE)),
+        BINARY_ASSET: ('Assets/Data.asset', b"\x00\x01guid: " + TEXTURE.encode('ascii'), _meta(BINARY_ASSET)),
+        EYES_MATERIAL: ('Assets/Materials/Eyes.mat', _yaml(EYES_TEXTURE, SHARED_MATERIAL), _meta(EYES_MATERIAL)),
+        EYES_TEXTURE: ('Assets/Textures/Eyes.png', encode_png(1, 1, bytes(4)), _meta(EYES_TEXTURE)),
+        SHARED_MATERIAL: ('Assets/Materials/Shared.mat', _yaml(EYES_MATERIAL), _meta(SHARED_MATERIAL)),
+    }
+    members = {}
+    for guid, (pathname, asset, meta) in assets.items():
+        members[f"{guid}/asset"] = asset
+        members[f"{guid}/asset.meta"] = meta
+        members[f"{guid}/pathname"] = pathname.encode('utf-8')
+    write_unitypackage(filepath, members)
+
+
+@pytest.fixture
+def dependency_package(tmp_path):
+    filepath = str(tmp_path / 'dependencies.unitypackage')
+    write_dependency_package(filepath)
+    return filepath
+
+
+def test_direct_references(dependency_package):
+    with UnitypackageParser(dependency_package) as parser:
+        graph = build_dependency_graph(parser)
+        
+        assert set(graph.get_dependencies(PREFAB)) == { MODEL, MATERIAL }
+        assert graph.get_dependencies(MATERIAL) == [ TEXTURE ]
+        assert graph.get_dependencies(MODEL) == [ EYES_MATERIAL ]
+        assert graph.get_dependencies(TEXTURE) == []
+        assert graph.get_dependencies(BINARY_ASSET) == []
+        
+        assert graph.get_dependents(TEXTURE) == [ MATERIAL ]
+        assert graph.get_dependents(PREFAB) == [ SCENE ]
+        assert graph.get_dependents(SCENE) == []
+        assert graph.edge_count == 8
+
+
+def test_transitive_closure(dependency_package):
+    with UnitypackageParser(dependency_package) as parser:
+        graph = build_dependency_graph(parser)
+
+        everything_used = { MODEL, MATERIAL, TEXTURE, EYES_MATERIAL, EYES_TEXTURE, SHARED_MATERIAL }
+        assert set(graph.get_dependencies(PREFAB, recursive=True)) == everything_used
+        assert set(graph.get_dependencies(SCENE, recursive=True)) == everything_used | { PREFAB }
+        # The cycle back to the starting asset isn't included
+        assert set(graph.get_dependencies(EYES_MATERIAL, recursive=True)) == { EYES_TEXTURE, SHARED_MATERIAL }
+        
+        assert set(graph.get_dependents(TEXTURE, recursive=True)) == { MATERIAL, PREFAB, SCENE }
+        assert set(graph.get_dependents(EYES_TEXTURE, recursive=True)) == { EYES_MATERIAL, SHARED_MATERIAL, MODEL, PREFAB, SCENE }
+        
+        dependencies = graph.get_all_dependencies([ MATERIAL, MODEL ])
+        assert len(dependencies) == len(set(dependencies))
+        assert set(dependencies) == { TEXTURE, EYES_MATERIAL, EYES_TEXTURE, SHARED_MATERIAL }
+        assert set(graph.get_all_dependencies([ MATERIAL, MODEL ], recursive=False)) == { TEXTURE, EYES_MATERIAL }
+
+        with pytest.raises(KeyError):
+            graph.get_dependencies(EXTERNAL)
+
+
+def test_matches_brute_force_scan(small_package):
+    filepath, pathnames = small_package
+    yaml_guids = { guid for guid, pathname in pathnames.items() if pathname.lower().endswith(tuple(unity_yaml_file_extensions)) }
+    expected = {}
+    with tarfile.open(filepath) as tar:
+        for member in tar:
+            guid, _, key = member.name.partition('/')
+            if key == 'asset' and guid in yaml_guids:
+                references = set(re.findall(r'guid: ([0-9a-f]{32})', tar.extractfile(member).read().decode('utf-8')))
+                expected[guid] = sorted(references & set(pathnames) - { guid })
+
+    with UnitypackageParser(filepath) as parser:
+        graph = build_dependency_graph(parser)
+        assert graph.edge_count == sum(len(references) for references in expected.values()) > 0
+        for guid, references in expected.items():
+            assert sorted(graph.get_dependencies(guid)) == references
@@ -0,0 +1,108 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import os
+import gzip
+import random
+import pytest
+from unitypackage_importer.modules.gzip_index import GzipCheckpointReader, _DECOMPRESS_CHUNK_SIZE
+
+
+CHECKPOINT_SPAN = 64 * 1024
+
+
+@pytest.fixture(scope='module')
+def gzip_file(tmp_path_factory):
+    """
+    Gzip file of 2 MiB of partly compressible data. Returns (filepath, uncompressed data).
+
+    """
+    rnd = random.Random(0)
+    data = b''.join(rnd.randbytes(512) * rnd.randint(1, 8) for _ in range(1000))[:2 * 1024 * 1024]
+    filepath = str(tmp_path_factory.mktemp('gzip') / 'data.gz')
+    with gzip.open(filepath, 'wb') as f:
+        f.write(data)
+    return filepath, data
+
+
+def test_random_access_reads(gzip_file):
+    filepath, data = gzip_file
+    rnd = random.Random(1)
+    reader = GzipCheckpointReader(filepath, CHECKPOINT_SPAN)
+    try:
+        assert reader.read() == data
+        first_checkpoint_offset = reader._checkpoint_offsets[0]
+        restarts = 0
+        for _ in range(200):
+            offset = rnd.randrange(len(data))
+            restarts += offset < first_checkpoint_offset
+            size = rnd.randrange(1, 100 * 1024)
+            assert reader.seek(offset) == offset
+            assert reader.read(size) == data[offset:offset + size]
+            assert reader.tell() == min(offset + size, len(data))
+        
+        # Seeks resumed from a checkpoint recorded during the first pass instead of starting over,
+        # unless they went back to before the first one
+        stats = reader.get_stats()
+        assert stats['decompression_passes'] <= 1 + restarts
+        assert stats['checkpoint_restores'] > 0
+        # Checkpoints can only be recorded between decompressed chunks
+        assert stats['checkpoints'] >= len(data) // (CHECKPOINT_SPAN + _DECOMPRESS_CHUNK_SIZE)
+    finally:
+        reader.close()
+
+
+def test_seeking_backwards_only_decompresses_from_nearest_checkpoint(gzip_file):
+    filepath, data = gzip_file
+    reader = GzipCheckpointReader(filepath, CHECKPOINT_SPAN)
+    try:
+        reader.read()
+        decompressed = reader.get_stats()['bytes_decompressed']
+        reader.seek(len(data) // 2)
+        assert reader.read(10) == data[len(data) // 2:len(data) // 2 + 10]
+        assert reader.get_stats()['bytes_decompressed'] - decompressed <= CHECKPOINT_SPAN + 2 * _DECOMPRESS_CHUNK_SIZE
+        assert reader.get_stats()['checkpoint_restores'] == 1
+    finally:
+        reader.close()
+
+
+def test_multiple_members(tmp_path):
+    filepath = str(tmp_path / 'members.gz')
+    with open(filepath, 'wb') as f:
+        f.write(gzip.compress(b'first ' * 20000))
+        f.write(gzip.compress(b'second ' * 20000))
+    
+    reader = GzipCheckpointReader(filepath, 4096)
+    try:
+        assert reader.read() == b'first ' * 20000 + b'second ' * 20000
+        reader.seek(6 * 20000 - 3)
+        assert reader.read(9) == b'st second'
+    finally:
+        reader.close()
+
+
+def test_truncated_file_raises(gzip_file, tmp_path):
+    filepath, _ = gzip_file
+    truncated_filepath = str(tmp_path / 'truncated.gz')
+    with open(filepath, 'rb') as f, open(truncated_filepath, 'wb') as truncated:
+        truncated.write(f.read(os.path.getsize(filepath) // 2))
+
+    reader = GzipCheckpointReader(truncated_filepath, CHECKPOINT_SPAN)
+    try:
+        with pytest.raises(EOFError):
+            reader.read()
+    finally:
+        reader.close()
@@ -0,0 +1,339 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import bpy
+import io
+import os
+import time
+import tarfile
+import pytest
+import fake_bpy
+from unitypackage_importer.importing import plugin_temp_dir, load_texture, prepare_direct_import, DirectImportJob, do_direct_import, content_hash_property, wrap_mode_property, guid_property, package_property
+from unitypackage_importer import importing
+from unitypackage_importer.thumbnails import ThumbnailCache
+from unitypackage_importer.modules.catalog import Catalog
+from unitypackage_importer.modules.pipeline import AssetPrefetcher
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+from unitypackage_importer.modules.content_hash import hash_bytes
+from unitypackage_generator import generate_unitypackage, encode_png
+from test_unity_meta import NORMAL_MAP_META
+
+
+@pytest.fixture(scope='module')
+def duplicated_textures_package(tmp_path_factory):
+    """
+    Package of textures only, where many GUIDs share the same contents. Returns (filepath, { guid: pathname }).
+
+    """
+    filepath = str(tmp_path_factory.mktemp('packages') / 'duplicated_textures.unitypackage')
+    return filepath, generate_unitypackage(filepath, entry_count=200, max_size=8 * 1024, mix={ 'texture': 1 }, duplicate_ratio=0.5, seed=4)
+
+
+def _import_all(context, filepath : str, reimport : bool = False):
+    parser = UnitypackageParser(filepath)
+    prepare_direct_import(context, parser)
+    return do_direct_import(context, parser, reimport=reimport)
+
+
+def _write_package(filepath : str, assets : dict[str, tuple[str, bytes, bytes]]):
+    """
+    Writes a .unitypackage with the given { guid: (pathname, asset, meta) } entries.
+
+    """
+    with tarfile.open(filepath, 'w:gz') as tar:
+        for guid, (pathname, asset, meta) in assets.items():
+            for name, data in { 'asset': asset, 'asset.meta': meta, 'pathname': pathname.encode('utf-8') }.items():
+                tarinfo = tarfile.TarInfo(f"{guid}/{name}")
+                tarinfo.size = len(data)
+                tar.addfile(tarinfo, io.BytesIO(data))
+
+
+def _write_texture_package(filepath : str) -> dict[str, bytes]:
+    textures = {
+        'a0000000000000000000000000000000': ('Assets/Textures/Albedo.png', encode_png(2, 2, bytes(16))),
+        'b0000000000000000000000000000000': ('Assets/Textures/Sky.exr', b'v/1\x01' + bytes(60)),
+    }
+    _write_package(filepath, { guid: (pathname, data, b'fileFormatVersion: 2') for guid, (pathname, data) in textures.items() })
+    return { pathname: data for pathname, data in textures.values() }
+
+
+def test_textures_are_loaded_from_memory(context, tmp_path):
+    filepath = str(tmp_path / 'textures.unitypackage')
+    textures = _write_texture_package(filepath)
+
+    with UnitypackageParser(filepath) as parser:
+        images = [ load_texture(asset_entry, asset_entry.asset) for asset_entry in parser.get_asset_entries() ]
+    
+    # No temporary files were loaded
+    assert bpy.data.images.load_count == 0
+    assert [ image.name for image in images ] == [ 'Albedo.png', 'Sky.exr' ]
+    assert [ image.packed_data for image in images ] == list(textures.values())
+    assert [ image.source for image in images ] == [ 'FILE', 'FILE' ]
+    assert [ image.filepath_raw for image in images ] == [ '//textures/Albedo.png', '//textures/Sky.exr' ]
+    # Float formats keep Blender's linear default colorspace
+    assert [ image.use_generated_float for image in images ] == [ False, True ]
+
+
+def test_textures_fall_back_to_temporary_file(context, tmp_path, monkeypatch):
+    filepath = str(tmp_path / 'textures.unitypackage')
+    textures = _write_texture_package(filepath)
+
+    # Pretend Blender can't read any of the images from memory: packing leaves them without pixels
+    def pack(image, data : bytes = None, data_len : int = 0):
+        if data is None:
+            original_pack(image)
+    original_pack = fake_bpy.Image.pack
+    monkeypatch.setattr(fake_bpy.Image, 'pack', pack)
+
+    temp_files_before = set(os.listdir(plugin_temp_dir))
+    with UnitypackageParser(filepath) as parser:
+        images = [ load_texture(asset_entry, asset_entry.asset) for asset_entry in parser.get_asset_entries() ]
+
+    assert bpy.data.images.load_count == 2
+    # The failed in-memory images were removed again, so the loaded ones keep their names
+    assert [ image.name for image in bpy.data.images ] == [ 'Albedo.png', 'Sky.exr' ]
+    assert [ image.packed_data for image in images ] == list(textures.values())
+    assert [ image.filepath_raw for image in images ] == [ '//textures/Albedo.png', '//textures/Sky.exr' ]
+    assert set(os.listdir(plugin_temp_dir)) == temp_files_before
+
+
+def test_identical_textures_are_loaded_once(context, duplicated_textures_package):
+    filepath, pathnames = duplicated_textures_package
+    with tarfile.open(filepath) as tar:
+        content_hashes = { hash_bytes(tar.extractfile(f"{guid}/asset").read()) for guid in pathnames }
+    assert len(content_hashes) < len(pathnames)
+
+    _import_all(context, filepath)
+    assert { image[content_hash_property] for image in bpy.data.images } == content_hashes
+    assert len(bpy.data.images) == len(content_hashes)
+
+    # Importing again reuses all existing images
+    _import_all(context, filepath)
+    assert len(bpy.data.images) == len(content_hashes)
+
+
+def test_import_settings_are_applied(context, tmp_path):
+    filepath = str(tmp_path / 'settings.unitypackage')
+    metas = {
+        '11111111111111111111111111111111': NORMAL_MAP_META,
+        '22222222222222222222222222222222': b"TextureImporter:\n  alphaIsTransparency: 1\n",
+        '33333333333333333333333333333333': b"fileFormatVersion: 2\n",
+    }
+    # Different pixels for each, so they aren't deduplicated
+    _write_package(filepath, { guid: (f"Assets/texture{index}.png", encode_png(2, 2, bytes([ index ]) * 16), meta) for index, (guid, meta) in enumerate(metas.items()) })
+    _import_all(context, filepath)
+    images = { image.name: image for image in bpy.data.images }
+    assert images['texture0.png'].colorspace_settings.name == 'Non-Color'
+    assert images['texture0.png'].alpha_mode == 'NONE'
+    assert images['texture0.png'][wrap_mode_property] == 'EXTEND'
+    assert images['texture1.png'].colorspace_settings.name == 'sRGB'
+    assert images['texture1.png'].alpha_mode == 'STRAIGHT'
+    assert images['texture1.png'][wrap_mode_property] == 'REPEAT'
+    # Without import settings Blender's defaults are left alone
+    assert images['texture2.png'].alpha_mode == 'STRAIGHT' and images['texture2.png'].get(wrap_mode_property) is None
+
+
+def _texture_asset(pathname : str, value : int) -> tuple[str, bytes, bytes]:
+    return (pathname, encode_png(2, 2, bytes([ value ]) * 16), b"fileFormatVersion: 2\n")
+
+
+def _write_package_versions(tmp_path) -> tuple[str, str]:
+    """
+    Writes two versions of a package of textures: one stays the same, one changes, one is removed and one is added.
+    Returns the file paths of the old and the new version.
+
+    """
+    old_filepath = str(tmp_path / 'Awtter_3.0.74i.unitypackage')
+    new_filepath = str(tmp_path / 'Awtter_3.0.75.unitypackage')
+    _write_package(old_filepath, {
+        'aaaa0000000000000000000000000000': _texture_asset("Assets/unchanged.png", 1),
+        'bbbb0000000000000000000000000000': _texture_asset("Assets/changed.png", 2),
+        'cccc0000000000000000000000000000': _texture_asset("Assets/removed.png", 3),
+    })
+    _write_package(new_filepath, {
+        'aaaa0000000000000000000000000000': _texture_asset("Assets/unchanged.png", 1),
+        'bbbb0000000000000000000000000000': _texture_asset("Assets/changed.png", 4),
+        'dddd0000000000000000000000000000': _texture_asset("Assets/added.png", 5),
+    })
+    return old_filepath, new_filepath
+
+
+def _get_blend_data_state() -> tuple:
+    """
+    Everything an import can change in bpy.data: the images with their tags and contents, and what their users point to.
+
+    """
+    images = [ (image, image.name, dict(image._properties), image.packed_data) for image in bpy.data.images ]
+    users = [ reference.id for reference in bpy.data.user_references ]
+    return images, users
+
+
+def test_cancelled_import_is_rolled_back(context, tmp_path):
+    filepath = str(tmp_path / 'textures.unitypackage')
+    _write_package(filepath, { f"{index:032x}": _texture_asset(f"Assets/texture{index}.png", index) for index in range(10) })
+    
+    parser = UnitypackageParser(filepath)
+    prepare_direct_import(context, parser)
+    with DirectImportJob(context, parser) as job:
+        for _ in range(4):
+            assert job.step(0.0)
+        assert len(bpy.data.images) == 4
+        job.rollback()
+    
+    assert len(bpy.data.images) == 0
+
+
+def test_cancelled_reimport_is_rolled_back(context, tmp_path):
+    old_filepath, new_filepath = _write_package_versions(tmp_path)
+    _import_all(context, old_filepath)
+    for image in bpy.data.images:
+        fake_bpy.add_user(image)
+    state = _get_blend_data_state()
+
+    parser = UnitypackageParser(new_filepath)
+    prepare_direct_import(context, parser)
+    with DirectImportJob(context, parser, reimport=True) as job:
+        # Cancel after the unchanged and the changed texture (in archive order), before the added one
+        assert job.step(0.0) and job.step(0.0)
+        assert job.unchanged_guids == [ 'aaaa0000000000000000000000000000' ] and job.changed_guids == [ 'bbbb0000000000000000000000000000' ]
+        assert _get_blend_data_state() != state
+        job.rollback()
+    
+    assert _get_blend_data_state() == state
+
+
+def test_reimport_only_loads_added_and_changed_assets(context, tmp_path):
+    old_filepath, new_filepath = _write_package_versions(tmp_path)
+    
+    _import_all(context, old_filepath)
+    old_images = { image[guid_property]: image for image in bpy.data.images }
+    assert old_images['aaaa0000000000000000000000000000'][package_property] == 'Awtter_3.0.74i.unitypackage'
+
+    job = _import_all(context, new_filepath, reimport=True)
+    assert job.added_guids == [ 'dddd0000000000000000000000000000' ]
+    assert job.changed_guids == [ 'bbbb0000000000000000000000000000' ]
+    assert job.unchanged_guids == [ 'aaaa0000000000000000000000000000' ]
+    assert job.removed_guids == [ 'cccc0000000000000000000000000000' ]
+    
+    images = { image[guid_property]: image for image in bpy.data.images }
+    assert len(images) == len(bpy.data.images) == 4
+    # Unchanged images are kept as they are, changed ones replaced by a new image with the same name
+    assert images['aaaa0000000000000000000000000000'] is old_images['aaaa0000000000000000000000000000']
+    assert images['aaaa0000000000000000000000000000'][package_property] == 'Awtter_3.0.75.unitypackage'
+    changed_image = images['bbbb0000000000000000000000000000']
+    assert changed_image is not old_images['bbbb0000000000000000000000000000'] and changed_image.name == 'changed.png'
+    assert old_images['bbbb0000000000000000000000000000'].remapped_to is changed_image
+    # Removed assets are only reported
+    assert images['cccc0000000000000000000000000000'] is old_images['cccc0000000000000000000000000000']
+
+
+def test_reimport_skips_extraction_of_cataloged_unchanged_assets(context, tmp_path, monkeypatch):
+    monkeypatch.setenv('UNITYPACKAGE_IMPORTER_CACHE_DIR', str(tmp_path / 'cache'))
+    old_filepath, new_filepath = _write_package_versions(tmp_path)
+    _import_all(context, old_filepath)
+    with Catalog() as catalog:
+        catalog.refresh([ new_filepath ], max_workers=0, hash_contents=True)
+    
+    prefetched_guids = []
+    def recording_prefetcher(parser, guids, *args, **kwargs):
+        prefetched_guids.extend(guids)
+        return AssetPrefetcher(parser, guids, *args, **kwargs)
+    monkeypatch.setattr(importing, 'AssetPrefetcher', recording_prefetcher)
+    
+    job = _import_all(context, new_filepath, reimport=True)
+    assert job.unchanged_guids == [ 'aaaa0000000000000000000000000000' ]
+    assert job.changed_guids == [ 'bbbb0000000000000000000000000000' ]
+    assert job.added_guids == [ 'dddd0000000000000000000000000000' ]
+    assert job.done == job.total == 3
+    assert sorted(prefetched_guids) == [ 'bbbb0000000000000000000000000000', 'dddd0000000000000000000000000000' ]
+    image, = [ image for image in bpy.data.images if image[guid_property] == 'aaaa0000000000000000000000000000' ]
+    assert image[package_property] == 'Awtter_3.0.75.unitypackage'
+
+
+def test_stepped_reimport_removes_replaced_datablocks(context, tmp_path):
+    old_filepath, new_filepath = _write_package_versions(tmp_path)
+    _import_all(context, old_filepath)
+    old_changed_image, = [ image for image in bpy.data.images if image[guid_property] == 'bbbb0000000000000000000000000000' ]
+    
+    # Like the import operator does, stepping until the job reports it's done, one asset per step
+    parser = UnitypackageParser(new_filepath)
+    prepare_direct_import(context, parser)
+    with DirectImportJob(context, parser, reimport=True) as job:
+        steps = 1
+        while job.step(0.0):
+            steps += 1
+        assert steps == job.done == job.total == 3
+    
+    # The replaced image is gone as soon as step returned False, and its replacement took over its name
+    images = { image[guid_property]: image for image in bpy.data.images }
+    assert len(images) == len(bpy.data.images) == 4
+    assert old_changed_image not in list(bpy.data.images)
+    assert images['bbbb0000000000000000000000000000'].name == 'changed.png'
+
+
+def test_downscaled_textures_are_kept_apart_from_full_size_ones(context, tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    filepath = str(tmp_path / 'downscale.unitypackage')
+    # Pillow can read SGI images but not write them, they're written as PNG after downscaling
+    output = io.BytesIO()
+    Image.new('RGB', (64, 32), (255, 0, 0)).save(output, 'SGI')
+    guid = 'a0000000000000000000000000000000'
+    _write_package(filepath, { guid: ("Assets/Textures/Big.rgb", output.getvalue(), b"fileFormatVersion: 2\n") })
+    
+    def import_package(max_texture_size : int = 0, reimport : bool = False) -> DirectImportJob:
+        parser = UnitypackageParser(filepath)
+        prepare_direct_import(context, parser)
+        return do_direct_import(context, parser, downscale_textures=bool(max_texture_size), max_texture_size=max_texture_size, reimport=reimport)
+    
+    import_package(16)
+    image, = bpy.data.images
+    assert image.name == 'Big.png' and image.filepath_raw == '//textures/Big.png'
+    with Image.open(io.BytesIO(image.packed_data)) as downscaled:
+        assert downscaled.format == 'PNG' and downscaled.size == (16, 8)
+    assert image[content_hash_property] == hash_bytes(output.getvalue()) + '@16'
+    
+    # The same limit again reuses the downscaled image, without one the full size image replaces it
+    assert import_package(16, reimport=True).unchanged_guids == [ guid ]
+    job = import_package(reimport=True)
+    assert job.changed_guids == [ guid ]
+    image, = bpy.data.images
+    assert image.packed_data == output.getvalue() and image[content_hash_property] == hash_bytes(output.getvalue())
+
+
+def test_thumbnails_load_lazily_and_stay_bounded(context, tmp_path):
+    filepath = str(tmp_path / 'previews.unitypackage')
+    guids = list(generate_unitypackage(filepath, entry_count=20, with_preview=True, seed=6))
+    with UnitypackageParser(filepath) as parser, ThumbnailCache(parser, max_count=4) as thumbnails:
+        requested = guids[:6]
+        assert all(thumbnails.get_icon_id(guid) == 0 for guid in requested)
+        
+        deadline = time.monotonic() + 10
+        while thumbnails._requested and time.monotonic() < deadline:
+            fake_bpy.run_timers()
+            time.sleep(0.01)
+        
+        # Only the most recently loaded ones are kept
+        icon_ids = [ thumbnails.get_icon_id(guid) for guid in requested[2:] ]
+        assert all(icon_ids) and len(thumbnails._previews) == 4
+        
+        # Blender loads the extracted preview.png files itself, files of released thumbnails are removed
+        preview = thumbnails._previews[requested[2]]
+        with open(preview.filepath, 'rb') as f:
+            assert f.read() == parser.get_asset_entry_by_guid(requested[2]).read_value('preview')
+        assert sorted(os.listdir(thumbnails._temp_dir)) == sorted(f"{guid}.png" for guid in requested[2:])
+        temp_dir = thumbnails._temp_dir
+    
+    assert not os.path.exists(temp_dir)
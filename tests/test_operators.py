@@ -0,0 +1,333 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import types
+import bisect
+import random
+import shutil
+from unitypackage_importer import operators
+from unitypackage_importer.importing import prepare_direct_import
+from unitypackage_importer.operators import init_import_list_hierarchy, update_import_list, select_guids, batch_import_list_update
+from unitypackage_importer.operators import (
+    UNITYPACKAGE_IMPORTER_OT_select_dependencies, UNITYPACKAGE_IMPORTER_OT_select_by_extension,
+    UNITYPACKAGE_IMPORTER_OT_select_subtree, UNITYPACKAGE_IMPORTER_OT_invert_selection,
+    UNITYPACKAGE_IMPORTER_OT_refresh_catalog,
+)
+from unitypackage_importer.modules.catalog import Catalog
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+from test_dependency_graph import write_dependency_package, MODEL, EYES_TEXTURE
+
+
+def _prepare(context, parser : UnitypackageParser):
+    prepare_direct_import(context, parser)
+    init_import_list_hierarchy(context)
+    update_import_list(None, context)
+
+
+def _get_selected(import_list) -> set[str]:
+    return { item.name for item in import_list if item.is_selected }
+
+
+def test_select_dependencies(context, tmp_path, monkeypatch):
+    filepath = str(tmp_path / 'dependencies.unitypackage')
+    write_dependency_package(filepath)
+    import_list = context.window_manager.unitypackage_importer_import_list
+    with UnitypackageParser(filepath) as parser:
+        _prepare(context, parser)
+        monkeypatch.setattr(operators, '_dialog_parser', parser)
+        monkeypatch.setattr(operators, '_dependency_graph', None)
+        
+        select_guids(context, [ MODEL ])
+        assert _get_selected(import_list) == { 'Assets', 'Models', 'Body.fbx' }
+        
+        # The model's remapped eyes material uses the eyes texture, the materials themselves aren't in the import list
+        assert UNITYPACKAGE_IMPORTER_OT_select_dependencies().execute(context) == { 'FINISHED' }
+        assert _get_selected(import_list) == { 'Assets', 'Models', 'Body.fbx', 'Textures', 'Eyes.png' }
+        assert { item.guid for item in import_list if item.is_selected and item.guid } == { MODEL, EYES_TEXTURE }
+        assert operators._dependency_graph is not None
+
+
+def test_select_dependencies_without_dialog(context, monkeypatch):
+    monkeypatch.setattr(operators, '_dialog_parser', None)
+    assert UNITYPACKAGE_IMPORTER_OT_select_dependencies().execute(context) == { 'CANCELLED' }
+
+
+def _get_list_state(context) -> tuple:
+    import_list = context.window_manager.unitypackage_importer_import_list
+    import_display_list = context.window_manager.unitypackage_importer_import_display_list
+    return (
+        [ display_item.referenced_item_index for display_item in import_display_list ],
+        [ (item.is_visible, item.is_enabled) for item in import_list ],
+    )
+
+
+def test_incremental_updates_match_rebuild(context, small_package):
+    filepath, _ = small_package
+    rnd = random.Random(14)
+    import_list = context.window_manager.unitypackage_importer_import_list
+    with UnitypackageParser(filepath) as parser:
+        _prepare(context, parser)
+    folders = [ item for item in import_list if not item.guid ]
+    assert folders and len(import_list) > len(folders)
+
+    for _ in range(300):
+        # Mostly folders, toggling assets doesn't affect anything else
+        item = rnd.choice(folders) if rnd.random() < 0.9 else rnd.choice(import_list)
+        if rnd.random() < 0.5:
+            item.is_expanded = not item.is_expanded
+        else:
+            item.is_selected = not item.is_selected
+        
+        incremental_state = _get_list_state(context)
+        update_import_list(None, context)
+        assert incremental_state == _get_list_state(context)
+
+
+def test_large_splice_near_the_top_rebuilds_display_list(context, small_package, monkeypatch):
+    filepath, _ = small_package
+    import_list = context.window_manager.unitypackage_importer_import_list
+    import_display_list = context.window_manager.unitypackage_importer_import_display_list
+    with UnitypackageParser(filepath) as parser:
+        _prepare(context, parser)
+    for item in import_list:
+        item.is_expanded = True
+    
+    # A folder with a large subtree and a lot of visible items after it
+    folder = next(item for item in import_list if not item.guid and item.parent_index >= 0 and item.subtree_end - item.index > 20)
+    folder.is_expanded = False
+    inserted_count = folder.subtree_end - folder.index - 1
+    tail_count = len(import_display_list) - bisect.bisect_left(import_display_list, folder.subtree_end, key=lambda display_item: display_item.referenced_item_index)
+    assert inserted_count * tail_count > len(import_display_list) + inserted_count
+
+    moves = []
+    monkeypatch.setattr(type(import_display_list), 'move', lambda self, from_index, to_index: moves.append((from_index, to_index)))
+    folder.is_expanded = True
+    assert moves == []
+    incremental_state = _get_list_state(context)
+    update_import_list(None, context)
+    assert incremental_state == _get_list_state(context)
+
+
+def _get_selection_state(context) -> tuple:
+    import_list = context.window_manager.unitypackage_importer_import_list
+    return [ item.is_selected for item in import_list ], _get_list_state(context)
+
+
+def _count_list_updates(monkeypatch) -> list[int]:
+    """
+    Counts the updates of (part of) the import list, every one of them goes through _update_item_states.
+
+    """
+    calls = []
+    update_item_states = operators._update_item_states
+    def counting_update_item_states(import_list, start : int, end : int):
+        calls.append((start, end))
+        return update_item_states(import_list, start, end)
+    monkeypatch.setattr(operators, '_update_item_states', counting_update_item_states)
+    return calls
+
+
+def _select_ancestors_per_item(import_list, index : int):
+    parent_index = import_list[index].parent_index
+    while parent_index >= 0:
+        import_list[parent_index].is_selected = True
+        parent_index = import_list[parent_index].parent_index
+
+
+def _deselect_randomly(import_list, seed : int):
+    rnd = random.Random(seed)
+    for item in import_list:
+        if rnd.random() < 0.3:
+            item.is_selected = False
+
+
+def _collapse_randomly(import_list, seed : int):
+    rnd = random.Random(seed)
+    for item in import_list:
+        if not item.guid and rnd.random() < 0.3:
+            item.is_expanded = False
+
+
+def _run_bulk_and_per_item(context, parser, monkeypatch, run_bulk, run_per_item):
+    """
+    Runs a bulk operation and the equivalent per-item changes on the same starting state.
+    Returns the state after each, and the number of list updates the bulk operation caused.
+
+    """
+    import_list = context.window_manager.unitypackage_importer_import_list
+    states = []
+    for run in (run_bulk, run_per_item):
+        _prepare(context, parser)
+        _deselect_randomly(import_list, 15)
+        _collapse_randomly(import_list, 16)
+        calls = _count_list_updates(monkeypatch)
+        run(import_list)
+        states.append(_get_selection_state(context))
+        if run is run_bulk:
+            update_count = len(calls)
+        monkeypatch.undo()
+    
+    return states[0], states[1], update_count
+
+
+def test_select_by_extension_matches_per_item_selection(context, small_package, monkeypatch):
+    filepath, _ = small_package
+
+    def run_bulk(import_list):
+        operator = UNITYPACKAGE_IMPORTER_OT_select_by_extension()
+        operator.extension = '.png'
+        operator.extend = False
+        assert operator.execute(context) == { 'FINISHED' }
+
+    def run_per_item(import_list):
+        for index, item in enumerate(import_list):
+            if item.guid:
+                item.is_selected = item.name.lower().endswith('.png')
+                if item.is_selected:
+                    _select_ancestors_per_item(import_list, index)
+
+    with UnitypackageParser(filepath) as parser:
+        bulk_state, per_item_state, update_count = _run_bulk_and_per_item(context, parser, monkeypatch, run_bulk, run_per_item)
+    assert bulk_state == per_item_state
+    assert update_count == 1
+
+
+def test_select_by_extension_without_extension_changes_nothing(context, small_package):
+    filepath, _ = small_package
+    with UnitypackageParser(filepath) as parser:
+        _prepare(context, parser)
+        import_list = context.window_manager.unitypackage_importer_import_list
+        _deselect_randomly(import_list, 17)
+        state = _get_selection_state(context)
+
+        operator = UNITYPACKAGE_IMPORTER_OT_select_by_extension()
+        operator.extension = ''
+        operator.extend = False
+        assert operator.execute(context) == { 'CANCELLED' }
+        assert _get_selection_state(context) == state
+
+
+def test_select_subtree_matches_per_item_selection(context, small_package, monkeypatch):
+    filepath, _ = small_package
+    window_manager = context.window_manager
+
+    def get_active_item(import_list):
+        # The first visible folder with a subfolder
+        for display_index, display_item in enumerate(window_manager.unitypackage_importer_import_display_list):
+            item = import_list[display_item.referenced_item_index]
+            if not item.guid and item.parent_index >= 0 and any(not import_list[index].guid for index in range(item.index + 1, item.subtree_end)):
+                return display_index, item
+        raise Exception("No nested folder visible!")
+
+    def run_bulk(import_list):
+        window_manager.unitypackage_importer_import_display_list_index, _ = get_active_item(import_list)
+        assert UNITYPACKAGE_IMPORTER_OT_select_subtree().execute(context) == { 'FINISHED' }
+
+    def run_per_item(import_list):
+        _, active_item = get_active_item(import_list)
+        for index in range(active_item.index, active_item.subtree_end):
+            import_list[index].is_selected = True
+        _select_ancestors_per_item(import_list, active_item.index)
+
+    with UnitypackageParser(filepath) as parser:
+        bulk_state, per_item_state, update_count = _run_bulk_and_per_item(context, parser, monkeypatch, run_bulk, run_per_item)
+    assert bulk_state == per_item_state
+    assert update_count == 1
+
+
+def test_invert_selection_matches_per_item_selection(context, small_package, monkeypatch):
+    filepath, _ = small_package
+
+    def run_bulk(import_list):
+        assert UNITYPACKAGE_IMPORTER_OT_invert_selection().execute(context) == { 'FINISHED' }
+
+    def run_per_item(import_list):
+        for item in import_list:
+            if item.guid:
+                item.is_selected = not item.is_selected
+
+    with UnitypackageParser(filepath) as parser:
+        bulk_state, per_item_state, update_count = _run_bulk_and_per_item(context, parser, monkeypatch, run_bulk, run_per_item)
+    assert bulk_state == per_item_state
+    assert update_count == 1
+
+
+def test_nested_batch_updates_list_once(context, small_package, monkeypatch):
+    filepath, _ = small_package
+    import_list = context.window_manager.unitypackage_importer_import_list
+    with UnitypackageParser(filepath) as parser:
+        _prepare(context, parser)
+    
+    calls = _count_list_updates(monkeypatch)
+    with batch_import_list_update(context):
+        for item in import_list:
+            item.is_expanded = False
+        with batch_import_list_update(context):
+            for item in import_list:
+                item.is_selected = False
+        assert calls == []
+    
+    # A single full update once the outermost batch is done
+    assert calls == [ (0, len(import_list)) ]
+    assert [ display_item.referenced_item_index for display_item in context.window_manager.unitypackage_importer_import_display_list ] == [
+        item.index for item in import_list if item.parent_index < 0
+    ]
+
+
+def _refresh_catalog(context, directory : str, events : list[str]) -> set[str]:
+    """
+    Runs the refresh catalog operator until it finishes, sending the given events first and timer events afterwards.
+    Returns the result of the last call.
+
+    """
+    operator = UNITYPACKAGE_IMPORTER_OT_refresh_catalog()
+    operator.directory = directory
+    assert operator.execute(context) == { 'RUNNING_MODAL' }
+    assert context.window_manager.modal_handlers == [ operator ]
+    
+    events = iter(events)
+    while (result := operator.modal(context, types.SimpleNamespace(type=next(events, 'TIMER')))) & { 'RUNNING_MODAL', 'PASS_THROUGH' }:
+        pass
+    assert context.workspace.status_text is None
+    return result
+
+
+def test_refresh_catalog(context, small_package, tmp_path, monkeypatch):
+    catalog_filepath = str(tmp_path / 'catalog.sqlite')
+    monkeypatch.setattr(operators, 'Catalog', lambda: Catalog(catalog_filepath))
+    monkeypatch.setattr(operators, 'catalog_refresh_workers', 1)
+    monkeypatch.setattr(operators, '_catalog_query_cache', { ('*', ''): {} })
+    library = tmp_path / 'library'
+    library.mkdir()
+    shutil.copy(small_package[0], library)
+    
+    # Other events are passed through, Blender stays usable while packages are indexed
+    assert _refresh_catalog(context, str(library), [ 'MOUSEMOVE' ]) == { 'FINISHED' }
+    assert operators._catalog_query_cache == {}
+    with Catalog(catalog_filepath) as catalog:
+        assert catalog.get_packages() == [ (str(library / 'small.unitypackage'), len(small_package[1])) ]
+
+
+def test_refresh_catalog_cancelled(context, small_package, tmp_path, monkeypatch):
+    catalog_filepath = str(tmp_path / 'catalog.sqlite')
+    monkeypatch.setattr(operators, 'Catalog', lambda: Catalog(catalog_filepath))
+    library = tmp_path / 'library'
+    library.mkdir()
+    shutil.copy(small_package[0], library)
+    
+    assert _refresh_catalog(context, str(library), [ 'ESC' ]) == { 'CANCELLED' }
+    with Catalog(catalog_filepath) as catalog:
+        assert catalog.get_packages() == []
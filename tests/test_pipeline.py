@@ -0,0 +1,117 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import threading
+import pytest
+from unitypackage_importer.modules.pipeline import ByteBudgetQueue, AssetPrefetcher, PipelineClosed
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+
+
+def _start_put(queue : ByteBudgetQueue, item, size : int) -> threading.Thread:
+    thread = threading.Thread(target=queue.put, args=(item, size), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_byte_budget_blocks_producer():
+    queue = ByteBudgetQueue(100)
+    queue.put('a', 60)
+    
+    # Doesn't fit into the remaining 40 bytes
+    producer = _start_put(queue, 'b', 60)
+    producer.join(0.2)
+    assert producer.is_alive()
+    assert queue.queued_bytes == 60
+
+    # Taking the first item out makes room
+    assert queue.get() == 'a'
+    producer.join(5)
+    assert not producer.is_alive()
+    assert queue.queued_bytes == 60
+    assert queue.get() == 'b'
+    assert queue.queued_bytes == 0
+
+
+def test_oversized_item_is_accepted_into_empty_queue():
+    queue = ByteBudgetQueue(100)
+    queue.put('large', 1000)
+    assert queue.queued_bytes == 1000
+
+    producer = _start_put(queue, 'small', 1)
+    producer.join(0.2)
+    assert producer.is_alive()
+    assert queue.get() == 'large'
+    producer.join(5)
+    assert queue.get() == 'small'
+
+
+def test_close_wakes_blocked_producer():
+    queue = ByteBudgetQueue(10)
+    queue.put('a', 10)
+    errors = []
+    
+    def put():
+        try:
+            queue.put('b', 10)
+        except PipelineClosed as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=put, daemon=True)
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()
+
+    queue.close()
+    producer.join(5)
+    assert not producer.is_alive()
+    assert len(errors) == 1
+    with pytest.raises(PipelineClosed):
+        queue.get()
+
+
+def test_prefetcher_matches_iter_assets_and_stays_within_budget(small_package):
+    filepath, _ = small_package
+    max_bytes = 256 * 1024
+    with UnitypackageParser(filepath) as parser:
+        guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries() ][::3]
+        expected = [ (asset_entry.guid, data) for asset_entry, data in parser.iter_assets(guids) ]
+
+    with UnitypackageParser(filepath) as parser, AssetPrefetcher(parser, guids, max_bytes, hash_contents=True) as prefetcher:
+        result = []
+        for asset_entry, data in prefetcher:
+            # The item being consumed was already taken out, whatever else is staged has to fit into the budget
+            assert prefetcher._queue.queued_bytes <= max_bytes
+            result.append((asset_entry.guid, data))
+    
+    assert result == expected
+
+
+def test_prefetcher_stops_when_consumer_stops_early(small_package):
+    filepath, _ = small_package
+    with UnitypackageParser(filepath) as parser:
+        guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries() ]
+        with AssetPrefetcher(parser, guids, 64 * 1024) as prefetcher:
+            for index, _ in enumerate(prefetcher):
+                if index == 10:
+                    break
+        assert not prefetcher._thread.is_alive()
+
+
+def test_prefetcher_hands_over_exceptions(small_package):
+    filepath, _ = small_package
+    with UnitypackageParser(filepath) as parser, AssetPrefetcher(parser, [ '0' * 32 ], 64 * 1024) as prefetcher:
+        with pytest.raises(Exception):
+            list(prefetcher)
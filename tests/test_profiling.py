@@ -0,0 +1,75 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import json
+import time
+import pytest
+from unitypackage_importer.modules import profiling
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+
+
+@pytest.fixture
+def enabled_profiling():
+    profiling.reset()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled_records_nothing():
+    profiling.reset()
+    with profiling.span('outer'):
+        profiling.count('counter')
+    
+    assert profiling.get_summary() == { 'spans': {}, 'counters': {} }
+
+
+def test_nested_spans(enabled_profiling):
+    with profiling.span('outer'):
+        time.sleep(0.01)
+        for _ in range(2):
+            with profiling.span('inner'):
+                time.sleep(0.01)
+                profiling.count('counter', 2)
+    
+    summary = profiling.get_summary()
+    assert summary['counters'] == { 'counter': 4 }
+    assert summary['spans']['inner']['calls'] == 2
+    outer = summary['spans']['outer']
+    assert outer['self_seconds'] == pytest.approx(outer['total_seconds'] - summary['spans']['inner']['total_seconds'])
+
+
+def test_parser_instrumentation(enabled_profiling, small_package, tmp_path):
+    filepath, pathnames = small_package
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        for guid in list(pathnames)[:10]:
+            parser.get_asset_entry_by_guid(guid).asset
+
+    summary = profiling.get_summary()
+    assert summary['counters']['gzip.bytes_decompressed'] > 0
+    assert summary['counters']['extracted_cache.misses'] == 10
+    assert summary['spans']['parser.extract']['calls'] == 10
+    assert 'UnitypackageParser._init_asset_entries' in summary['spans']
+
+    trace_path = tmp_path / 'trace.json'
+    profiling.export_chrome_trace(str(trace_path))
+    events = json.loads(trace_path.read_text())['traceEvents']
+    assert { event['ph'] for event in events } == { 'X', 'C' }
+
+    json_path = tmp_path / 'profile.json'
+    profiling.export_json(str(json_path))
+    assert json.loads(json_path.read_text())['summary'] == json.loads(json.dumps(profiling.get_summary()))
@@ -0,0 +1,114 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import random
+from unitypackage_importer.modules.search_index import TrigramIndex
+from unitypackage_importer.importing import prepare_direct_import
+from unitypackage_importer.operators import init_import_list_hierarchy, update_import_list, UNITYPACKAGE_IMPORTER_UL_import_list
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser
+
+
+def _random_text(rnd : random.Random) -> str:
+    # Small alphabet, so trigrams are shared by many texts and queries have partial matches
+    return ''.join(rnd.choice('abcAB_.') for _ in range(rnd.randint(0, 12)))
+
+
+def _random_query(rnd : random.Random, texts : list[str]) -> str:
+    text = rnd.choice(texts)
+    if text and rnd.random() < 0.7:
+        start = rnd.randrange(len(text))
+        query = text[start:start + rnd.randint(1, 6)]
+    else:
+        query = _random_text(rnd)[:rnd.randint(0, 6)]
+    # Mixed case, the search ignores it
+    return ''.join(character.upper() if rnd.random() < 0.5 else character.lower() for character in query)
+
+
+def test_search_matches_brute_force():
+    rnd = random.Random(16)
+    texts = [ _random_text(rnd) for _ in range(2000) ]
+    index = TrigramIndex(texts)
+    assert len(index) == len(texts)
+
+    queries = [ _random_query(rnd, texts) for _ in range(500) ] + [ '', 'a', 'Ab', 'aaa', 'AAAA', 'abcabc', 'zzz', 'a_.B' ]
+    for query in queries:
+        expected = [ text_id for text_id, text in enumerate(texts) if query.lower() in text.lower() ]
+        assert index.search(query) == expected, query
+
+
+def test_search_of_names():
+    index = TrigramIndex([ 'Body.png', 'body_normal.PNG', 'Face.fbx', 'Textures', 'AwtterBody.mat' ])
+    assert index.search('body') == [ 0, 1, 4 ]
+    assert index.search('.PNG') == [ 0, 1 ]
+    assert index.search('y.') == [ 0, 4 ]
+    assert index.search('ex') == [ 3 ]
+    assert index.search('body.mat') == [ 4 ]
+    assert index.search('body.fbx') == []
+
+
+def _get_paths(import_list) -> list[str]:
+    paths = []
+    for item in import_list:
+        paths.append(f"{paths[item.parent_index]}/{item.name}" if item.parent_index >= 0 else item.name)
+    return paths
+
+
+def _filter_brute_force(import_list, filter_name : str) -> list[int]:
+    """
+    Reference for UNITYPACKAGE_IMPORTER_UL_import_list.filter_items: flags of all items whose subtree has a path
+    containing every part of the filter (between wildcards).
+
+    """
+    paths = [ path.lower() for path in _get_paths(import_list) ]
+    parts = [ part.lower() for part in filter_name.split('*') if part ]
+    matched = [ all(part in path for part in parts) for path in paths ]
+    flags = []
+    for item in import_list:
+        is_match = any(matched[item.index:item.subtree_end])
+        flags.append(UNITYPACKAGE_IMPORTER_UL_import_list.bitflag_filter_item if is_match else 0)
+    return flags
+
+
+def test_filter_items_matches_brute_force(context, small_package):
+    filepath, _ = small_package
+    with UnitypackageParser(filepath) as parser:
+        prepare_direct_import(context, parser)
+    init_import_list_hierarchy(context)
+    update_import_list(None, context)
+    
+    window_manager = context.window_manager
+    import_list = window_manager.unitypackage_importer_import_list
+    # Every item is expanded, so the display list references every import item in order
+    assert len(window_manager.unitypackage_importer_import_display_list) == len(import_list)
+
+    rnd = random.Random(16)
+    paths = _get_paths(import_list)
+    filter_names = [ 'a', 'Pn', 'ASSETS', 'assets/', '.png', 'TeX', 's/t', '*png', 'folder*.PNG', '**', 'zzz', 'x/y*' ]
+    for _ in range(40):
+        path = rnd.choice(paths)
+        start = rnd.randrange(len(path))
+        query = path[start:start + rnd.randint(1, 10)]
+        filter_names.append(''.join(rnd.choice((character.upper(), character.lower(), '*' if rnd.random() < 0.05 else character)) for character in query))
+    
+    ui_list = UNITYPACKAGE_IMPORTER_UL_import_list()
+    for filter_name in filter_names:
+        ui_list.filter_name = filter_name
+        flags, order = ui_list.filter_items(context, window_manager, 'unitypackage_importer_import_display_list')
+        assert order == []
+        if not filter_name.strip('*'):
+            assert flags == []
+        else:
+            assert flags == _filter_brute_force(import_list, filter_name), filter_name
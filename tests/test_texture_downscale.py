@@ -0,0 +1,54 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import io
+import pytest
+from unitypackage_importer.modules.texture_downscale import downscale_image, get_downscaled_basename, TextureDownscaler
+
+
+def _encode_image(size : tuple[int, int], image_format : str) -> bytes:
+    from PIL import Image
+    output = io.BytesIO()
+    Image.new('RGB', size, (255, 0, 0)).save(output, image_format)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('size, max_size, expected_size', [
+    ((1024, 512), 256, (256, 128)),  # Box filter, integer factor
+    ((1000, 300), 256, (256, 77)),   # Lanczos
+])
+def test_downscale_keeps_aspect_ratio_and_format(size, max_size, expected_size):
+    Image = pytest.importorskip('PIL.Image')
+    data, image_format = downscale_image(_encode_image(size, 'PNG'), max_size)
+    assert image_format == 'PNG'
+    with Image.open(io.BytesIO(data)) as image:
+        assert image.format == 'PNG'
+        assert image.size == expected_size
+
+
+def test_downscaled_basename_matches_format():
+    assert get_downscaled_basename('Body.PNG', 'PNG') == 'Body.PNG'
+    assert get_downscaled_basename('Body.jpeg', 'JPEG') == 'Body.jpeg'
+    assert get_downscaled_basename('Body.rgb', 'PNG') == 'Body.png'
+    assert get_downscaled_basename('Body.tga', 'PNG') == 'Body.png'
+
+
+def test_small_images_are_not_sent_to_workers():
+    pytest.importorskip('PIL.Image')
+    with TextureDownscaler(max_workers=1) as downscaler:
+        assert downscaler.submit(_encode_image((64, 64), 'JPEG'), 256) is None
+        assert downscaler.submit(b'not an image', 256) is None
+        assert downscaler._executor is None
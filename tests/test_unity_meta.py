@@ -0,0 +1,90 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+from unitypackage_importer.modules.unity_meta import parse_importer_settings, TextureImporterSettings, ModelImporterSettings, ALPHA_USAGE_NONE, WRAP_MODE_CLAMP, WRAP_MODE_MIRROR
+
+
+NORMAL_MAP_META = b"""fileFormatVersion: 2
+guid: 0123456789abcdef0123456789abcdef
+TextureImporter:
+  internalIDToNameTable: []
+  serializedVersion: 11
+  mipmaps:
+    mipMapMode: 0
+    sRGBTexture: 0
+    linearTexture: 0
+  bumpmap:
+    convertToNormalMap: 0
+  maxTextureSize: 8192
+  textureSettings:
+    serializedVersion: 2
+    filterMode: 1
+    wrapU: 1
+    wrapV: 2
+  alphaUsage: 0
+  alphaIsTransparency: 0
+  textureType: 1
+  platformSettings:
+  - serializedVersion: 3
+    buildTarget: DefaultTexturePlatform
+    maxTextureSize: 1024
+  spriteSheet:
+    sprites: []
+  userData: 
+  assetBundleName: 
+"""
+
+MODEL_META = b"""fileFormatVersion: 2
+guid: 0123456789abcdef0123456789abcdef
+ModelImporter:
+  serializedVersion: 19301
+  materials:
+    materialImportMode: 1
+  meshes:
+    lODScreenPercentages: []
+    globalScale: 0.01
+    meshCompression: 0
+    useFileScale: 0
+  tangentSpace:
+    normalSmoothAngle: 60
+"""
+
+
+def test_texture_settings():
+    assert parse_importer_settings(NORMAL_MAP_META) == TextureImporterSettings(
+        srgb=False, is_normal_map=True, alpha_usage=ALPHA_USAGE_NONE, alpha_is_transparency=False,
+        wrap_u=WRAP_MODE_CLAMP, wrap_v=WRAP_MODE_MIRROR, max_texture_size=1024
+    )
+
+
+def test_old_texture_settings():
+    # Unity 5 era files: linearTexture, normalMap and a single wrapMode
+    meta = b"TextureImporter:\n  mipmaps:\n    linearTexture: 1\n  bumpmap:\n    convertToNormalMap: 0\n  normalMap: 1\n  textureSettings:\n    wrapMode: 1\n  maxTextureSize: 2048\n"
+    settings = parse_importer_settings(meta)
+    assert not settings.srgb and settings.is_normal_map
+    assert (settings.wrap_u, settings.wrap_v) == (WRAP_MODE_CLAMP, WRAP_MODE_CLAMP)
+    assert settings.max_texture_size == 2048
+
+
+def test_model_settings():
+    assert parse_importer_settings(MODEL_META) == ModelImporterSettings(global_scale=0.01, use_file_scale=False)
+
+
+def test_missing_settings():
+    assert parse_importer_settings(None) is None
+    assert parse_importer_settings(b"fileFormatVersion: 2\nguid: 0123\nDefaultImporter:\n  userData: \n") is None
+    # Fields that aren't there use Unity's defaults
+    assert parse_importer_settings(b"TextureImporter:\n  userData: \n") == TextureImporterSettings()
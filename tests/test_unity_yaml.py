@@ -0,0 +1,174 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import random
+import pytest
+from unityparser import UnityDocument
+from unitypackage_importer.modules.unity_yaml import UnityYamlFile, UnityYamlDocument, get_prefab_instances, get_material, parse_reference
+from unitypackage_generator import generate_unity_yaml
+
+
+MODEL_GUID = '0123456789abcdef0123456789abcdef'
+MATERIAL_GUID = 'fedcba9876543210fedcba9876543210'
+TEXTURE_GUID = 'aaaabbbbccccddddeeeeffff00001111'
+
+
+SPLITTING_YAML = (
+    b"%YAML 1.1\n"
+    b"%TAG !u! tag:unity3d.com,2011:\n"
+    b"--- !u!1 &100\n"
+    b"GameObject:\n"
+    b"  m_Name: '--- !u!1 &200'\n"
+    b"--- !u!4 &-4216859302048453862 stripped\n"
+    b"Transform:\n"
+    b"  m_PrefabInstance: {fileID: 300}\n"
+    b"--- !u!1001 &300\n"
+    b"PrefabInstance:\n"
+    b"  m_ObjectHideFlags: 0"
+)
+
+
+FIELDS_YAML = (
+    b"--- !u!21 &2100000\n"
+    b"Material:\n"
+    b"  m_Name: Body\n"
+    b"  m_NameSuffix: Not the name\n"
+    b"  m_Shader: {fileID: 46, guid: 0000000000000000f000000000000000,\n"
+    b"    type: 0}\n"
+    b"  m_SavedProperties:\n"
+    b"    serializedVersion: 3\n"
+    b"    m_TexEnvs:\n"
+    b"    - _MainTex:\n"
+    b"        m_Texture: {fileID: 0}\n"
+    b"    - _BumpMap:\n"
+    b"        m_Scale: {x: 1, y: 1}\n"
+    b"    m_Floats:\n"
+    b"    - _Cutoff: 0.5\n"
+    b"  m_ValidKeywords: []\n"
+    b"  m_Description: \"quoted: value\"\n"
+    b"  m_Empty: \n"
+)
+
+
+def test_document_splitting():
+    yaml_file = UnityYamlFile(SPLITTING_YAML)
+    assert [ (document.class_id, document.file_id, document.is_stripped) for document in yaml_file.documents ] == [
+        (1, 100, False),
+        (4, -4216859302048453862, True),
+        (1001, 300, False),
+    ]
+    # Bodies start after the header line and end where the next header starts, the last one at the end of the data
+    assert [ SPLITTING_YAML[document.start:document.end] for document in yaml_file.documents ] == [
+        b"GameObject:\n  m_Name: '--- !u!1 &200'\n",
+        b"Transform:\n  m_PrefabInstance: {fileID: 300}\n",
+        b"PrefabInstance:\n  m_ObjectHideFlags: 0",
+    ]
+    assert [ yaml_file.get_class_name(document) for document in yaml_file.documents ] == [ 'GameObject', 'Transform', 'PrefabInstance' ]
+    assert yaml_file.get_document(-4216859302048453862) is yaml_file.documents[1]
+    assert [ document.file_id for document in yaml_file.find_documents(1) ] == [ 100 ]
+    assert yaml_file.get_field(yaml_file.documents[0], 'm_Name') == '--- !u!1 &200'
+    assert yaml_file.get_field(yaml_file.documents[2], 'm_ObjectHideFlags') == '0'
+    assert UnityYamlFile(b"").documents == []
+
+
+def test_get_field():
+    yaml_file = UnityYamlFile(FIELDS_YAML)
+    document = yaml_file.get_document(2100000)
+
+    assert yaml_file.get_field(document, 'm_Name') == 'Body'
+    assert yaml_file.get_field(document, 'm_NameSuffix') == 'Not the name'
+    assert yaml_file.get_field(document, 'm_Shader') == { 'fileID': '46', 'guid': '0000000000000000f000000000000000', 'type': '0' }
+    assert yaml_file.get_field(document, [ 'm_SavedProperties', 'serializedVersion' ]) == '3'
+    assert yaml_file.get_field(document, [ 'm_SavedProperties', 'm_TexEnvs' ]) == [
+        { '_MainTex': { 'm_Texture': { 'fileID': '0' } } },
+        { '_BumpMap': { 'm_Scale': { 'x': '1', 'y': '1' } } },
+    ]
+    assert yaml_file.get_field(document, [ 'm_SavedProperties', 'm_Floats' ]) == [ { '_Cutoff': '0.5' } ]
+    assert yaml_file.get_field(document, 'm_ValidKeywords') == []
+    assert yaml_file.get_field(document, 'm_Description') == 'quoted: value'
+    assert yaml_file.get_field(document, 'm_Empty') is None
+    # Every field matches the fully parsed document
+    parsed = yaml_file.parse_document(document)
+    assert all(yaml_file.get_field(document, name) == value for name, value in parsed.items())
+
+    # Nested fields aren't found at the root level
+    assert yaml_file.get_field(document, 'm_TexEnvs', None) is None
+    assert yaml_file.get_field(document, [ 'm_SavedProperties', 'm_Missing' ], 'default') == 'default'
+    with pytest.raises(KeyError):
+        yaml_file.get_field(document, 'm_Missing')
+
+    # Documents can also cover just a part of a file (like the importer section of an asset.meta file)
+    start = FIELDS_YAML.index(b"  m_SavedProperties:")
+    assert yaml_file.get_field(UnityYamlDocument(0, 0, False, start, len(FIELDS_YAML)), 'm_Name', None) is None
+
+
+def _to_strings(value):
+    """
+    Converts the values unityparser loaded to the form UnityYamlFile returns them in, where all scalars are strings.
+
+    """
+    if isinstance(value, dict):
+        return { key: _to_strings(item) for key, item in value.items() }
+    if isinstance(value, list):
+        return [ _to_strings(item) for item in value ]
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+
+@pytest.mark.parametrize('extension', [ '.prefab', '.mat' ])
+def test_matches_unityparser(tmp_path, extension):
+    data = generate_unity_yaml(random.Random(1), extension, 'Scene', 64 * 1024, { 'model': [ MODEL_GUID ], 'texture': [ TEXTURE_GUID ] })
+    filepath = tmp_path / f"Scene{extension}"
+    filepath.write_bytes(data)
+    entries = UnityDocument.load_yaml(str(filepath)).entries
+    yaml_file = UnityYamlFile(data)
+
+    assert [ (yaml_file.get_class_name(document), str(document.file_id)) for document in yaml_file.documents ] == [ (entry.__class__.__name__, entry.anchor) for entry in entries ]
+    for document, entry in zip(yaml_file.documents, entries):
+        expected = _to_strings({ name: value for name, value in vars(entry).items() if name not in ('anchor', 'extra_anchor_data') })
+        assert yaml_file.parse_document(document) == expected
+        for name, value in expected.items():
+            assert yaml_file.get_field(document, name) == value
+
+
+def test_prefab_instances():
+    data = generate_unity_yaml(random.Random(0), '.prefab', 'Scene', 64 * 1024, { 'model': [ MODEL_GUID ], 'yaml': [ MATERIAL_GUID ] })
+    yaml_file = UnityYamlFile(data)
+    prefab_instances = list(get_prefab_instances(yaml_file))
+    
+    assert prefab_instances
+    assert len(prefab_instances) + len(list(yaml_file.find_documents(1))) == len(yaml_file.documents)
+    for prefab_instance in prefab_instances:
+        assert prefab_instance['source_prefab'] == (100100000, MODEL_GUID, 3)
+        material_modification, name_modification = prefab_instance['modifications']
+        assert parse_reference(material_modification['target']) == (-8679921383154817045, MODEL_GUID, 3) # Flow mapping wrapped over two lines
+        assert parse_reference(material_modification['objectReference']) == (2100000, MATERIAL_GUID, 2)
+        assert name_modification['value'] == f"Scene {prefab_instance['file_id']}"
+
+
+def test_material():
+    data = generate_unity_yaml(random.Random(0), '.mat', 'Body', 0, { 'texture': [ TEXTURE_GUID ] })
+    material = get_material(UnityYamlFile(data))
+
+    assert material['file_id'] == 2100000
+    assert material['name'] == 'Body'
+    assert material['textures'] == [ {
+        'input_name': '_MainTex',
+        'texture': (2800000, TEXTURE_GUID, 3),
+        'scale': { 'x': '1', 'y': '1' },
+        'offset': { 'x': '0', 'y': '0' },
+    } ]
@@ -0,0 +1,334 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import io
+import os
+import gzip
+import random
+import tarfile
+import pytest
+from unitypackage_importer.modules import unitypackage_parser
+from unitypackage_importer.modules.unitypackage_parser import UnitypackageParser, AssetIndex
+from unitypackage_generator import generate_unitypackage, write_unitypackage
+
+
+def read_reference_members(filepath : str) -> dict[str, bytes]:
+    """
+    Reads all members of a package with the standard library, to compare the parser against.
+
+    """
+    with tarfile.open(filepath) as tar:
+        return { member.name: tar.extractfile(member).read() for member in tar if member.isfile() }
+
+
+def test_asset_index_columns():
+    index = AssetIndex()
+    assert index.append('aaaa0000000000000000000000000000', 'Assets/Textures/Body.png', 512, 100, 1024, 20) == 0
+    assert index.append('bbbb0000000000000000000000000000', 'Assets/Textures/Face.PNG', 2048, 200) == 1
+    assert index.append('cccc0000000000000000000000000000', 'Assets/Body.fbx', 4096, 300) == 2
+    
+    assert len(index) == 3
+    assert index.get_guid(1) == 'bbbb0000000000000000000000000000'
+    assert index.find_row('cccc0000000000000000000000000000') == 2
+    assert index.dirnames == [ 'Assets/Textures', 'Assets' ]
+    assert index.extensions == [ '.png', '.PNG', '.fbx' ]
+    assert list(index.dirname_ids) == [ 0, 0, 1 ]
+    assert index.pathnames[1][index.basename_offsets[1]:] == 'Face.PNG'
+    assert list(index.meta_offsets) == [ 1024, -1, -1 ] and list(index.meta_sizes) == [ 20, 0, 0 ]
+
+    with pytest.raises(ValueError):
+        index.append('aaaa0000000000000000000000000000', 'Assets/Duplicate.png', 0, 0)
+    with pytest.raises(ValueError):
+        index.append('not a guid', 'Assets/Invalid.png', 0, 0)
+    with pytest.raises(KeyError):
+        index.find_row('dddd0000000000000000000000000000')
+    with pytest.raises(KeyError):
+        index.find_row('not a guid')
+
+
+@pytest.mark.parametrize('package', [ 'small_package', 'uncompressed_package' ])
+def test_index_contains_all_entries(request, package):
+    filepath, pathnames = request.getfixturevalue(package)
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        assert { asset_entry.guid: asset_entry.pathname for asset_entry in parser.get_asset_entries() } == pathnames
+
+
+@pytest.mark.parametrize('package', [ 'small_package', 'uncompressed_package' ])
+def test_index_takes_single_decompression_pass(request, package):
+    filepath, _ = request.getfixturevalue(package)
+    with UnitypackageParser(filepath, read_asset_meta=True, use_index_cache=False) as parser:
+        assert parser.get_stats()['decompression_passes'] == 1
+
+
+def test_pathnames_are_read_regardless_of_member_order(tmp_path):
+    filepath = str(tmp_path / 'member_order.unitypackage')
+    write_unitypackage(filepath, {
+        'aaaa0000000000000000000000000000/pathname': b'Assets/first.txt\n00', # Some versions of Unity add a second line
+        'aaaa0000000000000000000000000000/asset': b'first',
+        'bbbb0000000000000000000000000000/asset': b'second',
+        'bbbb0000000000000000000000000000/asset.meta': b'fileFormatVersion: 2\n',
+        'bbbb0000000000000000000000000000/pathname': 'Assets/zweite Datei \u00e4.txt'.encode('utf-8'),
+        'cccc0000000000000000000000000000/pathname': b'Assets/Folder', # Folders have no asset
+    })
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        assert parser.get_stats()['decompression_passes'] == 1
+        assert { asset_entry.guid: asset_entry.pathname for asset_entry in parser.get_asset_entries() } == {
+            'aaaa0000000000000000000000000000': 'Assets/first.txt',
+            'bbbb0000000000000000000000000000': 'Assets/zweite Datei \u00e4.txt',
+        }
+        assert parser.get_asset_entry_by_guid('bbbb0000000000000000000000000000').asset == b'second'
+
+
+def test_extracted_data_matches_archive(small_package):
+    filepath, pathnames = small_package
+    reference = read_reference_members(filepath)
+    guids = list(pathnames)[:200]
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        for guid in reversed(guids):
+            asset_entry = parser.get_asset_entry_by_guid(guid)
+            assert asset_entry.asset == reference[f"{guid}/asset"]
+            assert asset_entry.asset_meta == reference[f"{guid}/asset.meta"]
+
+        extracted = dict(parser.iter_assets(guids))
+        assert { asset_entry.guid: data for asset_entry, data in extracted.items() } == { guid: reference[f"{guid}/asset"] for guid in guids }
+
+        for guid in guids[:20]:
+            with parser.open_asset(guid) as f:
+                assert f.read() == reference[f"{guid}/asset"]
+            output = io.BytesIO()
+            assert parser.copy_asset_to(guid, output) == len(reference[f"{guid}/asset"])
+
+
+def test_iter_assets_extracts_in_archive_order(small_package):
+    filepath, pathnames = small_package
+    reference = read_reference_members(filepath)
+    with open(filepath, 'rb') as f:
+        uncompressed_size = len(gzip.decompress(f.read()))
+    guids = list(pathnames)
+    random.Random(0).shuffle(guids)
+    
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        before = parser.get_stats()['bytes_decompressed']
+        extracted = list(parser.iter_assets(guids))
+        
+        offsets = [ asset_entry.get_member('asset').offset_data for asset_entry, _ in extracted ]
+        assert offsets == sorted(offsets)
+        assert all(data == reference[f"{asset_entry.guid}/asset"] for asset_entry, data in extracted)
+        # A single sweep through the archive, not one per asset
+        assert parser.get_stats()['bytes_decompressed'] - before <= uncompressed_size
+
+
+@pytest.mark.parametrize('package', [ 'small_package', 'uncompressed_package' ])
+def test_streamed_reads_match_archive(request, package):
+    filepath, pathnames = request.getfixturevalue(package)
+    reference = read_reference_members(filepath)
+    rnd = random.Random(13)
+    # The largest assets, interleaved so every read has to seek the shared archive file object elsewhere
+    guids = sorted(pathnames, key=lambda guid: len(reference[f"{guid}/asset"]))[-4:]
+    
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        streams = { guid: parser.open_asset(guid) for guid in guids }
+        for _ in range(200):
+            guid = rnd.choice(guids)
+            data = reference[f"{guid}/asset"]
+            stream = streams[guid]
+            
+            if rnd.random() < 0.3:
+                position = stream.seek(rnd.randrange(len(data) + 10))
+            elif rnd.random() < 0.1:
+                position = stream.seek(-rnd.randint(1, len(data)), io.SEEK_END)
+            else:
+                position = stream.tell()
+            size = rnd.randint(0, 64 * 1024)
+            assert stream.read(size) == data[position:position + size]
+            assert stream.tell() == min(position + size, max(position, len(data)))
+
+        for guid, stream in streams.items():
+            stream.seek(0)
+            assert stream.read() == reference[f"{guid}/asset"]
+            with pytest.raises((ValueError, OSError)):
+                stream.seek(-1)
+            stream.close()
+        
+        # Streaming doesn't fill the cache
+        assert parser.get_stats()['cache_bytes'] == 0
+
+
+def test_copy_asset_to(small_package, tmp_path):
+    filepath, pathnames = small_package
+    reference = read_reference_members(filepath)
+    guid = max(pathnames, key=lambda guid: len(reference[f"{guid}/asset"]))
+    
+    with UnitypackageParser(filepath) as parser:
+        destination = tmp_path / 'asset'
+        assert parser.copy_asset_to(guid, str(destination)) == len(reference[f"{guid}/asset"])
+        assert destination.read_bytes() == reference[f"{guid}/asset"]
+        
+        buffer = io.BytesIO()
+        assert parser.copy_asset_to(guid, buffer, 'asset_meta') == len(reference[f"{guid}/asset.meta"])
+        assert buffer.getvalue() == reference[f"{guid}/asset.meta"]
+
+        # Cached data is returned from memory
+        parser.get_asset_entry_by_guid(guid).get_value('asset_meta')
+        assert isinstance(parser.open_asset(guid, 'asset_meta'), io.BytesIO)
+        with pytest.raises(KeyError):
+            parser.open_asset('0' * 32)
+
+
+def test_get_asset_entries_by_extension_ignores_case(small_package):
+    filepath, pathnames = small_package
+    expected = { guid for guid, pathname in pathnames.items() if pathname.lower().endswith('.png') }
+    with UnitypackageParser(filepath) as parser:
+        assert { asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension('.png') } == expected
+        assert { asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension(['.PNG']) } == expected
+
+
+def _query_brute_force(pathnames : dict[str, str], extensions = None, prefix = None, dirname = None) -> set[str]:
+    result = set()
+    for guid, pathname in pathnames.items():
+        if extensions is not None and os.path.splitext(pathname)[1].lower() not in { extension.lower() for extension in extensions }:
+            continue
+        if prefix is not None and not pathname.lower().startswith(prefix.lower()):
+            continue
+        if dirname is not None and os.path.dirname(pathname).lower() != dirname.rstrip('/').lower():
+            continue
+        result.add(guid)
+    return result
+
+
+def test_query_asset_entries_matches_brute_force(small_package):
+    filepath, pathnames = small_package
+    rnd = random.Random(6)
+    dirnames = sorted({ os.path.dirname(pathname) for pathname in pathnames.values() })
+    extensions = sorted({ os.path.splitext(pathname)[1] for pathname in pathnames.values() })
+    prefixes = [ 'Assets/', 'assets/', 'Nonexistent/', '' ] + [ pathname[:rnd.randint(1, len(pathname))] for pathname in rnd.sample(sorted(pathnames.values()), 10) ]
+
+    queries = [ { 'extensions': [ extension ] } for extension in extensions ]
+    queries += [ { 'extensions': [ extension.upper() for extension in extensions[:2] ] }, { 'extensions': [ '.doesnotexist' ] } ]
+    queries += [ { 'dirname': dirname } for dirname in rnd.sample(dirnames, min(10, len(dirnames))) ]
+    queries += [ { 'dirname': dirnames[-1].upper() + '/' } ]
+    queries += [ { 'prefix': prefix } for prefix in prefixes ]
+    queries += [ { 'extensions': [ extension ], 'dirname': dirname } for extension, dirname in zip(extensions, rnd.sample(dirnames, len(extensions))) ]
+    queries += [ { 'extensions': [ extension ], 'prefix': prefix } for extension, prefix in zip(extensions, prefixes) ]
+    queries += [ { 'prefix': 'Assets/', 'dirname': dirname } for dirname in dirnames[:3] ]
+
+    with UnitypackageParser(filepath) as parser:
+        for query in queries:
+            guids = [ asset_entry.guid for asset_entry in parser.query_asset_entries(**query) ]
+            assert len(guids) == len(set(guids)), query
+            assert set(guids) == _query_brute_force(pathnames, **query), query
+
+
+def test_prefix_rows_are_sorted_by_path(small_package):
+    filepath, pathnames = small_package
+    with UnitypackageParser(filepath) as parser:
+        found = [ asset_entry.pathname.lower() for asset_entry in parser.query_asset_entries(prefix='ASSETS/') ]
+    assert found == sorted(pathname.lower() for pathname in pathnames.values() if pathname.lower().startswith('assets/'))
+
+
+def test_index_cache_skips_reading_archive(small_package, monkeypatch):
+    filepath, pathnames = small_package
+    monkeypatch.setattr(unitypackage_parser, 'gzip_background_checkpoints', False)
+    with UnitypackageParser(filepath) as parser:
+        pass
+    with UnitypackageParser(filepath) as parser:
+        # Only the first header is read when opening the archive
+        assert parser.get_stats()['compressed_bytes_read'] < os.path.getsize(filepath) / 10
+        assert { asset_entry.guid: asset_entry.pathname for asset_entry in parser.get_asset_entries() } == pathnames
+
+
+def test_late_asset_extraction_after_warm_open(small_package, monkeypatch):
+    filepath, pathnames = small_package
+    reference = read_reference_members(filepath)
+    monkeypatch.setattr(unitypackage_parser, 'gzip_checkpoint_span', 1024 * 1024)
+    UnitypackageParser(filepath).close() # Populate cache
+
+    with UnitypackageParser(filepath) as parser:
+        parser.wait_for_checkpoints()
+        stats = parser.get_stats()
+        assert stats['checkpoints'] > 1
+        
+        last_asset_entry = max(parser.get_asset_entries(), key=lambda asset_entry: asset_entry.get_member('asset').offset_data)
+        assert last_asset_entry.read_value('asset') == reference[f"{last_asset_entry.guid}/asset"]
+        # Resumed from the checkpoint right before it, instead of decompressing the archive from the start
+        new_stats = parser.get_stats()
+        assert new_stats['decompression_passes'] == stats['decompression_passes']
+        assert new_stats['bytes_decompressed'] - stats['bytes_decompressed'] <= 2 * 1024 * 1024
+
+
+def test_sweep_right_after_warm_open(small_package, monkeypatch):
+    filepath, pathnames = small_package
+    reference = read_reference_members(filepath)
+    monkeypatch.setattr(unitypackage_parser, 'gzip_checkpoint_span', 1024 * 1024)
+    UnitypackageParser(filepath).close() # Populate cache
+    uncompressed_size = sum(len(data) for data in reference.values())
+
+    # Checkpoints are built on their own decompressor, they don't drag the sweep back to where they are
+    with UnitypackageParser(filepath) as parser:
+        for asset_entry, data in parser.iter_assets(pathnames):
+            assert data == reference[f"{asset_entry.guid}/asset"]
+        stats = parser.get_stats()
+        assert stats['decompression_passes'] == 1
+        assert stats['bytes_decompressed'] < 2 * uncompressed_size
+
+
+def test_extraction_while_checkpoints_are_built(small_package):
+    filepath, pathnames = small_package
+    reference = read_reference_members(filepath)
+    UnitypackageParser(filepath).close() # Populate cache
+
+    with UnitypackageParser(filepath) as parser:
+        for guid in reversed(list(pathnames)[::50]):
+            assert parser.get_asset_entry_by_guid(guid).read_value('asset') == reference[f"{guid}/asset"]
+
+
+def test_repeated_reads_come_from_cache(small_package):
+    filepath, pathnames = small_package
+    with UnitypackageParser(filepath) as parser:
+        asset_entries = [ parser.get_asset_entry_by_guid(guid) for guid in list(pathnames)[:20] ]
+        first = [ asset_entry.asset for asset_entry in asset_entries ]
+        stats = parser.get_stats()
+        assert [ asset_entry.asset for asset_entry in asset_entries ] == first
+        
+        # Nothing was read from the archive again
+        assert parser.get_stats()['bytes_decompressed'] == stats['bytes_decompressed']
+        assert parser.get_stats()['cache_hits'] - stats['cache_hits'] == len(asset_entries)
+
+
+def test_extracted_data_cache_is_bounded(uncompressed_package):
+    filepath, pathnames = uncompressed_package
+    with UnitypackageParser(filepath, use_index_cache=False, cache_max_bytes=256 * 1024) as parser:
+        for guid in pathnames:
+            parser.get_asset_entry_by_guid(guid).asset
+        stats = parser.get_stats()
+        assert stats['cache_bytes'] <= 256 * 1024
+        assert stats['cache_evictions'] > 0
+
+
+def test_preview_offsets_survive_index_cache(tmp_path):
+    filepath = str(tmp_path / 'previews.unitypackage')
+    pathnames = generate_unitypackage(filepath, entry_count=50, with_preview=True, seed=5)
+    guid = next(iter(pathnames))
+    with tarfile.open(filepath) as tar:
+        expected = tar.extractfile(f"{guid}/preview.png").read()
+
+    for _ in range(2):
+        # Second time around, the index comes from the cache
+        with UnitypackageParser(filepath) as parser:
+            asset_entry = parser.get_asset_entry_by_guid(guid)
+            assert asset_entry.has_keys('preview')
+            assert asset_entry.get_value('preview') == expected
+            assert len(list(parser.iter_assets(pathnames, 'preview'))) == len(pathnames)
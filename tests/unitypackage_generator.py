@@ -0,0 +1,263 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Generates synthetic .unitypackage files for tests and benchmarks.
+Can also be run as a script, see --help.
+
+"""
+import io
+import math
+import zlib
+import gzip
+import struct
+import random
+import tarfile
+import argparse
+from typing import List, Union
+
+
+# Relative amount of each kind of asset in a generated package, with the extensions used for them
+DEFAULT_MIX = { 'texture': 0.4, 'model': 0.1, 'yaml': 0.3, 'other': 0.2 }
+EXTENSIONS = {
+    'texture': [ '.png', '.jpg', '.tga', '.PNG' ],
+    'model': [ '.fbx', '.glb' ],
+    'yaml': [ '.mat', '.prefab', '.unity', '.asset' ],
+    'other': [ '.cs', '.shader', '.txt' ],
+}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+_PREVIEW_SIZE = 16
+
+_YAML_HEADER = "%YAML 1.1\n%TAG !u! tag:unity3d.com,2011:\n"
+
+_MATERIAL_DOCUMENT = """--- !u!21 &2100000
+Material:
+  serializedVersion: 6
+  m_ObjectHideFlags: 0
+  m_Name: {name}
+  m_Shader: {{fileID: 46, guid: 0000000000000000f000000000000000, type: 0}}
+  m_ShaderKeywords: _NORMALMAP
+  stringTagMap: {{}}
+  m_SavedProperties:
+    serializedVersion: 3
+    m_TexEnvs:
+    - _MainTex:
+        m_Texture: {{fileID: 2800000, guid: {texture_guid}, type: 3}}
+        m_Scale: {{x: 1, y: 1}}
+        m_Offset: {{x: 0, y: 0}}
+    m_Floats:
+    - _Cutoff: 0.5
+    m_Colors:
+    - _Color: {{r: 1, g: 1, b: 1, a: 1}}
+"""
+
+_PREFAB_INSTANCE_DOCUMENT = """--- !u!1001 &{file_id}
+PrefabInstance:
+  m_ObjectHideFlags: 0
+  serializedVersion: 2
+  m_Modification:
+    m_TransformParent: {{fileID: 0}}
+    m_Modifications:
+    - target: {{fileID: -8679921383154817045, guid: {model_guid},
+        type: 3}}
+      propertyPath: m_Materials.Array.data[0]
+      value: 
+      objectReference: {{fileID: 2100000, guid: {material_guid}, type: 2}}
+    - target: {{fileID: 919132149155446097, guid: {model_guid}, type: 3}}
+      propertyPath: m_Name
+      value: '{name}'
+      objectReference: {{fileID: 0}}
+    m_RemovedComponents: []
+  m_SourcePrefab: {{fileID: 100100000, guid: {model_guid}, type: 3}}
+"""
+
+_GAME_OBJECT_DOCUMENT = """--- !u!1 &{file_id}
+GameObject:
+  m_ObjectHideFlags: 0
+  m_Component:
+  - component: {{fileID: {component_id}}}
+  m_Layer: 0
+  m_Name: {name}
+  m_TagString: Untagged
+  m_IsActive: 1
+"""
+
+
+def generate_unity_yaml(rnd : random.Random, extension : str, name : str, size : int, guids_by_kind : dict[str, List[str]]) -> bytes:
+    """
+    Generates a Unity YAML asset of roughly the given size, referencing random assets from guids_by_kind.
+    Materials reference a texture, everything else is a scene-like sequence of GameObjects and PrefabInstances.
+
+    """
+    def random_guid(kind):
+        guids = guids_by_kind.get(kind)
+        return rnd.choice(guids) if guids else '%032x' % rnd.getrandbits(128)
+
+    if extension == '.mat':
+        return (_YAML_HEADER + _MATERIAL_DOCUMENT.format(name=name, texture_guid=random_guid('texture'))).encode('utf-8')
+
+    parts = [ _YAML_HEADER ]
+    length = len(_YAML_HEADER)
+    file_id = 100
+    while length < size:
+        if rnd.random() < 0.3:
+            document = _PREFAB_INSTANCE_DOCUMENT.format(file_id=file_id, name=f"{name} {file_id}", model_guid=random_guid('model'), material_guid=random_guid('yaml'))
+        else:
+            document = _GAME_OBJECT_DOCUMENT.format(file_id=file_id, component_id=file_id + 1, name=f"{name} {file_id}")
+        parts.append(document)
+        length += len(document)
+        file_id += 2
+
+    return ''.join(parts).encode('utf-8')
+
+
+def _png_chunk(chunk_type : bytes, data : bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def encode_png(width : int, height : int, pixels : bytes) -> bytes:
+    """
+    Encodes 8 bit RGBA pixel data (rows from top to bottom) as PNG.
+
+    """
+    stride = width * 4
+    # Every row gets filter type 0 (None), the test images are far too small for filtering to matter
+    rows = [ b'\x00' + pixels[y * stride:(y + 1) * stride] for y in range(height) ]
+    
+    chunks = [
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)),
+        _png_chunk(b'IDAT', zlib.compress(b''.join(rows))),
+        _png_chunk(b'IEND', b''),
+    ]
+    return _PNG_SIGNATURE + b''.join(chunks)
+
+
+def write_unitypackage(filepath : str, members : dict[str, bytes], compression_level : int = 6):
+    """
+    Writes a .unitypackage file with exactly the given { member name: data } members, in the given order.
+    Directory members aren't added, Unity doesn't need them either. For hand-made edge cases in tests.
+
+    """
+    raw_file = open(filepath, 'wb')
+    fileobj = gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=compression_level, mtime=0) if compression_level else raw_file
+    try:
+        with tarfile.open(fileobj=fileobj, mode='w|', format=tarfile.GNU_FORMAT) as tar:
+            for name, data in members.items():
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(data)
+                tar.addfile(tarinfo, io.BytesIO(data))
+    finally:
+        if fileobj is not raw_file:
+            fileobj.close()
+        raw_file.close()
+
+
+def generate_unitypackage(
+        filepath : str, entry_count : int = 1000, min_size : int = 256, max_size : int = 256 * 1024,
+        compression_level : int = 6, mix : Union[dict[str, float], None] = None, with_meta : bool = True,
+        with_preview : bool = False, duplicate_ratio : float = 0.0, seed : int = 0
+    ) -> dict[str, str]:
+    """
+    Writes a .unitypackage file with entry_count asset entries to filepath.
+    Asset sizes are log-uniformly distributed between min_size and max_size, so there are many small and few large assets like in real packages.
+    mix sets the relative amount of each kind of asset (see DEFAULT_MIX). Binary assets are random bytes,
+    Unity YAML assets reference other assets of the package by GUID.
+    with_preview adds preview.png thumbnails (in a single random color) to every entry.
+    duplicate_ratio is the chance of a texture or other binary asset having the exact same contents as an earlier one of its kind.
+    A compression_level of 0 writes an uncompressed tar file, otherwise the archive is gzip-compressed with that level.
+    Returns a dictionary of { guid: pathname } of all generated entries.
+
+    """
+    rnd = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix.keys())
+    weights = [ mix[kind] for kind in kinds ]
+
+    # Decide on all entries first, so YAML assets can reference any of them
+    entries = []
+    guids_by_kind = {}
+    for index in range(entry_count):
+        guid = '%032x' % rnd.getrandbits(128)
+        kind = rnd.choices(kinds, weights)[0]
+        extension = rnd.choice(EXTENSIONS[kind])
+        pathname = f"Assets/Folder{index % 23}/Sub{index % 7}/Asset_{index}{extension}"
+        size = int(math.exp(rnd.uniform(math.log(min_size), math.log(max_size))))
+        entries.append((guid, kind, extension, pathname, size))
+        guids_by_kind.setdefault(kind, []).append(guid)
+
+    raw_file = open(filepath, 'wb')
+    fileobj = gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=compression_level, mtime=0) if compression_level else raw_file
+    try:
+        with tarfile.open(fileobj=fileobj, mode='w|', format=tarfile.GNU_FORMAT) as tar:
+            def add_member(name, data):
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(data)
+                tar.addfile(tarinfo, io.BytesIO(data))
+
+            binary_assets_by_kind = {}
+            for guid, kind, extension, pathname, size in entries:
+                directory = tarfile.TarInfo(guid)
+                directory.type = tarfile.DIRTYPE
+                tar.addfile(directory)
+
+                if kind == 'yaml':
+                    asset = generate_unity_yaml(rnd, extension, pathname.rsplit('/', 1)[1], size, guids_by_kind)
+                elif duplicate_ratio and binary_assets_by_kind.get(kind) and rnd.random() < duplicate_ratio:
+                    asset = rnd.choice(binary_assets_by_kind[kind])
+                elif kind == 'texture':
+                    asset = _PNG_SIGNATURE + rnd.randbytes(max(size - len(_PNG_SIGNATURE), 0))
+                else:
+                    asset = rnd.randbytes(size)
+                if kind != 'yaml' and duplicate_ratio:
+                    binary_assets_by_kind.setdefault(kind, []).append(asset)
+                
+                add_member(f"{guid}/asset", asset)
+                if with_meta:
+                    add_member(f"{guid}/asset.meta", f"fileFormatVersion: 2\nguid: {guid}\n".encode('utf-8'))
+                add_member(f"{guid}/pathname", pathname.encode('utf-8'))
+                if with_preview:
+                    color = rnd.randbytes(3) + b'\xff'
+                    add_member(f"{guid}/preview.png", encode_png(_PREVIEW_SIZE, _PREVIEW_SIZE, color * (_PREVIEW_SIZE * _PREVIEW_SIZE)))
+    finally:
+        if fileobj is not raw_file:
+            fileobj.close()
+        raw_file.close()
+
+    return { guid: pathname for guid, _, _, pathname, _ in entries }
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description="Generate a synthetic .unitypackage file.")
+    argument_parser.add_argument('filepath')
+    argument_parser.add_argument('--entries', type=int, default=1000)
+    argument_parser.add_argument('--min-size', type=int, default=256)
+    argument_parser.add_argument('--max-size', type=int, default=256 * 1024)
+    argument_parser.add_argument('--compression-level', type=int, default=6)
+    argument_parser.add_argument('--mix', default=None, help="Relative amounts of asset kinds, for example 'texture=4,model=1,yaml=3,other=2'")
+    argument_parser.add_argument('--duplicate-ratio', type=float, default=0.0, help="Chance of binary assets duplicating the contents of earlier ones")
+    argument_parser.add_argument('--seed', type=int, default=0)
+    arguments = argument_parser.parse_args()
+
+    mix = None
+    if arguments.mix:
+        mix = { kind: float(amount) for kind, amount in (part.split('=') for part in arguments.mix.split(',')) }
+
+    generate_unitypackage(
+        arguments.filepath, arguments.entries, arguments.min_size, arguments.max_size,
+        arguments.compression_level, mix, duplicate_ratio=arguments.duplicate_ratio, seed=arguments.seed
+    )
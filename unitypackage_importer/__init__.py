@@ -32,47 +32,64 @@ bl_info = {
 Import models (meshes + textures) from scenes in .unitypackage files.
 
 """
-import bpy
-from bpy.props import CollectionProperty
-from .operators import *
+try:
+    import bpy
+except ModuleNotFoundError:
+    # Not running inside of Blender, only the modules package can be used then.
+    # This is the case in worker processes (see modules/dependency_graph.py and modules/texture_downscale.py): they're spawned
+    # without bpy, and unpickling a worker function imports its package (this file) first, wherever the function is defined.
+    bpy = None
 
 
-classes = (
-    UNITYPACKAGE_IMPORTER_PG_import_list_item,
-    UNITYPACKAGE_IMPORTER_PG_import_display_list_item,
-    UNITYPACKAGE_IMPORTER_UL_import_list,
-    UNITYPACKAGE_IMPORTER_OT_select_all,
-    UNITYPACKAGE_IMPORTER_OT_deselect_all,
-    UNITYPACKAGE_IMPORTER_OT_import_unitypackage,
-    UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal,
-)
+if bpy:
+    from bpy.props import CollectionProperty
+    from .operators import *
 
 
-def import_unitypackage_menu_draw(self, context):
-    # Draw function for operator in import menu
-    self.layout.operator(UNITYPACKAGE_IMPORTER_OT_import_unitypackage.bl_idname, text="Import from Unitypackage")
+    classes = (
+        UNITYPACKAGE_IMPORTER_PG_import_list_item,
+        UNITYPACKAGE_IMPORTER_PG_import_display_list_item,
+        UNITYPACKAGE_IMPORTER_UL_import_list,
+        UNITYPACKAGE_IMPORTER_OT_select_all,
+        UNITYPACKAGE_IMPORTER_OT_deselect_all,
+        UNITYPACKAGE_IMPORTER_OT_select_by_extension,
+        UNITYPACKAGE_IMPORTER_OT_select_subtree,
+        UNITYPACKAGE_IMPORTER_OT_select_dependencies,
+        UNITYPACKAGE_IMPORTER_OT_invert_selection,
+        UNITYPACKAGE_IMPORTER_OT_import_unitypackage,
+        UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal,
+        UNITYPACKAGE_IMPORTER_OT_refresh_catalog,
+        UNITYPACKAGE_IMPORTER_OT_import_from_catalog,
+        UNITYPACKAGE_IMPORTER_OT_run_import,
+    )
 
 
-def register():
-    from bpy.utils import register_class
-    for cls in classes:
-        register_class(cls)
+    def import_unitypackage_menu_draw(self, context):
+        # Draw function for operator in import menu
+        self.layout.operator(UNITYPACKAGE_IMPORTER_OT_import_unitypackage.bl_idname, text="Import from Unitypackage")
+        self.layout.operator(UNITYPACKAGE_IMPORTER_OT_import_from_catalog.bl_idname, text="Import from Unitypackage Catalog")
+        self.layout.operator(UNITYPACKAGE_IMPORTER_OT_refresh_catalog.bl_idname, text="Refresh Unitypackage Catalog")
 
-    bpy.types.WindowManager.unitypackage_importer_import_list = CollectionProperty(type=UNITYPACKAGE_IMPORTER_PG_import_list_item)
-    bpy.types.WindowManager.unitypackage_importer_import_display_list = CollectionProperty(type=UNITYPACKAGE_IMPORTER_PG_import_display_list_item)
-    bpy.types.WindowManager.unitypackage_importer_import_display_list_index = IntProperty(default = 0)
 
-    bpy.types.TOPBAR_MT_file_import.append(import_unitypackage_menu_draw)
+    def register():
+        from bpy.utils import register_class
+        for cls in classes:
+            register_class(cls)
 
+        bpy.types.WindowManager.unitypackage_importer_import_list = CollectionProperty(type=UNITYPACKAGE_IMPORTER_PG_import_list_item)
+        bpy.types.WindowManager.unitypackage_importer_import_display_list = CollectionProperty(type=UNITYPACKAGE_IMPORTER_PG_import_display_list_item)
+        bpy.types.WindowManager.unitypackage_importer_import_display_list_index = IntProperty(default = 0)
 
-def unregister():
-    bpy.types.TOPBAR_MT_file_import.remove(import_unitypackage_menu_draw)
-    
-    del bpy.types.WindowManager.unitypackage_importer_import_list
-    del bpy.types.WindowManager.unitypackage_importer_import_display_list
-    del bpy.types.WindowManager.unitypackage_importer_import_display_list_index
+        bpy.types.TOPBAR_MT_file_import.append(import_unitypackage_menu_draw)
 
-    from bpy.utils import unregister_class
-    for cls in reversed(classes):
-        unregister_class(cls)
 
+    def unregister():
+        bpy.types.TOPBAR_MT_file_import.remove(import_unitypackage_menu_draw)
+
+        del bpy.types.WindowManager.unitypackage_importer_import_list
+        del bpy.types.WindowManager.unitypackage_importer_import_display_list
+        del bpy.types.WindowManager.unitypackage_importer_import_display_list_index
+
+        from bpy.utils import unregister_class
+        for cls in reversed(classes):
+            unregister_class(cls)
@@ -14,12 +14,55 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 # ##### END GPL LICENSE BLOCK #####
+import os
 import logging
 
 # Log level for loggers to use.
 # Set to logging.DEBUG for development and logging.INFO for release version.
 log_level = logging.DEBUG
 
+# Record timing spans and counters (see modules/profiling.py).
+# When enabled, a Chrome trace of every import is written to Blender's temp directory.
+profiling_enabled = False
+
+# Distance (in uncompressed bytes) between decompressor checkpoints recorded while reading a .unitypackage file.
+# Smaller values make extracting arbitrary assets faster, at the cost of roughly 100 KiB of memory per checkpoint.
+gzip_checkpoint_span = 16 * 1024 * 1024
+
+# Rebuild decompressor checkpoints on a background thread after a .unitypackage's index was loaded from the index cache.
+# Checkpoints can't be stored in the cache, without them the first extraction of a late asset would decompress everything before it.
+gzip_background_checkpoints = True
+
+# Maximum total size of the on-disk cache for .unitypackage indexes.
+# Least recently used indexes are removed once this is exceeded.
+index_cache_max_size = 64 * 1024 * 1024
+
+# Maximum amount of extracted asset data (in bytes) staged by the background extraction thread during import.
+prefetch_max_bytes = 256 * 1024 * 1024
+
+# Maximum amount of extracted asset data (in bytes) a .unitypackage parser keeps in memory for repeated access.
+# Least recently used data is dropped once this is exceeded and extracted again when it's needed the next time.
+extracted_cache_max_bytes = 512 * 1024 * 1024
+
+# Extracted archive members up to this size (asset.meta files, most Unity YAML documents) are always kept in memory.
+extracted_cache_pin_max_size = 64 * 1024
+
+# Maximum total size of the pinned members above. Once reached, further small members are cached (and evicted) like large ones,
+# so packages with huge numbers of small members can't grow the cache without bound.
+extracted_cache_pin_max_bytes = 64 * 1024 * 1024
+
+# Maximum number of asset thumbnails (from preview.png members) kept loaded for the import list.
+# Least recently drawn thumbnails are released once this is exceeded and loaded again when they're drawn the next time.
+thumbnail_cache_max_count = 256
+
+# Number of worker processes downscaling textures during import, if enabled (None for the number of CPUs).
+# Downscaling requires the Pillow package, see modules/texture_downscale.py.
+texture_downscale_workers = None
+
+# Number of worker processes indexing packages when the catalog is refreshed from Blender.
+# One CPU is left for Blender itself, which keeps storing results and redrawing while the packages are indexed.
+catalog_refresh_workers = max(1, (os.cpu_count() or 1) - 1)
+
 # List of texture file extensions blender supports.
 # See https://docs.blender.org/manual/en/latest/files/media/image_formats.html
 texture_file_extensions = [
@@ -36,7 +79,22 @@ texture_file_extensions = [
     '.webp'                # WebP
 ]
 
+# Texture file extensions of formats that store floating point (linear) color data.
+float_texture_file_extensions = [
+    '.exr',                # OpenEXR
+    '.hdr',                # Radiance HDR
+]
+
 # List of supported model formats that can be imported.
 model_file_extensions = [
     '.fbx', '.glb', '.gltf'
-]
\ No newline at end of file
+]
+
+# List of asset file extensions Unity serializes as text (YAML), which can reference other assets by GUID.
+unity_yaml_file_extensions = [
+    '.unity', '.prefab', '.mat', '.asset',
+    '.controller', '.overrideController', '.anim', '.mask',
+    '.physicMaterial', '.playable', '.lighting', '.mixer',
+    '.flare', '.renderTexture', '.spriteatlas', '.shadervariants',
+    '.terrainlayer', '.guiskin', '.fontsettings', '.cubemap', '.signal'
+]
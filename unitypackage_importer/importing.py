@@ -16,16 +16,24 @@
 # ##### END GPL LICENSE BLOCK #####
 import io
 import os
+import re
 import bpy
+import shutil
+import time
 import logging
+from collections import deque
 from pathlib import PurePosixPath
-from .config import log_level, texture_file_extensions, model_file_extensions
+from typing import Union, BinaryIO, Generator
+from .config import log_level, texture_file_extensions, float_texture_file_extensions, model_file_extensions, prefetch_max_bytes, texture_downscale_workers
 from .modules.unitypackage_parser import UnitypackageParser, AssetEntry
+from .modules.pipeline import AssetPrefetcher
+from .modules.catalog import Catalog, get_default_catalog_filepath
+from .modules.content_hash import content_hash_algorithm, hash_stream
+from .modules.texture_downscale import TextureDownscaler
+from .modules.unity_meta import parse_importer_settings, TextureImporterSettings, ModelImporterSettings, WRAP_MODE_CLAMP, WRAP_MODE_MIRROR, WRAP_MODE_MIRROR_ONCE, ALPHA_USAGE_NONE
+from .modules import texture_downscale
 from .modules.tools import timer
-
-
-# TODO: This could probably significantly speed up if we can skip creating temporary files on disk, but I so far haven't figured out how to implement that.
-#       Even if just for textures that would be a pretty significant performance improvement.
+from .modules import profiling
 
 
 logger = logging.getLogger("Unitypackage Asset Importer")
@@ -42,16 +50,21 @@ if not os.path.exists(plugin_temp_dir):
 class TempFile():
     """
     Temporary file on the file system to invoke Blender's importers.
+    Textures are loaded from memory instead (see load_texture), this is only needed for importers that require a file path.
+    data can either be bytes or a binary file object, which is copied in chunks (see UnitypackageParser.open_asset).
     Can (and should!) be used as a context manager, the file will be deleted once the context manager is exited.
 
     """
     fullpath : str
 
-    def __init__(self, basename : str, data : bytes):
+    def __init__(self, basename : str, data : Union[bytes, BinaryIO]):
         self.fullpath = os.path.join(plugin_temp_dir, basename)
-        logger.debug(f"Creating temporary file '{self.fullpath}' and writing {len(data)} bytes...")
-        with open(self.fullpath, 'wb') as f:
-            f.write(data)
+        logger.debug(f"Creating temporary file '{self.fullpath}'...")
+        with profiling.span('tempfile.write', 'io'), open(self.fullpath, 'wb') as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f, 1024 * 1024)
 
     def __enter__(self):
         return self.fullpath
@@ -61,6 +74,249 @@ class TempFile():
         os.remove(self.fullpath)
 
 
+def _load_image_from_memory(name : str, data : bytes, is_float : bool) -> Union[bpy.types.Image, None]:
+    """
+    Creates a packed image directly from the file contents in data, without writing them to disk first.
+    Returns None if Blender wasn't able to load the image this way, in which case the image is removed again.
+
+    """
+    # Start with a generated placeholder image, then swap in the packed file data as its source.
+    # Creating it as float buffer makes Blender pick the same default colorspace (linear) it would when loading float formats from a file.
+    with profiling.span('bpy.pack_image', 'bpy'):
+        image = bpy.data.images.new(name, 8, 8, float_buffer=is_float)
+        image.pack(data=data, data_len=len(data))
+        image.source = 'FILE'
+    
+    with profiling.span('bpy.load_image', 'bpy'):
+        is_empty = image.size[0] == 0
+    
+    if is_empty:
+        # Accessing size forces the image to load, no pixels means the format can't be read from memory
+        bpy.data.images.remove(image)
+        return None
+    
+    return image
+
+
+# Custom properties tagging every datablock imported from a .unitypackage with where it came from:
+# the GUID of its asset, the file name of the package and the content hash of the asset's data (see modules/content_hash.py).
+# Re-importing a newer version of a package compares against those to only load what changed.
+guid_property = 'unitypackage_guid'
+package_property = 'unitypackage_package'
+content_hash_property = 'unitypackage_content_hash'
+
+
+def tag_datablock(datablock : bpy.types.ID, guid : str, package : str, content_hash : str):
+    datablock[guid_property] = guid
+    datablock[package_property] = package
+    datablock[content_hash_property] = content_hash
+
+
+def get_tagged_datablocks() -> dict[str, list[bpy.types.ID]]:
+    """
+    Returns all datablocks in the blend file that were imported from a .unitypackage, by the GUID of their asset.
+    A model asset has many datablocks (objects, meshes, materials, ...), a texture asset a single image.
+
+    """
+    datablocks_by_guid = {}
+    for collection in _model_datablock_collections:
+        for datablock in getattr(bpy.data, collection):
+            guid = datablock.get(guid_property)
+            if isinstance(guid, str):
+                datablocks_by_guid.setdefault(guid, []).append(datablock)
+    return datablocks_by_guid
+
+
+def get_images_by_content_hash() -> dict[str, bpy.types.Image]:
+    """
+    Returns all images in the blend file that were loaded from a .unitypackage, by the content hash of their data.
+    Only hashes computed with the current algorithm are included, others can't be compared anyway.
+
+    """
+    images_by_content_hash = {}
+    prefix = f"{content_hash_algorithm}:"
+    for image in bpy.data.images:
+        content_hash = image.get(content_hash_property)
+        if isinstance(content_hash, str) and content_hash.startswith(prefix):
+            images_by_content_hash.setdefault(content_hash, image)
+    return images_by_content_hash
+
+
+def load_texture(asset_entry : AssetEntry, data : bytes, basename : Union[str, None] = None) -> bpy.types.Image:
+    """
+    Creates a packed image for a texture asset from its extracted data.
+    The image is loaded straight from memory, only formats Blender can't read that way go through a temporary file.
+    basename overrides the asset's file name, for data that was converted to another format (see texture_downscale).
+
+    """
+    basename = basename or asset_entry.basename
+    is_float = asset_entry.extension.lower() in float_texture_file_extensions
+    image = _load_image_from_memory(basename, data, is_float)
+    if not image:
+        logger.debug(f"Couldn't load '{basename}' from memory, falling back to temporary file...")
+        profiling.count('import.texture_file_fallbacks')
+        with TempFile(basename, data) as temp_file_path, profiling.span('bpy.load_image_file', 'bpy'):
+            image = bpy.data.images.load(temp_file_path)
+            image.pack()
+    
+    # Point to where Blender would unpack the image to by default, instead of a temporary file
+    image.filepath_raw = f"//textures/{basename}"
+    return image
+
+
+def get_importer_settings(asset_entry : AssetEntry) -> Union[TextureImporterSettings, ModelImporterSettings, None]:
+    """
+    Returns Unity's import settings of an asset from its asset.meta file, or None if it has none.
+    The asset.meta member follows the asset in the archive, so this should be called right after the asset was extracted
+    (the import prefetches them together) to keep reading the archive forward.
+
+    """
+    if not asset_entry.has_keys('asset_meta'):
+        return None
+    with profiling.span('import.parse_meta', 'import'):
+        return parse_importer_settings(asset_entry.asset_meta)
+
+
+# Custom property holding the Image Texture node extension matching Unity's wrap mode, for setting up materials.
+# Blender images don't have a wrap mode themselves.
+wrap_mode_property = 'unitypackage_wrap_mode'
+
+_wrap_mode_extensions = { WRAP_MODE_CLAMP: 'EXTEND', WRAP_MODE_MIRROR: 'MIRROR', WRAP_MODE_MIRROR_ONCE: 'MIRROR' }
+
+
+def apply_texture_settings(image : bpy.types.Image, settings : TextureImporterSettings, is_float : bool):
+    """
+    Sets up an image according to Unity's texture import settings, right after it was loaded.
+
+    """
+    # Float formats (EXR, HDR) are linear already, Blender picks the right colorspace for those
+    if not is_float:
+        image.colorspace_settings.name = 'sRGB' if settings.srgb and not settings.is_normal_map else 'Non-Color'
+    
+    if settings.alpha_usage == ALPHA_USAGE_NONE:
+        image.alpha_mode = 'NONE'
+    elif settings.alpha_is_transparency:
+        image.alpha_mode = 'STRAIGHT'
+    else:
+        # Alpha holds some other data (smoothness, height, ...), it must not be multiplied into the colors
+        image.alpha_mode = 'CHANNEL_PACKED'
+    
+    image[wrap_mode_property] = _wrap_mode_extensions.get(settings.wrap_u, 'REPEAT')
+
+
+def _import_gltf(filepath : str, settings : Union[ModelImporterSettings, None]):
+    bpy.ops.import_scene.gltf(filepath=filepath)
+    if settings and settings.global_scale != 1.0:
+        # The glTF importer has no scale option, scale the imported root objects instead
+        for obj in bpy.context.selected_objects:
+            if obj.parent is None:
+                obj.scale *= settings.global_scale
+
+
+# Blender's importer operator for each model format, applying Unity's import settings if there are any
+_model_importers = {
+    '.fbx': lambda filepath, settings: bpy.ops.import_scene.fbx(
+        filepath=filepath,
+        global_scale=settings.global_scale if settings else 1.0,
+        apply_unit_scale=settings.use_file_scale if settings else True
+    ),
+    '.glb': _import_gltf,
+    '.gltf': _import_gltf,
+}
+
+# bpy.data collections of the datablocks a model import can create
+_model_datablock_collections = ('objects', 'meshes', 'materials', 'images', 'armatures', 'actions')
+
+
+def _get_model_datablocks() -> set[bpy.types.ID]:
+    return { datablock for collection in _model_datablock_collections for datablock in getattr(bpy.data, collection) }
+
+
+def _get_catalog_content_hashes(filepath : str) -> dict[str, str]:
+    """
+    Returns the content hashes of a package's assets from the catalog (see Catalog.get_content_hashes).
+    Returns an empty dictionary if there's no catalog, the catalog isn't created just for this.
+
+    """
+    if not os.path.exists(get_default_catalog_filepath()):
+        return {}
+    try:
+        with Catalog() as catalog:
+            return catalog.get_content_hashes(filepath)
+    except Exception as e:
+        logger.warning(f"Couldn't read content hashes from the catalog: {e}")
+        return {}
+
+
+def get_file_content_hash(filepath : str) -> str:
+    with profiling.span('import.hash_file', 'import'), open(filepath, 'rb') as f:
+        return hash_stream(f)
+
+
+def load_model(asset_entry : AssetEntry, filepath : str) -> list[bpy.types.ID]:
+    """
+    Imports a model asset from the temporary file at filepath with Blender's importer for its format,
+    and returns all datablocks that were created. Model files can be huge, so they should be streamed from the archive
+    into the temporary file (see TempFile) instead of being extracted into memory first.
+    Unity's import settings (scale) are passed on to the importer.
+
+    """
+    importer = _model_importers[asset_entry.extension.lower()]
+    datablocks_before = _get_model_datablocks()
+
+    # Read after the asset, which comes first in the archive
+    settings = get_importer_settings(asset_entry)
+    if not isinstance(settings, ModelImporterSettings):
+        settings = None
+    with profiling.span('bpy.import_scene', 'bpy', extension=asset_entry.extension.lower()):
+        importer(filepath, settings)
+    
+    return list(_get_model_datablocks() - datablocks_before)
+
+
+# Number suffix Blender adds to make names unique (Body.001)
+_NAME_NUMBER_SUFFIX = re.compile(r'\.\d{3}$')
+
+
+def _match_datablocks(old_datablocks : list[bpy.types.ID], new_datablocks : list[bpy.types.ID]) -> tuple[list[tuple[bpy.types.ID, bpy.types.ID]], list[bpy.types.ID]]:
+    """
+    Pairs the datablocks of an asset's previous import with the ones of its new import, by type and name
+    (ignoring the number suffix the new ones get while the old ones still exist).
+    Left over datablocks are paired if there's exactly one of a type on both sides (like a texture's image).
+    Returns ([ (old, new) ], [ unmatched old datablocks ]).
+
+    """
+    old_by_key = {}
+    for old in old_datablocks:
+        old_by_key.setdefault((type(old), _NAME_NUMBER_SUFFIX.sub('', old.name)), []).append(old)
+    
+    pairs = []
+    unmatched_new = []
+    for new in new_datablocks:
+        if candidates := old_by_key.get((type(new), _NAME_NUMBER_SUFFIX.sub('', new.name))):
+            pairs.append((candidates.pop(0), new))
+        else:
+            unmatched_new.append(new)
+    
+    unmatched_old_by_type = {}
+    for candidates in old_by_key.values():
+        for old in candidates:
+            unmatched_old_by_type.setdefault(type(old), []).append(old)
+    unmatched_new_by_type = {}
+    for new in unmatched_new:
+        unmatched_new_by_type.setdefault(type(new), []).append(new)
+    
+    unmatched_old = []
+    for datablock_type, olds in unmatched_old_by_type.items():
+        news = unmatched_new_by_type.get(datablock_type, [])
+        if len(olds) == 1 and len(news) == 1:
+            pairs.append((olds[0], news[0]))
+        else:
+            unmatched_old.extend(olds)
+    
+    return pairs, unmatched_old
+
+
 def _add_import_item(import_list, guid : str, name : str, icon : str = 'NONE', is_selected=True, is_expanded=True, indentation=0):
     import_item = import_list.add()
     import_item.guid = guid
@@ -111,32 +367,416 @@ def prepare_direct_import(context, parser : UnitypackageParser):
     context.window_manager.progress_end()
 
 
-@timer(logger)
-def do_direct_import(context, parser : UnitypackageParser):
-    full_import_list = context.window_manager.unitypackage_importer_import_list
-    import_list = [ item for item in full_import_list if all([ item.is_selected, item.is_enabled, item.guid ]) ]
+class DirectImportJob():
+    """
+    Direct import of the selected import list items, split into steps so it can be run in small time slices
+    (see UNITYPACKAGE_IMPORTER_OT_run_import) instead of blocking Blender until everything is imported.
+    Keeps track of all datablocks it created, so a cancelled import can be rolled back.
+    Unity's import settings from the asset.meta files (colorspace, alpha, scale) are applied as the datablocks are created,
+    and all of them are tagged with the GUID, package and content hash of their asset.
+    If reimport is set, assets that were imported before (from any version of the package) are compared by content hash:
+    unchanged ones are skipped, changed ones replace their previous datablocks (everything using those is remapped to the new ones),
+    and previously imported assets that aren't in the package anymore are reported in removed_guids.
+    Comparing requires extracting and hashing an asset, unless the package was cataloged with content hashes
+    (see Catalog.refresh), in which case unchanged assets are skipped without reading them from the archive.
+    If downscale_textures is set, textures larger than max_texture_size are downscaled in worker processes before
+    they're loaded (a max_texture_size of 0 uses each texture's Max Size from Unity's import settings instead).
+    Should be used as a context manager, or closed after it finished or was cancelled.
+
+    """
+    total : int
+    done : int
+    created_images : list[bpy.types.Image]
+    reused_images : list[bpy.types.Image]
+    created_datablocks : list[bpy.types.ID]
+    added_guids : list[str]
+    changed_guids : list[str]
+    unchanged_guids : list[str]
+    removed_guids : list[str]
 
-    # TODO: This takes too long, windows gets in the way.
-    # TODO: We need a second kind of progress indicator that actually refreshes the window to prevent
-    # TODO: Windows from flagging it as non-responsive after 5 seconds!
-    # (Operator window stays open during this, perhaps progress bar like https://blender.stackexchange.com/a/231693/89047 ?)
+    def __init__(self, context, parser : UnitypackageParser, downscale_textures : bool = False, max_texture_size : int = 0, reimport : bool = False):
+        full_import_list = context.window_manager.unitypackage_importer_import_list
+        import_list = [ item for item in full_import_list if all([ item.is_selected, item.is_enabled, item.guid ]) ]
+        asset_entries = [ parser.get_asset_entry_by_guid(import_item.guid) for import_item in import_list ]
 
-    # Initialize progress indicator
-    context.window_manager.progress_begin(0, len(import_list))
+        texture_guids = [ asset_entry.guid for asset_entry in asset_entries if asset_entry.extension.lower() in texture_file_extensions ]
+        model_entries = [ asset_entry for asset_entry in asset_entries if asset_entry.extension.lower() in model_file_extensions ]
+        
+        self._parser = parser
+        self.total = len(texture_guids) + len(model_entries)
+        self.done = 0
+        self.created_images = []
+        self.reused_images = []
+        self.created_datablocks = []
+        self._start_time = None
 
-    for index, import_item in enumerate(import_list):
-        asset_entry : AssetEntry = parser.get_asset_entry_by_guid(import_item.guid)
-        if asset_entry.extension in texture_file_extensions:
-            with TempFile(asset_entry.basename, asset_entry.asset) as temp_file_path:
-                image = bpy.data.images.load(temp_file_path)
-                image.pack()
+        self._package = os.path.basename(parser.filepath)
+        self.added_guids = []
+        self.changed_guids = []
+        self.unchanged_guids = []
+        self.removed_guids = []
+        self._previous_datablocks = {}
+        self._replaced = [] # (old, new) pairs of remapped datablocks
+        self._stale_datablocks = [] # Replaced by the re-import, removed once it's done
+        self._retagged = [] # (datablock, previous package) of unchanged datablocks tagged with this package
+        self._known_unchanged = {} # { guid: content hash } of assets the catalog says are unchanged, they aren't extracted at all
+        if reimport:
+            self._init_reimport()
+            self._known_unchanged = self._find_known_unchanged(texture_guids + [ asset_entry.guid for asset_entry in model_entries ])
+            texture_guids = [ guid for guid in texture_guids if guid not in self._known_unchanged ]
+            model_entries = [ asset_entry for asset_entry in model_entries if asset_entry.guid not in self._known_unchanged ]
 
-        # Update progress indicator
-        context.window_manager.progress_update(index + 1)
+        # Textures with the same contents as an image that already exists (from an earlier import, or another GUID
+        # of this one) reuse that image instead of loading and packing another copy of the same data
+        self._images_by_content_hash = get_images_by_content_hash()
+
+        self._downscaler = None
+        self._max_texture_size = max_texture_size
+        if downscale_textures:
+            if texture_downscale.is_available():
+                self._downscaler = TextureDownscaler(texture_downscale_workers)
+            else:
+                logger.warning("Downscaling textures requires the Pillow package, which isn't installed. Textures are imported at full size.")
+        
+        # Extract textures in archive order (the UI order would make us jump back and forth in the compressed archive).
+        # Extraction (and hashing) happens on a background thread, so the next assets are decompressed while Blender loads the current one.
+        # The asset.meta files with the import settings are extracted along with the textures, in the same pass over the archive.
+        self._prefetcher = AssetPrefetcher(parser, texture_guids, prefetch_max_bytes, hash_contents=True, prefetch_meta=True)
+        # Models are streamed straight to temporary files instead, in archive order as well
+        self._model_entries = sorted(model_entries, key=lambda asset_entry: asset_entry.get_member('asset').offset_data)
+        self._iterator = None
     
-    # End progress indicator
-    context.window_manager.progress_end()
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _init_reimport(self):
+        self._previous_datablocks = get_tagged_datablocks()
+        guids = { asset_entry.guid for asset_entry in self._parser.get_asset_entries() }
+
+        # Package versions usually have different file names (Awtter_3.0.74i, Awtter_3.0.75),
+        # so the previous versions are the packages that have any GUIDs in common with this one
+        packages = { datablock.get(package_property) for guid, datablocks in self._previous_datablocks.items() if guid in guids for datablock in datablocks }
+        for guid, datablocks in self._previous_datablocks.items():
+            if guid not in guids and any(datablock.get(package_property) in packages for datablock in datablocks):
+                self.removed_guids.append(guid)
+                logger.info(f"'{datablocks[0].name}' ({guid}) was removed from the package, its datablocks are kept.")
+
+    def _find_known_unchanged(self, guids : list[str]) -> dict[str, str]:
+        """
+        Returns { guid: content hash } of the given assets that are unchanged according to the catalog (if the package
+        was cataloged with content hashes), so they don't have to be extracted at all.
+        Everything else has to be extracted and hashed to compare it.
+
+        """
+        content_hashes = _get_catalog_content_hashes(self._parser.filepath)
+        known_unchanged = { guid: content_hashes[guid] for guid in guids if guid in content_hashes and self._has_same_contents(guid, content_hashes[guid]) }
+        if known_unchanged:
+            logger.info(f"{len(known_unchanged)} assets are unchanged according to the catalog, they aren't extracted.")
+        return known_unchanged
+
+    def _has_same_contents(self, guid : str, content_hash : str) -> bool:
+        previous = self._previous_datablocks.get(guid)
+        return bool(previous) and all(datablock.get(content_hash_property) == content_hash for datablock in previous)
+
+    def _is_unchanged(self, guid : str, content_hash : str) -> bool:
+        """
+        Whether an asset was imported before with the exact same contents, in which case its previous datablocks
+        are kept (and tagged with the new package).
+
+        """
+        if not self._has_same_contents(guid, content_hash):
+            return False
+        
+        for datablock in self._previous_datablocks[guid]:
+            self._retagged.append((datablock, datablock.get(package_property)))
+            datablock[package_property] = self._package
+        self.unchanged_guids.append(guid)
+        profiling.count('import.assets_unchanged')
+        return True
+
+    def _add_datablocks(self, guid : str, datablocks : list[bpy.types.ID]):
+        """
+        Records the datablocks imported for an asset. On a re-import, they take over the users of the asset's previous datablocks.
+
+        """
+        previous = self._previous_datablocks.get(guid)
+        if not previous:
+            self.added_guids.append(guid)
+            return
+        
+        pairs, unmatched = _match_datablocks(previous, datablocks)
+        for old, new in pairs:
+            if old == new:
+                continue
+            if isinstance(new, bpy.types.Object):
+                # Keep the existing object (with its placement, parenting and modifiers),
+                # it uses the new mesh / armature through the remapped data, so the new object is redundant
+                self._stale_datablocks.append(new)
+            else:
+                old.user_remap(new)
+                self._replaced.append((old, new))
+                self._stale_datablocks.append(old)
+        
+        # Parts of the previous version that don't exist in the new one anymore
+        self._stale_datablocks.extend(unmatched)
+        self.changed_guids.append(guid)
+
+    def _remove_stale_datablocks(self):
+        """
+        Removes the datablocks replaced by the re-import, and gives the new ones the names of the previous ones.
+
+        """
+        names = [ (new, old.name) for old, new in self._replaced ]
+        for datablock in self._stale_datablocks:
+            try:
+                bpy.data.batch_remove([ datablock ])
+            except ReferenceError:
+                pass
         
+        for new, name in names:
+            # Only if the new one just got a number suffix, not when an existing image with the same contents was used
+            if _NAME_NUMBER_SUFFIX.sub('', new.name) == _NAME_NUMBER_SUFFIX.sub('', name):
+                new.name = name
+        
+        self._replaced.clear()
+        self._stale_datablocks.clear()
+
+    def step(self, time_budget : float) -> bool:
+        """
+        Imports assets until time_budget (in seconds) is used up, but at least one.
+        Returns True as long as there's something left to import. Once it returns False, the import is complete,
+        including the removal of datablocks replaced by a re-import.
+
+        """
+        if self._iterator is None:
+            self._start_time = time.perf_counter()
+            self._iterator = self._import_assets()
+        
+        deadline = time.perf_counter() + time_budget
+        while True:
+            try:
+                next(self._iterator)
+            except StopIteration:
+                return False
+            
+            self.done += 1
+
+            # After the last asset, keep going until the generator is exhausted, it still has to clean up after the re-import
+            if self.done < self.total and time.perf_counter() >= deadline:
+                return True
+
+    def _get_max_texture_size(self, settings : Union[TextureImporterSettings, None]) -> Union[int, None]:
+        if self._max_texture_size:
+            return self._max_texture_size
+        return settings.max_texture_size if settings else None
+
+    def _iter_textures(self) -> Generator[tuple[AssetEntry, str, Union[TextureImporterSettings, None], bytes, str], None, None]:
+        """
+        Generator yielding (asset_entry, content_hash, settings, data, basename) of the textures to import, in archive order.
+        When downscaling, several textures are handed to the worker processes ahead of time,
+        so they're downscaled in parallel while the main thread loads the ones before them.
+        Downscaled textures come with the content hash of their size limit (see get_downscaled_content_hash)
+        and the file name of the format they were written in.
+
+        """
+        lookahead = 1
+        if self._downscaler:
+            lookahead = self._downscaler.max_workers
+        prefetched = iter(self._prefetcher)
+        pending = deque() # (asset_entry, content_hash, settings, data, future)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < lookahead:
+                with profiling.span('import.wait_for_extraction', 'import'):
+                    asset_entry, data = next(prefetched, (None, None))
+                if asset_entry is None:
+                    exhausted = True
+                    break
+                
+                content_hash = self._prefetcher.content_hashes[asset_entry.guid]
+                settings = get_importer_settings(asset_entry)
+                if not isinstance(settings, TextureImporterSettings):
+                    settings = None
+                future = None
+                max_size = self._get_max_texture_size(settings) if self._downscaler else None
+                if max_size:
+                    downscaled_content_hash = texture_downscale.get_downscaled_content_hash(content_hash, max_size)
+                    if downscaled_content_hash in self._images_by_content_hash:
+                        # Downscaled to the same size before, that image is reused
+                        content_hash = downscaled_content_hash
+                    else:
+                        future = self._downscaler.submit(data, max_size)
+                pending.append((asset_entry, content_hash, settings, data, max_size, future))
+            
+            if not pending:
+                return
+            
+            asset_entry, content_hash, settings, data, max_size, future = pending.popleft()
+            basename = asset_entry.basename
+            if future is not None:
+                with profiling.span('import.wait_for_downscale', 'import', name=asset_entry.basename):
+                    result = future.result()
+                if result is not None:
+                    downscaled_data, image_format = result
+                    logger.debug(f"Downscaled '{asset_entry.basename}' from {len(data)} to {len(downscaled_data)} bytes.")
+                    profiling.count('import.textures_downscaled')
+                    data = downscaled_data
+                    content_hash = texture_downscale.get_downscaled_content_hash(content_hash, max_size)
+                    basename = texture_downscale.get_downscaled_basename(basename, image_format)
+            yield asset_entry, content_hash, settings, data, basename
+
+    def _import_assets(self) -> Generator[None, None, None]:
+        """
+        Generator importing one asset per iteration.
+
+        """
+        for guid, content_hash in self._known_unchanged.items():
+            # Just tagged with the new package
+            self._is_unchanged(guid, content_hash)
+            yield
+
+        for asset_entry, content_hash, settings, data, basename in self._iter_textures():
+            if self._is_unchanged(asset_entry.guid, content_hash):
+                yield
+                continue
+
+            image = self._images_by_content_hash.get(content_hash)
+            if image is not None:
+                try:
+                    image.name # Raises ReferenceError if the image was removed in the meantime
+                except ReferenceError:
+                    image = None
+            
+            if image is not None:
+                logger.debug(f"Reusing image '{image.name}' for '{asset_entry.basename}', it has the same contents.")
+                profiling.count('import.textures_reused')
+                self.reused_images.append(image)
+            else:
+                with profiling.span('import.texture', 'import', name=asset_entry.basename, size=len(data)):
+                    image = load_texture(asset_entry, data, basename)
+                if settings:
+                    apply_texture_settings(image, settings, asset_entry.extension.lower() in float_texture_file_extensions)
+                tag_datablock(image, asset_entry.guid, self._package, content_hash)
+                self._images_by_content_hash[content_hash] = image
+                self.created_images.append(image)
+            
+            # Reused images keep the tags of the asset they were imported for
+            self._add_datablocks(asset_entry.guid, [ image ])
+            yield
+
+        # Textures are done, stop background extraction before importing models from the same archive
+        self._prefetcher.close()
+        if self._downscaler:
+            self._downscaler.close()
+        for asset_entry in self._model_entries:
+            with profiling.span('import.model', 'import', name=asset_entry.basename):
+                with asset_entry.open_value('asset') as stream, TempFile(asset_entry.basename, stream) as temp_file_path:
+                    content_hash = get_file_content_hash(temp_file_path)
+                    if not self._is_unchanged(asset_entry.guid, content_hash):
+                        datablocks = load_model(asset_entry, temp_file_path)
+                        for datablock in datablocks:
+                            tag_datablock(datablock, asset_entry.guid, self._package, content_hash)
+                        self.created_datablocks.extend(datablocks)
+                        self._add_datablocks(asset_entry.guid, datablocks)
+            yield
+
+        self._remove_stale_datablocks()
+
+    def get_eta(self) -> Union[float, None]:
+        """
+        Estimated remaining time in seconds, based on the average time per asset so far.
+        Returns None if nothing has been imported yet.
+
+        """
+        if not self.done:
+            return None
+        
+        elapsed = time.perf_counter() - self._start_time
+        return elapsed / self.done * (self.total - self.done)
+
+    def get_summary(self) -> str:
+        if not (self.changed_guids or self.unchanged_guids or self.removed_guids):
+            return f"Imported {self.done} assets."
+        return (
+            f"Re-imported {self.done} assets: {len(self.added_guids)} added, {len(self.changed_guids)} changed, "
+            f"{len(self.unchanged_guids)} unchanged, {len(self.removed_guids)} removed from the package (kept, see console)."
+        )
+
+    def rollback(self):
+        """
+        Removes all datablocks created by this import so far.
+        Datablocks replaced by a re-import get their users back, unchanged ones get their previous package tag back.
+
+        """
+        self.close()
+        for old, new in reversed(self._replaced):
+            try:
+                new.user_remap(old)
+            except ReferenceError:
+                pass
+        self._replaced.clear()
+        
+        for datablock, package in reversed(self._retagged):
+            try:
+                datablock[package_property] = package
+            except ReferenceError:
+                pass
+        self._retagged.clear()
+        self._stale_datablocks.clear()
+
+        for image in self.created_images:
+            # Skip images that were removed in the meantime (the reference is invalid then)
+            try:
+                bpy.data.images.remove(image)
+            except ReferenceError:
+                pass
+        
+        for datablock in self.created_datablocks:
+            try:
+                bpy.data.batch_remove([ datablock ])
+            except ReferenceError:
+                pass
+        
+        logger.info(f"Rolled back import, removed {len(self.created_images)} images and {len(self.created_datablocks)} datablocks from models.")
+        self.created_images.clear()
+        self.reused_images.clear() # Those existed before, they stay
+        self.created_datablocks.clear()
+        self.added_guids.clear()
+        self.changed_guids.clear()
+        self.unchanged_guids.clear()
+
+    def close(self):
+        """
+        Stops background extraction and downscaling, and closes the parser.
+
+        """
+        self._prefetcher.close()
+        if self._downscaler:
+            self._downscaler.close()
+        self._parser.close()
+
+
+@timer(logger)
+def do_direct_import(context, parser : UnitypackageParser, downscale_textures : bool = False, max_texture_size : int = 0, reimport : bool = False) -> DirectImportJob:
+    """
+    Runs the whole direct import at once, blocking until it's done, and returns the finished job.
+    The import operator runs a DirectImportJob in time slices instead, to keep Blender responsive.
+
+    """
+    with DirectImportJob(context, parser, downscale_textures, max_texture_size, reimport) as job:
+        # Initialize progress indicator
+        context.window_manager.progress_begin(0, job.total)
+
+        while job.step(0.1):
+            context.window_manager.progress_update(job.done)
+
+        # End progress indicator
+        context.window_manager.progress_end()
+    
+    return job
 
 
 def prepare_resolved_import(context, parser : UnitypackageParser):
@@ -0,0 +1,326 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Command line interface for working with .unitypackage files outside of Blender:
+
+    python -m unitypackage_importer.modules index PACKAGE...
+    python -m unitypackage_importer.modules ls PACKAGE [--extension EXT] [--glob PATTERN] [--guid GUID] [--long]
+    python -m unitypackage_importer.modules extract PACKAGE OUTPUT_DIR [--extension EXT] [--glob PATTERN] [--guid GUID] [--jobs N]
+    python -m unitypackage_importer.modules stats PACKAGE
+    python -m unitypackage_importer.modules catalog refresh DIRECTORY... [--hash] [--jobs N]
+    python -m unitypackage_importer.modules catalog search [NAME_PATTERN] [--extension EXT] [--glob PATTERN] [--guid GUID]
+
+Run with --help for all options.
+
+"""
+import os
+import sys
+import time
+import fnmatch
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Generator, Iterable, List, Tuple
+from ..config import prefetch_max_bytes
+from .unitypackage_parser import UnitypackageParser, AssetEntry
+from .catalog import Catalog
+from . import profiling
+
+
+def _format_size(size : int) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _select_asset_entries(parser : UnitypackageParser, arguments) -> List[AssetEntry]:
+    """
+    Returns all asset entries matching any of the --guid, --glob or --extension filters, or all of them if there are no filters.
+    Globs are matched against the full pathname, ignoring case.
+
+    """
+    guids = set(arguments.guid or [])
+    globs = [ pattern.lower() for pattern in arguments.glob or [] ]
+    extensions = { extension.lower() for extension in arguments.extension or [] }
+    if not (guids or globs or extensions):
+        return list(parser.get_asset_entries())
+
+    for guid in guids:
+        # Better to fail for unknown GUIDs than to silently extract less than asked for
+        try:
+            parser.get_asset_entry_by_guid(guid)
+        except KeyError:
+            raise Exception(f"No asset entry with GUID '{guid}'!")
+
+    asset_entries = []
+    for asset_entry in parser.get_asset_entries():
+        if asset_entry.guid in guids or asset_entry.extension.lower() in extensions or any(fnmatch.fnmatchcase(asset_entry.pathname.lower(), pattern) for pattern in globs):
+            asset_entries.append(asset_entry)
+    return asset_entries
+
+
+def _index_package(filepath : str) -> Tuple[str, int, float]:
+    """
+    Indexes a single package, storing its index in the index cache. Runs in worker processes.
+
+    """
+    start = time.perf_counter()
+    with UnitypackageParser(filepath) as parser:
+        return filepath, len(parser._index), time.perf_counter() - start
+
+
+def command_index(arguments) -> int:
+    """
+    Indexes packages ahead of time, so opening them later on is instant.
+
+    """
+    if arguments.jobs == 1 or len(arguments.packages) == 1:
+        _print_index_results(map(_index_package, arguments.packages))
+    else:
+        with ProcessPoolExecutor(max_workers=arguments.jobs) as executor:
+            _print_index_results(executor.map(_index_package, arguments.packages))
+    return 0
+
+
+def _print_index_results(results : Iterable[Tuple[str, int, float]]):
+    for filepath, entry_count, duration in results:
+        print(f"{filepath}: {entry_count} asset entries ({duration:.2f}s)")
+
+
+def command_ls(arguments) -> int:
+    """
+    Lists the asset entries of a package.
+
+    """
+    with UnitypackageParser(arguments.package) as parser:
+        asset_entries = _select_asset_entries(parser, arguments)
+        asset_entries.sort(key=lambda asset_entry: asset_entry.pathname)
+        for asset_entry in asset_entries:
+            if arguments.long:
+                size = parser._index.asset_sizes[asset_entry._row]
+                print(f"{asset_entry.guid}  {size:>12}  {asset_entry.pathname}")
+            else:
+                print(asset_entry.pathname)
+    return 0
+
+
+def _get_output_path(output_dir : str, pathname : str) -> str:
+    """
+    Returns where to write an asset, or None if its pathname would end up outside of the output directory.
+
+    """
+    output_path = os.path.normpath(os.path.join(output_dir, pathname))
+    if os.path.commonpath([ output_dir, output_path ]) != output_dir or output_path == output_dir:
+        return None
+    return output_path
+
+
+def _write_file(filepath : str, data : bytes):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+
+
+def _iter_members(parser : UnitypackageParser, asset_entries : List[AssetEntry], keys : List[str]) -> Generator[Tuple[AssetEntry, str, bytes], None, None]:
+    """
+    Generator to extract the members for all of the given keys of the asset entries, as (asset_entry, key, data).
+    Members of all keys are extracted together in archive order, so it's a single forward sweep through the archive
+    (UnitypackageParser.iter_assets does the same for one key).
+
+    """
+    members = [ (asset_entry.get_member(key).offset_data, asset_entry, key) for asset_entry in asset_entries for key in keys if asset_entry.has_keys(key) ]
+    members.sort(key=lambda member: member[0])
+    for _, asset_entry, key in members:
+        yield asset_entry, key, asset_entry.read_value(key)
+
+
+def command_extract(arguments) -> int:
+    """
+    Extracts assets to their pathnames within the output directory.
+    Assets are extracted in archive order on this thread, while a pool of threads writes them to disk.
+    At most prefetch_max_bytes of extracted data waits to be written at a time.
+
+    """
+    output_dir = os.path.abspath(arguments.output_dir)
+    written_count = 0
+    written_bytes = 0
+    start = time.perf_counter()
+    
+    with UnitypackageParser(arguments.package) as parser, ThreadPoolExecutor(max_workers=arguments.jobs) as executor:
+        asset_entries = _select_asset_entries(parser, arguments)
+        keys = [ 'asset', 'asset_meta' ] if arguments.meta else [ 'asset' ]
+
+        pending = {} # { future: size }
+        pending_bytes = 0
+        for asset_entry, key, data in _iter_members(parser, asset_entries, keys):
+            pathname = asset_entry.pathname + ('.meta' if key == 'asset_meta' else '')
+            output_path = _get_output_path(output_dir, pathname)
+            if not output_path:
+                print(f"Skipping '{pathname}', it would be written outside of the output directory!", file=sys.stderr)
+                continue
+            
+            # Wait for writers to catch up if too much data is waiting
+            while pending and pending_bytes + len(data) > prefetch_max_bytes:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    pending_bytes -= pending.pop(future)
+            
+            pending[executor.submit(_write_file, output_path, data)] = len(data)
+            pending_bytes += len(data)
+            written_count += 1
+            written_bytes += len(data)
+
+        for future in pending:
+            future.result()
+
+    duration = time.perf_counter() - start
+    print(f"Extracted {written_count} files ({_format_size(written_bytes)}) in {duration:.2f}s.")
+    return 0
+
+
+def command_stats(arguments) -> int:
+    """
+    Prints asset counts and sizes per file extension, and I/O counters of opening the package.
+
+    """
+    with UnitypackageParser(arguments.package) as parser:
+        index = parser._index
+        by_extension = {} # { extension: [count, size] }
+        for row in range(len(index)):
+            extension = index.extensions[index.extension_ids[row]].lower() or '(none)'
+            totals = by_extension.setdefault(extension, [0, 0])
+            totals[0] += 1
+            totals[1] += index.asset_sizes[row]
+
+        print(f"{arguments.package}: {len(index)} asset entries, {_format_size(sum(index.asset_sizes))} of assets")
+        for extension, (count, size) in sorted(by_extension.items(), key=lambda item: -item[1][1]):
+            print(f"  {extension:<20} {count:>8}  {_format_size(size):>12}")
+        
+        print("I/O:")
+        for name, value in parser.get_stats().items():
+            print(f"  {name:<28} {value}")
+    return 0
+
+
+def command_catalog_refresh(arguments) -> int:
+    """
+    Adds all packages within the given directories to the catalog, or updates them if they changed.
+
+    """
+    with Catalog(arguments.catalog) as catalog:
+        for directory in arguments.directories:
+            stats = catalog.refresh_directory(directory, max_workers=arguments.jobs, hash_contents=arguments.hash)
+            print(f"{directory}: {stats['indexed']} indexed, {stats['unchanged']} unchanged, {stats['removed']} removed, {stats['failed']} failed")
+    return 0
+
+
+def command_catalog_search(arguments) -> int:
+    """
+    Lists catalog entries matching all of the given filters, as 'package: pathname'.
+
+    """
+    with Catalog(arguments.catalog) as catalog:
+        guids = arguments.guid or [ None ]
+        for guid in guids:
+            for entry in catalog.query(name=arguments.name, extensions=arguments.extension, pathname=arguments.glob, guid=guid, limit=arguments.limit):
+                if arguments.long:
+                    print(f"{entry.package_path}: {entry.guid}  {entry.asset_size:>12}  {entry.pathname}")
+                else:
+                    print(f"{entry.package_path}: {entry.pathname}")
+    return 0
+
+
+def _add_filter_arguments(parser : argparse.ArgumentParser):
+    parser.add_argument('--guid', action='append', help="Select the asset with this GUID (can be repeated)")
+    parser.add_argument('--glob', action='append', help="Select assets whose pathname matches this pattern, ignoring case, like 'Assets/Textures/*.png' (can be repeated)")
+    parser.add_argument('--extension', action='append', help="Select assets with this file extension, ignoring case, like '.fbx' (can be repeated)")
+
+
+def main(argv : List[str] = None) -> int:
+    argument_parser = argparse.ArgumentParser(prog='python -m unitypackage_importer.modules', description="Work with .unitypackage files without Blender.")
+    argument_parser.add_argument('--verbose', action='store_true', help="Print debug log messages")
+    argument_parser.add_argument('--profile', metavar='TRACE_FILE', help="Record a profile and write it as Chrome trace to TRACE_FILE")
+    subparsers = argument_parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser('index', help="Index packages and store their indexes in the index cache")
+    index_parser.add_argument('packages', nargs='+')
+    index_parser.add_argument('--jobs', type=int, default=None, help="Number of packages to index in parallel (defaults to the number of CPUs)")
+    index_parser.set_defaults(function=command_index)
+
+    ls_parser = subparsers.add_parser('ls', help="List asset entries")
+    ls_parser.add_argument('package')
+    ls_parser.add_argument('--long', '-l', action='store_true', help="Include GUIDs and asset sizes")
+    _add_filter_arguments(ls_parser)
+    ls_parser.set_defaults(function=command_ls)
+
+    extract_parser = subparsers.add_parser('extract', help="Extract assets to their pathnames within a directory")
+    extract_parser.add_argument('package')
+    extract_parser.add_argument('output_dir')
+    extract_parser.add_argument('--meta', action='store_true', help="Extract .meta files as well")
+    extract_parser.add_argument('--jobs', type=int, default=4, help="Number of threads writing files")
+    _add_filter_arguments(extract_parser)
+    extract_parser.set_defaults(function=command_extract)
+
+    stats_parser = subparsers.add_parser('stats', help="Print asset statistics and I/O counters")
+    stats_parser.add_argument('package')
+    stats_parser.set_defaults(function=command_stats)
+
+    catalog_parser = subparsers.add_parser('catalog', help="Index whole asset libraries into a catalog and search it")
+    catalog_parser.add_argument('--catalog', metavar='CATALOG_FILE', help="Catalog database to use (defaults to catalog.sqlite in the cache directory)")
+    catalog_subparsers = catalog_parser.add_subparsers(dest='catalog_command', required=True)
+
+    refresh_parser = catalog_subparsers.add_parser('refresh', help="Add or update all packages within directories, skipping unchanged ones")
+    refresh_parser.add_argument('directories', nargs='+')
+    refresh_parser.add_argument('--hash', action='store_true', help="Extract all assets to store content hashes of them as well (slow)")
+    refresh_parser.add_argument('--jobs', type=int, default=None, help="Number of packages to index in parallel (defaults to the number of CPUs)")
+    refresh_parser.set_defaults(function=command_catalog_refresh)
+
+    search_parser = catalog_subparsers.add_parser('search', help="Find assets in all cataloged packages")
+    search_parser.add_argument('name', nargs='?', help="Pattern for the file name, ignoring case, like '*Awtter*'")
+    search_parser.add_argument('--glob', help="Pattern for the full pathname, ignoring case, like 'Assets/Textures/*'")
+    search_parser.add_argument('--extension', action='append', help="File extension, ignoring case, like '.fbx' (can be repeated)")
+    search_parser.add_argument('--guid', action='append', help="GUID of the asset (can be repeated)")
+    search_parser.add_argument('--limit', type=int, default=None, help="Maximum number of results")
+    search_parser.add_argument('--long', '-l', action='store_true', help="Include GUIDs and asset sizes")
+    search_parser.set_defaults(function=command_catalog_search)
+
+    arguments = argument_parser.parse_args(argv)
+    # Loggers of the modules are set to debug level, filter on the handler instead
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.DEBUG if arguments.verbose else logging.WARNING)
+    logging.basicConfig(handlers=[ handler ], format='%(name)s: %(message)s')
+    if arguments.profile:
+        profiling.enable()
+
+    try:
+        return arguments.function(arguments)
+    except BrokenPipeError:
+        # Output was piped into something that stopped reading early (like head), not an error
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if arguments.profile:
+            profiling.export_chrome_trace(arguments.profile)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
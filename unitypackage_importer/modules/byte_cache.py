@@ -0,0 +1,125 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import logging
+import threading
+from collections import OrderedDict
+from typing import Hashable, Union
+from ..config import log_level, extracted_cache_pin_max_bytes
+from . import profiling
+
+
+logger = logging.getLogger("ByteBudgetCache")
+logger.setLevel(log_level)
+
+
+class ByteBudgetCache():
+    """
+    Thread-safe least recently used cache for bytes values, bounded by the total size of its values instead of their count.
+    Values up to pin_max_size bytes are pinned: they're never evicted and don't count towards the budget.
+    Those are the small text members (asset.meta files, Unity YAML documents) that get looked at over and over again,
+    while large binaries are evicted once the budget is exceeded and have to be extracted again on the next access.
+    Pinned values are limited to pin_max_bytes in total, small values beyond that are cached like large ones.
+
+    """
+    max_bytes : int
+    pin_max_size : int
+    pin_max_bytes : int
+    cached_bytes : int
+    pinned_bytes : int
+    hits : int
+    misses : int
+    evictions : int
+
+    def __init__(self, max_bytes : int, pin_max_size : int, pin_max_bytes : int = extracted_cache_pin_max_bytes):
+        self.max_bytes = max_bytes
+        self.pin_max_size = pin_max_size
+        self.pin_max_bytes = pin_max_bytes
+        self.cached_bytes = 0
+        self.pinned_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pinned = {}
+        self._entries = OrderedDict() # Least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key : Hashable) -> Union[bytes, None]:
+        """
+        Returns the cached value for the key and marks it as most recently used, or None if it isn't cached.
+
+        """
+        with self._lock:
+            if (value := self._pinned.get(key)) is None and (value := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        
+        profiling.count('extracted_cache.hits' if value is not None else 'extracted_cache.misses')
+        return value
+
+    def put(self, key : Hashable, value : bytes):
+        """
+        Adds a value to the cache, evicting least recently used values until it fits into the budget.
+        Values larger than the whole budget aren't cached at all.
+        Small values are pinned instead, as long as the pinned values stay within pin_max_bytes.
+
+        """
+        size = len(value)
+        with self._lock:
+            if key in self._pinned:
+                return
+            
+            if size <= self.pin_max_size and self.pinned_bytes + size <= self.pin_max_bytes:
+                self._pinned[key] = value
+                self.pinned_bytes += size
+                return
+
+            if size > self.max_bytes or key in self._entries:
+                return
+
+            while self._entries and self.cached_bytes + size > self.max_bytes:
+                _, evicted_value = self._entries.popitem(last=False)
+                self.cached_bytes -= len(evicted_value)
+                self.evictions += 1
+                profiling.count('extracted_cache.evictions')
+
+            self._entries[key] = value
+            self.cached_bytes += size
+
+    def clear(self):
+        """
+        Removes all values, including pinned ones. Counters are kept.
+
+        """
+        with self._lock:
+            self._pinned.clear()
+            self._entries.clear()
+            self.cached_bytes = 0
+            self.pinned_bytes = 0
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self.cached_bytes,
+                'pinned_bytes': self.pinned_bytes,
+            }
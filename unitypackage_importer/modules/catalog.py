@@ -0,0 +1,410 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+SQLite catalog of the asset entries of many .unitypackage files (a whole asset library),
+to find which package contains an asset without opening every single one of them.
+
+"""
+import os
+import glob
+import time
+import logging
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, List, NamedTuple, Tuple, Union
+from ..config import log_level
+from .index_cache import get_cache_dir, get_file_key, FileKey
+from .unitypackage_parser import UnitypackageParser, _make_index_record
+from .content_hash import hash_bytes
+from . import profiling
+
+
+logger = logging.getLogger("Catalog")
+logger.setLevel(log_level)
+
+
+# Bump whenever the schema changes, older catalogs are rebuilt from scratch
+CATALOG_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS packages (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    header_hash BLOB NOT NULL,
+    entry_count INTEGER NOT NULL,
+    has_content_hashes INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assets (
+    package_id INTEGER NOT NULL REFERENCES packages(id) ON DELETE CASCADE,
+    guid TEXT NOT NULL,
+    pathname TEXT NOT NULL,
+    name TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    asset_offset INTEGER NOT NULL,
+    asset_size INTEGER NOT NULL,
+    meta_offset INTEGER NOT NULL,
+    meta_size INTEGER NOT NULL,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS assets_package_id ON assets(package_id);
+CREATE INDEX IF NOT EXISTS assets_guid ON assets(guid);
+CREATE INDEX IF NOT EXISTS assets_extension ON assets(extension);
+CREATE INDEX IF NOT EXISTS assets_content_hash ON assets(content_hash);
+"""
+
+
+class CatalogEntry(NamedTuple):
+    """
+    An asset entry found in the catalog.
+
+    """
+    package_path : str
+    guid : str
+    pathname : str
+    asset_size : int
+    content_hash : Union[str, None]
+
+
+def get_default_catalog_filepath() -> str:
+    return os.path.join(get_cache_dir(), 'catalog.sqlite')
+
+
+def _index_package(filepath : str, hash_contents : bool) -> Tuple[FileKey, list, Union[dict, None]]:
+    """
+    Indexes a single package for the catalog. Runs in worker processes, so it needs to stay a module level function.
+    Returns the package's file key, its index records and, if requested, the content hash of every asset by GUID.
+
+    """
+    key = get_file_key(filepath)
+    # Bypass the index cache: A library-wide refresh would evict the indexes of packages that are actually being used,
+    # and loading an index from it starts a thread rebuilding decompressor checkpoints we don't need
+    with UnitypackageParser(filepath, use_index_cache=False) as parser:
+        records = [ _make_index_record(asset_entry) for asset_entry in parser.get_asset_entries() ]
+        content_hashes = None
+        if hash_contents:
+            content_hashes = { asset_entry.guid: hash_bytes(data) for asset_entry, data in parser.iter_assets(record.guid for record in records) }
+
+    return key, records, content_hashes
+
+
+def _try_index_package(filepath : str, hash_contents : bool):
+    try:
+        return _index_package(filepath, hash_contents)
+    except Exception as e:
+        return e
+
+
+def _like_pattern(pattern : str) -> str:
+    """
+    Converts a glob pattern ('*' and '?' wildcards) to a pattern for SQL's LIKE operator (with '\\' as escape character).
+
+    """
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+class Catalog():
+    """
+    Connection to a catalog database. Should be used as a context manager, or closed when it's not needed anymore.
+
+    """
+    filepath : str
+
+    def __init__(self, filepath : Union[str, None] = None):
+        self.filepath = filepath or get_default_catalog_filepath()
+        os.makedirs(os.path.dirname(os.path.abspath(self.filepath)), exist_ok=True)
+        self._connection = sqlite3.connect(self.filepath)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+
+        schema_version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version != CATALOG_SCHEMA_VERSION:
+            if schema_version:
+                logger.info(f"Catalog schema changed (version {schema_version} -> {CATALOG_SCHEMA_VERSION}), rebuilding catalog...")
+            self._connection.executescript("DROP TABLE IF EXISTS assets; DROP TABLE IF EXISTS packages;")
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def _is_up_to_date(self, key : FileKey, hash_contents : bool) -> bool:
+        row = self._connection.execute("SELECT size, mtime_ns, header_hash, has_content_hashes FROM packages WHERE path = ?", (key.path,)).fetchone()
+        return bool(row) and tuple(row[:3]) == (key.size, key.mtime_ns, key.header_hash) and (row[3] or not hash_contents)
+
+    def _store_package(self, key : FileKey, records : list, content_hashes : Union[dict, None]):
+        with self._connection:
+            self._connection.execute("DELETE FROM packages WHERE path = ?", (key.path,))
+            package_id = self._connection.execute(
+                "INSERT INTO packages (path, size, mtime_ns, header_hash, entry_count, has_content_hashes, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key.path, key.size, key.mtime_ns, key.header_hash, len(records), content_hashes is not None, time.time())
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT INTO assets (package_id, guid, pathname, name, extension, asset_offset, asset_size, meta_offset, meta_size, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        package_id, record.guid, record.pathname, record.pathname.rsplit('/', 1)[-1], os.path.splitext(record.pathname)[1].lower(),
+                        record.asset_offset, record.asset_size, record.meta_offset, record.meta_size,
+                        content_hashes.get(record.guid) if content_hashes else None
+                    )
+                    for record in records
+                )
+            )
+
+    def refresh(self, filepaths : Iterable[str], max_workers : Union[int, None] = None, hash_contents : bool = False) -> dict[str, int]:
+        """
+        Adds the given packages to the catalog, or updates them if they changed since they were last indexed.
+        Unchanged packages are skipped. Packages are indexed in parallel worker processes (max_workers defaults to the
+        number of CPUs, 0 indexes everything on this process). If hash_contents is set, all assets are extracted
+        to compute content hashes of them as well, which takes a lot longer than indexing alone.
+        Returns counts of 'indexed', 'unchanged' and 'failed' packages.
+        Blocks until everything is indexed, see CatalogRefreshJob to run it in steps instead.
+
+        """
+        with CatalogRefreshJob(self, filepaths, max_workers, hash_contents) as job:
+            while job.step(1.0):
+                pass
+        return job.stats
+
+    def refresh_directory(self, directory : str, max_workers : Union[int, None] = None, hash_contents : bool = False) -> dict[str, int]:
+        """
+        Refreshes all .unitypackage files within a directory (recursively), see refresh.
+        Packages of that directory that don't exist anymore are removed from the catalog, their count is returned as 'removed'.
+
+        """
+        with CatalogRefreshJob.for_directory(self, directory, max_workers, hash_contents) as job:
+            while job.step(1.0):
+                pass
+        return job.stats
+
+    def _get_outdated(self, filepaths : Iterable[str], hash_contents : bool, stats : dict[str, int]) -> List[str]:
+        """
+        Returns the absolute paths of all given packages that need to be indexed, counting the others in stats.
+
+        """
+        outdated = []
+        for filepath in dict.fromkeys(os.path.abspath(filepath) for filepath in filepaths):
+            try:
+                key = get_file_key(filepath)
+            except OSError as e:
+                logger.warning(f"Skipping '{filepath}': {e}")
+                stats['failed'] += 1
+                continue
+            if self._is_up_to_date(key, hash_contents):
+                stats['unchanged'] += 1
+            else:
+                outdated.append(filepath)
+        return outdated
+
+    def _handle_result(self, filepath : str, result, stats : dict[str, int]):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to index '{filepath}': {result}")
+            stats['failed'] += 1
+            return
+        
+        self._store_package(*result)
+        stats['indexed'] += 1
+
+    def _remove_missing(self, directory : str, existing : Iterable[str]) -> int:
+        """
+        Removes all packages within directory that aren't in existing from the catalog. Returns how many were removed.
+
+        """
+        existing = set(existing)
+        removed = [ path for path, in self._connection.execute("SELECT path FROM packages") if path.startswith(os.path.join(directory, '')) and path not in existing ]
+        with self._connection:
+            self._connection.executemany("DELETE FROM packages WHERE path = ?", ((path,) for path in removed))
+        return len(removed)
+
+    def remove_package(self, filepath : str):
+        with self._connection:
+            self._connection.execute("DELETE FROM packages WHERE path = ?", (os.path.abspath(filepath),))
+
+    def get_content_hashes(self, filepath : str) -> dict[str, str]:
+        """
+        Returns the content hashes of all assets of a package by GUID, if the package was indexed with hash_contents
+        and hasn't changed since. Returns an empty dictionary otherwise.
+
+        """
+        try:
+            key = get_file_key(filepath)
+        except OSError:
+            return {}
+        if not self._is_up_to_date(key, hash_contents=True):
+            return {}
+        
+        rows = self._connection.execute(
+            "SELECT assets.guid, assets.content_hash FROM assets JOIN packages ON packages.id = assets.package_id WHERE packages.path = ?", (key.path,)
+        )
+        return { guid: content_hash for guid, content_hash in rows if content_hash }
+
+    def get_packages(self) -> List[Tuple[str, int]]:
+        """
+        Returns (path, entry count) of all packages in the catalog.
+
+        """
+        return self._connection.execute("SELECT path, entry_count FROM packages ORDER BY path").fetchall()
+
+    def query(
+            self, name : Union[str, None] = None, extensions : Union[List[str], None] = None, pathname : Union[str, None] = None,
+            guid : Union[str, None] = None, content_hash : Union[str, None] = None, limit : Union[int, None] = None
+        ) -> List[CatalogEntry]:
+        """
+        Finds asset entries matching all of the given conditions:
+        - name: Glob pattern for the file name, ignoring case (for example '*Awtter*')
+        - extensions: File extensions including the dot, ignoring case
+        - pathname: Glob pattern for the full pathname, ignoring case (for example 'Assets/Textures/*')
+        - guid / content_hash: Exact GUID or content hash (only available for packages indexed with hash_contents)
+        Results are ordered by package and pathname.
+
+        """
+        conditions = []
+        parameters = []
+        if name is not None:
+            conditions.append("assets.name LIKE ? ESCAPE '\\'")
+            parameters.append(_like_pattern(name))
+        if pathname is not None:
+            conditions.append("assets.pathname LIKE ? ESCAPE '\\'")
+            parameters.append(_like_pattern(pathname))
+        if extensions is not None:
+            conditions.append(f"assets.extension IN ({', '.join('?' * len(extensions))})")
+            parameters.extend(extension.lower() for extension in extensions)
+        if guid is not None:
+            conditions.append("assets.guid = ?")
+            parameters.append(guid.lower())
+        if content_hash is not None:
+            conditions.append("assets.content_hash = ?")
+            parameters.append(content_hash)
+
+        sql = "SELECT packages.path, assets.guid, assets.pathname, assets.asset_size, assets.content_hash FROM assets JOIN packages ON packages.id = assets.package_id"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY packages.path, assets.pathname"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        return [ CatalogEntry(*row) for row in self._connection.execute(sql, parameters) ]
+
+
+class CatalogRefreshJob():
+    """
+    Refresh of packages in a catalog, split into steps so it can be run from a timer in Blender
+    (see UNITYPACKAGE_IMPORTER_OT_refresh_catalog) instead of blocking until every package is indexed.
+    Packages are indexed in worker processes as soon as the job is created, step() stores the finished ones in the catalog.
+    The catalog is only used from the thread that created the job (SQLite connections can't be shared between threads).
+    Should be used as a context manager, or closed after it finished or was cancelled.
+
+    """
+    total : int
+    done : int
+    stats : dict[str, int]
+
+    def __init__(self, catalog : Catalog, filepaths : Iterable[str], max_workers : Union[int, None] = None, hash_contents : bool = False):
+        self._catalog = catalog
+        self._hash_contents = hash_contents
+        self._directory = None
+        self.stats = { 'indexed': 0, 'unchanged': 0, 'failed': 0 }
+        self._filepaths = list(filepaths)
+        self._outdated = catalog._get_outdated(self._filepaths, hash_contents, self.stats)
+        self.total = len(self._outdated)
+        self.done = 0
+        logger.info(f"Indexing {len(self._outdated)} package(s), {self.stats['unchanged']} unchanged...")
+
+        self._executor = None
+        self._futures = {} # { future: filepath }
+        if max_workers != 0 and self._outdated:
+            self._executor = ProcessPoolExecutor(max_workers=max_workers)
+            self._futures = { self._executor.submit(_index_package, filepath, hash_contents): filepath for filepath in self._outdated }
+        self._pending = list(reversed(self._outdated)) # Indexed on this process if there are no workers
+
+    @classmethod
+    def for_directory(cls, catalog : Catalog, directory : str, max_workers : Union[int, None] = None, hash_contents : bool = False) -> 'CatalogRefreshJob':
+        """
+        Creates a job refreshing all .unitypackage files within a directory (recursively).
+        Once it's done, packages of that directory that don't exist anymore are removed from the catalog (counted as 'removed').
+
+        """
+        directory = os.path.abspath(directory)
+        filepaths = glob.glob(os.path.join(glob.escape(directory), '**', '*.unitypackage'), recursive=True)
+        job = cls(catalog, filepaths, max_workers, hash_contents)
+        job._directory = directory
+        return job
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def step(self, time_budget : float) -> bool:
+        """
+        Stores packages that finished indexing until time_budget (in seconds) is used up.
+        Without worker processes, indexes at least one package on this process instead.
+        Returns True as long as there's something left to do.
+
+        """
+        deadline = time.perf_counter() + time_budget
+        while self.done < self.total:
+            if self._executor:
+                finished, _ = wait(self._futures, timeout=max(0.0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    filepath = self._futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = e
+                    self._handle_result(filepath, result)
+            else:
+                filepath = self._pending.pop()
+                with profiling.span('catalog.index_package', 'catalog'):
+                    self._handle_result(filepath, _try_index_package(filepath, self._hash_contents))
+            
+            if time.perf_counter() >= deadline:
+                break
+        
+        if self.done < self.total:
+            return True
+        
+        self._finish()
+        return False
+
+    def _handle_result(self, filepath : str, result):
+        self._catalog._handle_result(filepath, result, self.stats)
+        self.done += 1
+
+    def _finish(self):
+        if self._directory is not None and 'removed' not in self.stats:
+            self.stats['removed'] = self._catalog._remove_missing(self._directory, self._filepaths)
+        self.close()
+
+    def close(self):
+        """
+        Stops the worker processes. Packages that weren't stored yet are discarded, the catalog stays open.
+
+        """
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
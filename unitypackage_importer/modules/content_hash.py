@@ -0,0 +1,68 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Fast hashes of asset contents, to recognize identical data shipped under different GUIDs (or imported before).
+Uses xxHash (XXH3, 128 bit) if the xxhash package is installed, BLAKE2b otherwise.
+Hashes are prefixed with the algorithm, so hashes computed with and without xxhash never compare equal by accident.
+
+"""
+import hashlib
+import logging
+from typing import BinaryIO
+from ..config import log_level
+
+try:
+    import xxhash
+except ModuleNotFoundError:
+    xxhash = None
+
+
+logger = logging.getLogger("ContentHash")
+logger.setLevel(log_level)
+
+
+content_hash_algorithm = 'xxh3_128' if xxhash else 'blake2b'
+
+# Size of the chunks read from streams
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _new_hasher():
+    if xxhash:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_bytes(data : bytes) -> str:
+    """
+    Returns the content hash of data, like 'blake2b:<32 hex digits>'.
+
+    """
+    hasher = _new_hasher()
+    hasher.update(data)
+    return f"{content_hash_algorithm}:{hasher.hexdigest()}"
+
+
+def hash_stream(stream : BinaryIO) -> str:
+    """
+    Returns the content hash of everything left to read in a binary file object (see UnitypackageParser.open_asset).
+
+    """
+    hasher = _new_hasher()
+    while chunk := stream.read(_CHUNK_SIZE):
+        hasher.update(chunk)
+    return f"{content_hash_algorithm}:{hasher.hexdigest()}"
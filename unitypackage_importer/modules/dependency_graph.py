@@ -0,0 +1,164 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import re
+import logging
+import itertools
+from array import array
+from typing import Iterable, List, Tuple
+from ..config import log_level, unity_yaml_file_extensions, model_file_extensions
+from .tools import timer
+from .unitypackage_parser import UnitypackageParser
+
+
+logger = logging.getLogger("DependencyGraph")
+logger.setLevel(log_level)
+
+
+# Object references in Unity's YAML files look like '{fileID: 2800000, guid: <32 hex digits>, type: 3}'
+_GUID_REFERENCE = re.compile(rb'guid: ([0-9a-fA-F]{32})')
+
+def _scan_references(data : bytes) -> List[str]:
+    """
+    Returns all GUIDs referenced within the data of an asset (or .meta file), without duplicates.
+
+    """
+    if not data.startswith((b'%YAML', b'fileFormatVersion:')):
+        # Binary serialized asset, those can't be scanned for references (.meta files are always text)
+        return []
+    return [ reference.decode('ascii') for reference in { match.lower() for match in _GUID_REFERENCE.findall(data) } ]
+
+
+def _build_csr(row_count : int, edges : List[Tuple[int, int]]) -> Tuple[array, array]:
+    """
+    Builds a compressed sparse row adjacency structure from (source, target) pairs.
+    The targets of row r are targets[offsets[r]:offsets[r + 1]].
+
+    """
+    offsets = array('I', [0]) * (row_count + 1)
+    for source, _ in edges:
+        offsets[source + 1] += 1
+    for row in range(row_count):
+        offsets[row + 1] += offsets[row]
+
+    targets = array('I', [0]) * len(edges)
+    positions = array('I', offsets)
+    for source, target in edges:
+        targets[positions[source]] = target
+        positions[source] += 1
+
+    return offsets, targets
+
+
+class DependencyGraph():
+    """
+    GUID reference graph of all assets within a .unitypackage file.
+    Nodes are the rows of the parser's asset index, edges are stored as compressed sparse rows in both directions,
+    so dependencies and dependents (including transitive ones) can be looked up without any per-asset objects.
+    The graph is per asset: only the GUIDs of references are kept, not their fileID and type (which object within the asset is used).
+
+    """
+    _parser : UnitypackageParser
+    _forward_offsets : array
+    _forward_targets : array
+    _reverse_offsets : array
+    _reverse_targets : array
+
+    def __init__(self, parser : UnitypackageParser, edges : List[Tuple[int, int]]):
+        row_count = len(parser._index)
+        self._parser = parser
+        self._forward_offsets, self._forward_targets = _build_csr(row_count, edges)
+        self._reverse_offsets, self._reverse_targets = _build_csr(row_count, [ (target, source) for source, target in edges ])
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._forward_targets)
+
+    def _walk(self, offsets : array, targets : array, guids : Iterable[str], recursive : bool) -> List[str]:
+        index = self._parser._index
+        pending = [ index.find_row(guid) for guid in guids ]
+        visited = set(pending)
+        result = []
+        while pending:
+            row = pending.pop()
+            for target in targets[offsets[row]:offsets[row + 1]]:
+                if target in visited:
+                    continue
+                visited.add(target)
+                result.append(target)
+                if recursive:
+                    pending.append(target)
+
+        return [ index.get_guid(row) for row in result ]
+
+    def get_dependencies(self, guid : str, recursive : bool = False) -> List[str]:
+        """
+        Returns the GUIDs of all assets the given asset references.
+        If recursive is set, also includes everything those reference, and so on (everything the asset needs).
+        Raises KeyError if the GUID doesn't exist.
+
+        """
+        return self._walk(self._forward_offsets, self._forward_targets, [ guid ], recursive)
+
+    def get_all_dependencies(self, guids : Iterable[str], recursive : bool = True) -> List[str]:
+        """
+        Returns the GUIDs of all assets any of the given assets reference (recursively by default), except for the given ones.
+        Every asset is only visited once, no matter how many of the given assets share it.
+        Raises KeyError if any of the GUIDs doesn't exist.
+
+        """
+        return self._walk(self._forward_offsets, self._forward_targets, guids, recursive)
+
+    def get_dependents(self, guid : str, recursive : bool = False) -> List[str]:
+        """
+        Returns the GUIDs of all assets referencing the given asset.
+        If recursive is set, also includes everything referencing those, and so on (everything that uses the asset).
+        Raises KeyError if the GUID doesn't exist.
+
+        """
+        return self._walk(self._reverse_offsets, self._reverse_targets, [ guid ], recursive)
+
+
+@timer(logger)
+def build_dependency_graph(parser : UnitypackageParser) -> DependencyGraph:
+    """
+    Scans all YAML based assets of a .unitypackage for GUID references and builds a DependencyGraph from them.
+    The .meta files of models are scanned as well, they reference the materials remapped in Unity's import settings.
+    Assets are extracted and scanned in archive order on this process. Extraction is what takes the time, the regex
+    scan is cheap: Handing extracted data to worker processes costs more in pickling than the scan itself.
+    References to assets that aren't part of the package are ignored.
+
+    """
+    guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension(unity_yaml_file_extensions) ]
+    model_guids = [ asset_entry.guid for asset_entry in parser.get_asset_entries_by_extension(model_file_extensions) if asset_entry.has_keys('asset_meta') ]
+    logger.info(f"Scanning {len(guids)} assets and {len(model_guids)} model import settings for references...")
+
+    # Translate GUIDs to rows of the asset index, dropping references to anything outside of the package
+    index = parser._index
+    edges = []
+    for asset_entry, data in itertools.chain(parser.iter_assets(guids), parser.iter_assets(model_guids, 'asset_meta')):
+        row = asset_entry._row
+        for reference in _scan_references(data):
+            try:
+                target = index.find_row(reference)
+            except KeyError:
+                continue
+            if target != row:
+                edges.append((row, target))
+
+    graph = DependencyGraph(parser, edges)
+    logger.info(f"Found {graph.edge_count} references between assets.")
+    return graph
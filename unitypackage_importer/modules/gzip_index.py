@@ -0,0 +1,312 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import os
+import zlib
+import bisect
+import logging
+from typing import List
+from ..config import log_level
+from . import profiling
+
+
+logger = logging.getLogger("GzipIndex")
+logger.setLevel(log_level)
+
+
+# Amount of compressed data read from disk at once
+_READ_CHUNK_SIZE = 64 * 1024
+
+# Maximum amount of data decompressed at once
+_DECOMPRESS_CHUNK_SIZE = 256 * 1024
+
+
+class GzipCheckpoint():
+    """
+    Snapshot of the decompressor state at a known position in the stream (zran-style access point).
+    Holds a copy of the zlib stream (which includes the 32 KiB dictionary window) together with
+    the compressed and uncompressed offsets it belongs to, so decompression can resume from here.
+
+    """
+    __slots__ = ('uncompressed_offset', 'compressed_offset', 'decompressor', 'pending_input')
+
+    def __init__(self, uncompressed_offset : int, compressed_offset : int, decompressor, pending_input : bytes):
+        self.uncompressed_offset = uncompressed_offset
+        self.compressed_offset = compressed_offset
+        self.decompressor = decompressor
+        self.pending_input = pending_input
+
+
+class GzipCheckpointReader():
+    """
+    Read-only, seekable file object for the decompressed contents of a gzip file.
+
+    While reading, a checkpoint is recorded roughly every checkpoint_span uncompressed bytes.
+    Seeking to an arbitrary position then only has to decompress from the nearest checkpoint before it,
+    instead of restarting at the beginning of the file like GzipFile does for every backwards seek.
+    Seeks are lazy, the stream is only repositioned once data is actually read.
+
+    """
+    name : str
+    mode : str
+    checkpoint_span : int
+    decompression_passes : int
+    checkpoint_restores : int
+    compressed_bytes_read : int
+    bytes_decompressed : int
+
+    def __init__(self, filepath : str, checkpoint_span : int):
+        if checkpoint_span <= 0:
+            raise ValueError("checkpoint_span must be positive!")
+
+        self._fileobj = open(filepath, 'rb')
+        self.name = filepath
+        self.mode = 'rb'
+        self.checkpoint_span = checkpoint_span
+        self._checkpoints : List[GzipCheckpoint] = []
+        self._checkpoint_offsets : List[int] = [] # Uncompressed offsets of checkpoints, for bisecting
+        self._pos = 0 # Logical (uncompressed) read position
+        self._decompressed_end = 0 # Furthest uncompressed offset decompressed so far
+        self._is_complete = False # Whether checkpoints were recorded up to the end of the stream
+
+        self.decompression_passes = 0
+        self.checkpoint_restores = 0
+        self.compressed_bytes_read = 0
+        self.bytes_decompressed = 0
+
+        self._restart()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _restart(self):
+        """
+        Resets the decompressor to the beginning of the stream.
+
+        """
+        self._decompressor = zlib.decompressobj(wbits=31)
+        self._compressed_pos = 0
+        self._pending_input = b''
+        self._buffer = b''
+        self._buffer_start = 0
+        self._eof = False
+        self.decompression_passes += 1
+        profiling.count('gzip.restarts')
+
+    def _restore(self, checkpoint : GzipCheckpoint):
+        """
+        Resets the decompressor to the state stored in a checkpoint.
+        The checkpoint's decompressor is copied, so the checkpoint can be used again later on.
+
+        """
+        self._decompressor = checkpoint.decompressor.copy()
+        self._compressed_pos = checkpoint.compressed_offset
+        self._pending_input = checkpoint.pending_input
+        self._buffer = b''
+        self._buffer_start = checkpoint.uncompressed_offset
+        self._eof = False
+        self.checkpoint_restores += 1
+        profiling.count('gzip.checkpoint_restores')
+
+    def _decompress_next(self) -> bool:
+        """
+        Decompresses the next chunk of data into the buffer, replacing its previous contents.
+        Returns False once the end of the stream has been reached.
+
+        """
+        buffer_end = self._buffer_start + len(self._buffer)
+        while not self._eof:
+            if not self._pending_input:
+                self._fileobj.seek(self._compressed_pos)
+                self._pending_input = self._fileobj.read(_READ_CHUNK_SIZE)
+                self._compressed_pos += len(self._pending_input)
+                self.compressed_bytes_read += len(self._pending_input)
+                profiling.count('gzip.compressed_bytes_read', len(self._pending_input))
+                if not self._pending_input:
+                    if not self._decompressor.eof:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached!")
+                    self._eof = True
+                    self._is_complete = True
+                    break
+
+            if self._decompressor.eof:
+                # End of a gzip member. There might be another one following it, or just trailing padding.
+                if not self._pending_input.strip(b'\x00'):
+                    self._pending_input = b''
+                    continue
+                self._decompressor = zlib.decompressobj(wbits=31)
+
+            with profiling.span('gzip.inflate', 'io'):
+                data = self._decompressor.decompress(self._pending_input, _DECOMPRESS_CHUNK_SIZE)
+            self._pending_input = self._decompressor.unconsumed_tail or self._decompressor.unused_data
+            if not data:
+                continue
+
+            self._buffer = data
+            self._buffer_start = buffer_end
+            self._decompressed_end = max(self._decompressed_end, buffer_end + len(data))
+            self.bytes_decompressed += len(data)
+            profiling.count('gzip.bytes_decompressed', len(data))
+
+            # Record a checkpoint if we've made it far enough past the last one
+            buffer_end += len(data)
+            last_checkpoint_offset = self._checkpoint_offsets[-1] if self._checkpoint_offsets else 0
+            if buffer_end >= last_checkpoint_offset + self.checkpoint_span and not self._decompressor.eof:
+                self._checkpoints.append(GzipCheckpoint(buffer_end, self._compressed_pos, self._decompressor.copy(), self._pending_input))
+                self._checkpoint_offsets.append(buffer_end)
+
+            return True
+
+        return False
+
+    def _reposition(self):
+        """
+        Makes sure the current buffer either contains the logical read position or ends right before it,
+        using the nearest checkpoint (or the beginning of the stream) if we'd have to go back or skip ahead a lot.
+
+        """
+        buffer_end = self._buffer_start + len(self._buffer)
+        if self._buffer_start <= self._pos <= buffer_end:
+            # Already there
+            return
+
+        profiling.count('gzip.seeks')
+        with profiling.span('gzip.seek', 'io'):
+            index = bisect.bisect_right(self._checkpoint_offsets, self._pos) - 1
+            checkpoint = self._checkpoints[index] if index >= 0 else None
+            if self._pos < self._buffer_start:
+                # Seeking backwards, go back to nearest checkpoint
+                if checkpoint:
+                    self._restore(checkpoint)
+                else:
+                    self._restart()
+            elif checkpoint and checkpoint.uncompressed_offset > buffer_end:
+                # Seeking forward beyond a known checkpoint, jump there instead of decompressing everything inbetween
+                self._restore(checkpoint)
+
+            # Skip forward until the buffer reaches the read position
+            while self._buffer_start + len(self._buffer) < self._pos:
+                if not self._decompress_next():
+                    break
+
+    def build_checkpoints(self, max_bytes : int) -> bool:
+        """
+        Decompresses up to max_bytes past the furthest position decompressed so far, recording checkpoints on the way,
+        so later seeks into that part of the stream don't have to decompress it first. The read position doesn't change.
+        Returns False once the end of the stream has been reached.
+
+        """
+        if self._is_complete:
+            return False
+        
+        buffer_end = self._buffer_start + len(self._buffer)
+        if buffer_end < self._decompressed_end:
+            # Somewhere before the furthest position, continue from the last checkpoint instead
+            if self._checkpoints:
+                self._restore(self._checkpoints[-1])
+            else:
+                self._restart()
+            while self._buffer_start + len(self._buffer) < self._decompressed_end:
+                if not self._decompress_next():
+                    break
+        
+        target = self._decompressed_end + max_bytes
+        while self._decompressed_end < target:
+            if not self._decompress_next():
+                self._is_complete = True
+                return False
+        
+        return True
+
+    def get_checkpoints(self) -> List[GzipCheckpoint]:
+        """
+        Returns the checkpoints recorded so far, ordered by their offsets.
+
+        """
+        return list(self._checkpoints)
+
+    def add_checkpoints(self, checkpoints : List[GzipCheckpoint]):
+        """
+        Adds checkpoints recorded by another reader of the same file (see UnitypackageParser._build_checkpoints).
+        Checkpoints at offsets this reader already has one for are skipped. Checkpoints are never modified
+        (restoring one copies its decompressor), so both readers can keep using them.
+
+        """
+        for checkpoint in checkpoints:
+            index = bisect.bisect_left(self._checkpoint_offsets, checkpoint.uncompressed_offset)
+            if index < len(self._checkpoint_offsets) and self._checkpoint_offsets[index] == checkpoint.uncompressed_offset:
+                continue
+            self._checkpoints.insert(index, checkpoint)
+            self._checkpoint_offsets.insert(index, checkpoint.uncompressed_offset)
+
+    def read(self, size : int = -1) -> bytes:
+        self._reposition()
+
+        chunks = []
+        remaining = size
+        while remaining != 0:
+            offset = self._pos - self._buffer_start
+            if offset >= len(self._buffer) or offset < 0:
+                if not self._decompress_next():
+                    break
+                continue
+
+            end = len(self._buffer) if remaining < 0 else min(len(self._buffer), offset + remaining)
+            chunks.append(self._buffer[offset:end])
+            self._pos += end - offset
+            if remaining > 0:
+                remaining -= end - offset
+
+        return b''.join(chunks)
+
+    def seek(self, offset : int, whence : int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            self._pos = offset
+        elif whence == os.SEEK_CUR:
+            self._pos += offset
+        else:
+            raise ValueError("Seeking relative to the end of a compressed stream is not supported!")
+
+        if self._pos < 0:
+            raise ValueError("Negative seek position!")
+
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seekable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'decompression_passes': self.decompression_passes,
+            'checkpoint_restores': self.checkpoint_restores,
+            'checkpoints': len(self._checkpoints),
+            'compressed_bytes_read': self.compressed_bytes_read,
+            'bytes_decompressed': self.bytes_decompressed,
+        }
+
+    def close(self):
+        self._checkpoints.clear()
+        self._checkpoint_offsets.clear()
+        self._fileobj.close()
@@ -0,0 +1,235 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import os
+import sys
+import struct
+import hashlib
+import logging
+from typing import NamedTuple, List, Union
+from ..config import log_level
+
+
+logger = logging.getLogger("IndexCache")
+logger.setLevel(log_level)
+
+
+# Bump whenever the binary layout changes, older cache files are discarded automatically
+CACHE_FORMAT_VERSION = 2
+
+_MAGIC = b'UPKI'
+_HEADER = struct.Struct('<4sHQq16sI') # Magic, version, file size, file mtime (ns), header hash, entry count
+_RECORD = struct.Struct('<16sQQqQqQH') # GUID, asset offset, asset size, meta offset (-1 if none), meta size, preview offset (-1 if none), preview size, pathname length
+_HEADER_HASH_SIZE = 64 * 1024
+
+
+class FileKey(NamedTuple):
+    """
+    Identifies a specific version of a .unitypackage file on disk.
+
+    """
+    path : str
+    size : int
+    mtime_ns : int
+    header_hash : bytes
+
+
+class IndexRecord(NamedTuple):
+    """
+    Cached index information about a single asset entry.
+    Offsets point at the start of the member data in the uncompressed tar stream.
+
+    """
+    guid : str
+    pathname : str
+    asset_offset : int
+    asset_size : int
+    meta_offset : int # -1 if the entry has no asset.meta member
+    meta_size : int
+    preview_offset : int = -1 # -1 if the entry has no preview.png member
+    preview_size : int = 0
+
+
+def get_cache_dir() -> str:
+    """
+    Returns the directory index cache files are stored in, following each platform's convention for user cache directories.
+    Can be overridden with the UNITYPACKAGE_IMPORTER_CACHE_DIR environment variable.
+
+    """
+    if override := os.environ.get('UNITYPACKAGE_IMPORTER_CACHE_DIR'):
+        return override
+
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~/AppData/Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+
+    return os.path.join(base, 'blender-unitypackage-importer', 'index')
+
+
+def get_file_key(filepath : str) -> FileKey:
+    """
+    Determines the cache key for a file: Its absolute path, size, modification time and a hash of its first 64 KiB.
+
+    """
+    path = os.path.abspath(filepath)
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        header_hash = hashlib.blake2b(f.read(_HEADER_HASH_SIZE), digest_size=16).digest()
+
+    return FileKey(path, stat.st_size, stat.st_mtime_ns, header_hash)
+
+
+def _get_cache_filepath(key : FileKey) -> str:
+    name = hashlib.blake2b(key.path.encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(get_cache_dir(), f"{name}.idx")
+
+
+def load_index(key : FileKey) -> Union[List[IndexRecord], None]:
+    """
+    Loads cached index records for the given file.
+    Returns None if there is no cache file or it doesn't match the current version of the file anymore,
+    in which case the outdated cache file is removed.
+
+    """
+    cache_filepath = _get_cache_filepath(key)
+    try:
+        with open(cache_filepath, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Couldn't read index cache file '{cache_filepath}': {e}")
+        return None
+
+    try:
+        records = _unpack_index(data, key)
+    except (struct.error, UnicodeDecodeError, ValueError) as e:
+        logger.warning(f"Discarding corrupt index cache file '{cache_filepath}': {e}")
+        records = None
+
+    if records is None:
+        _remove(cache_filepath)
+        return None
+
+    # Mark as recently used for eviction
+    try:
+        os.utime(cache_filepath)
+    except OSError:
+        pass
+
+    return records
+
+
+def save_index(key : FileKey, records : List[IndexRecord], max_cache_size : int):
+    """
+    Writes index records for the given file to the cache and evicts the least recently used
+    cache files until the cache directory holds no more than max_cache_size bytes.
+    Failing to write the cache is not an error, it only makes the next load slower.
+
+    """
+    cache_dir = get_cache_dir()
+    cache_filepath = _get_cache_filepath(key)
+    temp_filepath = f"{cache_filepath}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_filepath, 'wb') as f:
+            f.write(_pack_index(key, records))
+        os.replace(temp_filepath, cache_filepath) # Atomic, readers never see partially written files
+    except (OSError, ValueError) as e:
+        logger.warning(f"Couldn't write index cache file '{cache_filepath}': {e}")
+        _remove(temp_filepath)
+        return
+
+    evict(max_cache_size)
+
+
+def evict(max_cache_size : int):
+    """
+    Removes the least recently used cache files until the total size of the cache is within max_cache_size bytes.
+
+    """
+    cache_dir = get_cache_dir()
+    try:
+        cache_files = [ entry for entry in os.scandir(cache_dir) if entry.name.endswith('.idx') ]
+    except OSError:
+        return
+
+    cache_files_stats = []
+    for entry in cache_files:
+        try:
+            cache_files_stats.append((entry.path, entry.stat()))
+        except OSError:
+            pass
+
+    total_size = sum(stat.st_size for _, stat in cache_files_stats)
+    for path, stat in sorted(cache_files_stats, key=lambda e: e[1].st_mtime_ns):
+        if total_size <= max_cache_size:
+            break
+        logger.debug(f"Evicting index cache file '{path}'...")
+        _remove(path)
+        total_size -= stat.st_size
+
+
+def _remove(path : str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _pack_index(key : FileKey, records : List[IndexRecord]) -> bytes:
+    path = key.path.encode('utf-8')
+    parts = [ _HEADER.pack(_MAGIC, CACHE_FORMAT_VERSION, key.size, key.mtime_ns, key.header_hash, len(records)), struct.pack('<H', len(path)), path ]
+    for record in records:
+        guid = bytes.fromhex(record.guid)
+        if len(guid) != 16 or guid.hex() != record.guid:
+            raise ValueError(f"Unexpected GUID format '{record.guid}'!")
+        pathname = record.pathname.encode('utf-8')
+        parts.append(_RECORD.pack(guid, record.asset_offset, record.asset_size, record.meta_offset, record.meta_size, record.preview_offset, record.preview_size, len(pathname)))
+        parts.append(pathname)
+
+    return b''.join(parts)
+
+
+def _unpack_index(data : bytes, key : FileKey) -> Union[List[IndexRecord], None]:
+    magic, version, size, mtime_ns, header_hash, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != CACHE_FORMAT_VERSION:
+        return None
+
+    offset = _HEADER.size
+    path_len, = struct.unpack_from('<H', data, offset)
+    offset += 2
+    path = data[offset:offset + path_len].decode('utf-8')
+    offset += path_len
+    if FileKey(path, size, mtime_ns, header_hash) != key:
+        # File changed (or hash collision of path)
+        return None
+
+    records = []
+    for _ in range(count):
+        guid, asset_offset, asset_size, meta_offset, meta_size, preview_offset, preview_size, pathname_len = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        pathname = data[offset:offset + pathname_len].decode('utf-8')
+        offset += pathname_len
+        records.append(IndexRecord(guid.hex(), pathname, asset_offset, asset_size, meta_offset, meta_size, preview_offset, preview_size))
+
+    if offset != len(data):
+        raise ValueError("Unexpected trailing data!")
+
+    return records
@@ -0,0 +1,178 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import logging
+import threading
+from collections import deque
+from typing import Any, Iterable, Generator, Tuple
+from ..config import log_level
+from .unitypackage_parser import UnitypackageParser, AssetEntry
+from .content_hash import hash_bytes
+
+
+logger = logging.getLogger("Pipeline")
+logger.setLevel(log_level)
+
+
+class PipelineClosed(Exception):
+    """
+    Raised when putting items into a ByteBudgetQueue that has been closed.
+
+    """
+    pass
+
+
+class ByteBudgetQueue():
+    """
+    Thread-safe FIFO queue which is bounded by the total size of its items in bytes instead of their count.
+    A single item larger than the budget is still accepted once the queue is empty, so nothing can get stuck.
+
+    """
+    max_bytes : int
+    queued_bytes : int
+
+    def __init__(self, max_bytes : int):
+        self.max_bytes = max_bytes
+        self.queued_bytes = 0
+        self._items = deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, item : Any, size : int):
+        """
+        Adds an item of the given size, blocking until there's enough room in the budget.
+        Raises PipelineClosed if the queue was closed.
+
+        """
+        with self._condition:
+            while not self._closed and self._items and self.queued_bytes + size > self.max_bytes:
+                self._condition.wait()
+            if self._closed:
+                raise PipelineClosed()
+
+            self._items.append((item, size))
+            self.queued_bytes += size
+            self._condition.notify_all()
+
+    def get(self) -> Any:
+        """
+        Removes and returns the oldest item, blocking until one is available.
+        Raises PipelineClosed if the queue was closed.
+
+        """
+        with self._condition:
+            while not self._closed and not self._items:
+                self._condition.wait()
+            if self._closed:
+                raise PipelineClosed()
+
+            item, size = self._items.popleft()
+            self.queued_bytes -= size
+            self._condition.notify_all()
+            return item
+
+    def close(self):
+        """
+        Closes the queue, discarding queued items and waking up all waiting threads.
+
+        """
+        with self._condition:
+            self._closed = True
+            self._items.clear()
+            self.queued_bytes = 0
+            self._condition.notify_all()
+
+
+class AssetPrefetcher():
+    """
+    Extracts assets on a background thread while the main thread processes the ones extracted before.
+    Iterating over it yields (asset_entry, data) in archive order, just like UnitypackageParser.iter_assets.
+    At most max_bytes of extracted data are staged at a time.
+    If hash_contents is set, the content hash of every asset is computed on the background thread as well,
+    and available in content_hashes (by GUID) by the time the asset is yielded.
+    If prefetch_meta is set, the asset.meta member of every asset is extracted into the parser's cache right after it,
+    so reading it afterwards doesn't need to seek back in the archive.
+
+    Decompression releases the GIL, so it can run while the main thread is busy with other work.
+    Should be used as a context manager, so the background thread is stopped if the consumer stops early.
+
+    """
+    _parser : UnitypackageParser
+    _guids : list[str]
+    _key : str
+    _queue : ByteBudgetQueue
+    content_hashes : dict[str, str]
+
+    def __init__(self, parser : UnitypackageParser, guids : Iterable[str], max_bytes : int, key : str = 'asset', hash_contents : bool = False, prefetch_meta : bool = False):
+        self._parser = parser
+        self._guids = list(guids)
+        self._key = key
+        self._hash_contents = hash_contents
+        self._prefetch_meta = prefetch_meta
+        self.content_hashes = {}
+        self._queue = ByteBudgetQueue(max_bytes)
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _run(self):
+        try:
+            for asset_entry, data in self._parser.iter_assets(self._guids, self._key):
+                if self._hash_contents:
+                    self.content_hashes[asset_entry.guid] = hash_bytes(data)
+                if self._prefetch_meta and asset_entry.has_keys('asset_meta'):
+                    asset_entry.get_value('asset_meta')
+                self._queue.put((asset_entry, data, None), len(data))
+            self._queue.put((None, None, None), 0)
+
+        except PipelineClosed:
+            # Consumer stopped early
+            pass
+
+        except Exception as e:
+            # Hand exception over to the consumer
+            try:
+                self._queue.put((None, None, e), 0)
+            except PipelineClosed:
+                pass
+
+    def __iter__(self) -> Generator[Tuple[AssetEntry, bytes], None, None]:
+        if self._thread:
+            raise Exception("AssetPrefetcher can only be iterated once!")
+
+        self._thread = threading.Thread(target=self._run, name="AssetPrefetcher", daemon=True)
+        self._thread.start()
+
+        while True:
+            asset_entry, data, exception = self._queue.get()
+            if exception:
+                raise exception
+            if asset_entry is None:
+                return
+            yield asset_entry, data
+
+    def close(self):
+        """
+        Stops the background thread and discards everything that was staged but not consumed yet.
+
+        """
+        self._queue.close()
+        if self._thread:
+            self._thread.join()
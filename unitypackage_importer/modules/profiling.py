@@ -0,0 +1,206 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Lightweight instrumentation: nested timing spans and counters, exportable as JSON or in Chrome's trace event format
+(open in chrome://tracing or https://ui.perfetto.dev).
+
+Disabled by default (see profiling_enabled in config.py, or call enable()). While disabled, span() returns a shared
+no-op context manager and count() returns right away, so instrumented code costs about one function call per span.
+
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Union
+from ..config import log_level, profiling_enabled
+
+
+logger = logging.getLogger("Profiling")
+logger.setLevel(log_level)
+
+
+_enabled = profiling_enabled
+_lock = threading.Lock()
+_start_ns = time.perf_counter_ns()
+# (name, category, start_ns, duration_ns, thread_id, args) of every finished span
+_spans : list[tuple] = []
+# Current value of every counter, and (name, timestamp_ns, value) whenever one changed
+_counters : dict[str, int] = {}
+_counter_samples : list[tuple] = []
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """
+    Discards everything recorded so far.
+
+    """
+    global _start_ns
+    with _lock:
+        _start_ns = time.perf_counter_ns()
+        _spans.clear()
+        _counters.clear()
+        _counter_samples.clear()
+
+
+class _Span():
+    """
+    Context manager recording a single span. Spans nest naturally, since inner ones finish before outer ones.
+
+    """
+    __slots__ = ('name', 'category', 'args', '_start_ns')
+
+    def __init__(self, name : str, category : str, args : dict):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        end_ns = time.perf_counter_ns()
+        _spans.append((self.name, self.category, self._start_ns, end_ns - self._start_ns, threading.get_ident(), self.args))
+
+
+class _NullSpan():
+    """
+    Context manager doing nothing, returned by span() while profiling is disabled.
+
+    """
+    __slots__ = ()
+    args = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name : str, category : str = 'default', /, **args) -> Union[_Span, _NullSpan]:
+    """
+    Returns a context manager measuring the time spent inside of it. Keyword arguments are attached to the span,
+    more can be added to its args dictionary while it's running (only while profiling is enabled).
+    name and category are positional only, so arguments can be called 'name' as well.
+
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def count(name : str, value : int = 1):
+    """
+    Adds value to a counter.
+
+    """
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+        _counter_samples.append((name, time.perf_counter_ns(), total))
+
+
+def get_summary() -> dict[str, Any]:
+    """
+    Returns the total time, self time (without nested spans on the same thread) and call count per span name, and all counters.
+
+    """
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+
+    # Find direct parents: sort by start (outer spans first for equal starts), then walk a stack per thread
+    spans.sort(key=lambda s: (s[4], s[2], -s[3]))
+    totals = {}
+    stacks = {}
+    for name, category, start_ns, duration_ns, thread_id, args in spans:
+        stack = stacks.setdefault(thread_id, [])
+        while stack and stack[-1][0] + stack[-1][1] <= start_ns:
+            stack.pop()
+        if stack:
+            totals[stack[-1][2]]['self_seconds'] -= duration_ns / 1e9
+        
+        total = totals.setdefault(name, { 'calls': 0, 'total_seconds': 0.0, 'self_seconds': 0.0 })
+        total['calls'] += 1
+        total['total_seconds'] += duration_ns / 1e9
+        total['self_seconds'] += duration_ns / 1e9
+        stack.append((start_ns, duration_ns, name))
+
+    return { 'spans': totals, 'counters': counters }
+
+
+def export_json(filepath : str):
+    """
+    Writes all recorded spans and counters, as well as the summary, to a JSON file.
+
+    """
+    with _lock:
+        data = {
+            'spans': [
+                { 'name': name, 'category': category, 'start_seconds': (start_ns - _start_ns) / 1e9, 'duration_seconds': duration_ns / 1e9, 'thread': thread_id, 'args': args }
+                for name, category, start_ns, duration_ns, thread_id, args in _spans
+            ],
+            'counters': dict(_counters),
+        }
+    data['summary'] = get_summary()
+
+    with open(filepath, 'w') as f:
+        json.dump(data, f, indent=1, default=str)
+    logger.info(f"Wrote profile to '{filepath}'.")
+
+
+def export_chrome_trace(filepath : str):
+    """
+    Writes all recorded spans and counters in Chrome's trace event format.
+
+    """
+    process_id = os.getpid()
+    with _lock:
+        events = [
+            { 'name': name, 'cat': category, 'ph': 'X', 'ts': (start_ns - _start_ns) / 1e3, 'dur': duration_ns / 1e3, 'pid': process_id, 'tid': thread_id, 'args': args }
+            for name, category, start_ns, duration_ns, thread_id, args in _spans
+        ]
+        events.extend(
+            { 'name': name, 'ph': 'C', 'ts': (timestamp_ns - _start_ns) / 1e3, 'pid': process_id, 'args': { 'value': value } }
+            for name, timestamp_ns, value in _counter_samples
+        )
+    
+    with open(filepath, 'w') as f:
+        json.dump({ 'traceEvents': events, 'displayTimeUnit': 'ms' }, f, default=str)
+    logger.info(f"Wrote Chrome trace to '{filepath}'.")
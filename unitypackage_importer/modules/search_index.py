@@ -0,0 +1,88 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import bisect
+import logging
+from array import array
+from typing import List
+from ..config import log_level
+
+
+logger = logging.getLogger("SearchIndex")
+logger.setLevel(log_level)
+
+
+class TrigramIndex():
+    """
+    Case-insensitive substring search over a fixed list of strings.
+    Every string is split into all of its three character sequences (trigrams), and each trigram maps to the sorted
+    ids of the strings containing it. A query only has to look at strings containing all of its trigrams,
+    instead of scanning every string. Queries shorter than three characters fall back to a scan.
+
+    """
+    _texts : List[str]
+    _postings : dict[str, array]
+
+    def __init__(self, texts : List[str]):
+        self._texts = [ text.lower() for text in texts ]
+
+        postings = {}
+        for text_id, text in enumerate(self._texts):
+            for trigram in { text[i:i + 3] for i in range(len(text) - 2) }:
+                if (posting := postings.get(trigram)) is None:
+                    posting = postings[trigram] = array('I')
+                posting.append(text_id) # Ids are added in ascending order, so postings stay sorted
+        self._postings = postings
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def search(self, query : str) -> List[int]:
+        """
+        Returns the sorted ids (indices in the original list) of all strings containing query, ignoring case.
+
+        """
+        query = query.lower()
+        if len(query) < 3:
+            return [ text_id for text_id, text in enumerate(self._texts) if query in text ]
+
+        # Start with the rarest trigram, then keep only candidates that contain the others as well
+        postings = []
+        for trigram in { query[i:i + 3] for i in range(len(query) - 2) }:
+            if (posting := self._postings.get(trigram)) is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) * 16 < len(posting):
+                # Few candidates, look them up in the (sorted) posting
+                candidates = [ text_id for text_id in candidates if _contains(posting, text_id) ]
+            else:
+                posting_ids = set(posting)
+                candidates = [ text_id for text_id in candidates if text_id in posting_ids ]
+            if not candidates:
+                return []
+
+        # Trigrams can appear in any order, verify the actual substring
+        texts = self._texts
+        return [ text_id for text_id in candidates if query in texts[text_id] ]
+
+
+def _contains(posting : array, text_id : int) -> bool:
+    pos = bisect.bisect_left(posting, text_id)
+    return pos < len(posting) and posting[pos] == text_id
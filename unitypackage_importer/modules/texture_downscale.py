@@ -0,0 +1,178 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Optional stage reducing the resolution of textures before they're loaded into Blender.
+Images are decoded, downsampled and encoded again in worker processes, so only the reduced images reach bpy.data.images.
+Requires the Pillow package (not bundled with Blender), without it textures are imported at full size.
+
+"""
+import io
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Tuple, Union
+from ..config import log_level
+
+try:
+    from PIL import Image
+except ModuleNotFoundError:
+    Image = None
+
+
+logger = logging.getLogger("TextureDownscale")
+logger.setLevel(log_level)
+
+
+# Formats Pillow can write, images of other formats are encoded as PNG after downscaling
+_WRITABLE_FORMATS = { 'PNG', 'JPEG', 'BMP', 'TGA', 'TIFF', 'WEBP' }
+
+_FORMAT_OPTIONS = {
+    'JPEG': { 'quality': 95 },
+    'WEBP': { 'quality': 95 },
+    'PNG': { 'compress_level': 1 }, # Decoded again right away, no point in compressing hard
+}
+
+
+# File extensions of the formats downscaled images are written in, the first one is used when an image has to be renamed
+_FORMAT_EXTENSIONS = {
+    'PNG': [ '.png' ],
+    'JPEG': [ '.jpg', '.jpeg' ],
+    'BMP': [ '.bmp' ],
+    'TGA': [ '.tga' ],
+    'TIFF': [ '.tif', '.tiff' ],
+    'WEBP': [ '.webp' ],
+}
+
+
+def is_available() -> bool:
+    return Image is not None
+
+
+def get_image_size(data : bytes) -> Union[tuple[int, int], None]:
+    """
+    Returns (width, height) of an encoded image by reading its header only, or None if Pillow can't read it.
+
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        # Pillow raises all kinds of exceptions for formats it doesn't know (EXR, HDR, ...)
+        return None
+
+
+def downscale_image(data : bytes, max_size : int) -> Union[Tuple[bytes, str], None]:
+    """
+    Reduces an encoded image so neither side exceeds max_size, keeping the aspect ratio, and returns it encoded again
+    (in the same format if possible) as (data, format), format being Pillow's name of it ('PNG', 'JPEG', ...).
+    Returns None if the image is small enough already or can't be processed.
+    Runs in worker processes, so it needs to stay a module level function.
+
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            factor = max(width, height) / max_size
+            if factor <= 1:
+                return None
+            
+            image_format = image.format
+            if image.mode == 'P':
+                # Palette images can only be resized without filtering
+                image = image.convert('RGBA')
+            
+            new_size = (max(round(width / factor), 1), max(round(height / factor), 1))
+            if width % new_size[0] == 0 and height % new_size[1] == 0 and width // new_size[0] == height // new_size[1]:
+                # Integer factor (power of two textures), average each block of pixels (box filter)
+                resized = image.reduce(width // new_size[0])
+            else:
+                resized = image.resize(new_size, getattr(Image, 'Resampling', Image).LANCZOS)
+
+            if image_format not in _WRITABLE_FORMATS:
+                image_format = 'PNG'
+            output = io.BytesIO()
+            resized.save(output, image_format, **_FORMAT_OPTIONS.get(image_format, {}))
+            return output.getvalue(), image_format
+
+    except Exception as e:
+        logger.debug(f"Couldn't downscale image: {e}")
+        return None
+
+
+def get_downscaled_basename(basename : str, image_format : str) -> str:
+    """
+    Returns the file name for a downscaled image, with the extension changed if it was written in another format (see downscale_image).
+
+    """
+    stem, extension = os.path.splitext(basename)
+    extensions = _FORMAT_EXTENSIONS[image_format]
+    return basename if extension.lower() in extensions else stem + extensions[0]
+
+
+def get_downscaled_content_hash(content_hash : str, max_size : int) -> str:
+    """
+    Returns the content hash images downscaled to max_size are tagged with, instead of the hash of the full size data.
+    Imports with another (or without a) size limit don't mistake them for the full size image that way.
+
+    """
+    return f"{content_hash}@{max_size}"
+
+
+class TextureDownscaler():
+    """
+    Pool of worker processes downscaling textures in parallel while the main thread loads others into Blender.
+    Should be used as a context manager, or closed when it's not needed anymore.
+
+    """
+    max_workers : int
+
+    def __init__(self, max_workers : Union[int, None] = None):
+        if not is_available():
+            raise Exception("Downscaling textures requires the Pillow package!")
+        self._executor = None
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def submit(self, data : bytes, max_size : int) -> Union[Future, None]:
+        """
+        Starts downscaling an image in a worker process if it's larger than max_size.
+        Returns a future resolving to the result of downscale_image, or None right away if the image doesn't need
+        downscaling (checked in this process, so small images aren't sent to a worker at all).
+
+        """
+        size = get_image_size(data)
+        if size is None or max(size) <= max_size:
+            return None
+        
+        if self._executor is None:
+            # Started on first use, most imports don't have anything to downscale
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor.submit(downscale_image, data, max_size)
+
+    def close(self):
+        """
+        Stops the worker processes, discarding pending work.
+
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
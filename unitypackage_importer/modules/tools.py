@@ -15,6 +15,7 @@
 #
 # ##### END GPL LICENSE BLOCK #####
 from time import time
+from . import profiling
 
 
 def print_dict_recursive(data:dict, depth=0):
@@ -39,6 +40,7 @@ def format_dict_recursive(data:dict, depth=0):
 def timer(logger, condition=True):
     """
     Simple timing decorator to measure and log execution time of synchronous functions.
+    Calls are also recorded as profiling spans (see profiling.py) named after the function.
 
     """
     def decorator(f):
@@ -46,13 +48,14 @@ def timer(logger, condition=True):
             # Passthrough
             return lambda *args, **kwargs : f(*args, **kwargs)
         
+        span_name = f.__qualname__
         def wrapper(*args, **kwargs):
             t1 = time()
-            result = f(*args, **kwargs)
+            with profiling.span(span_name, 'timer'):
+                result = f(*args, **kwargs)
             t2 = time()
             logger.debug(f"Function {f.__name__!r} took {(t2-t1):.4f}s")
             
             return result
         return wrapper
     return decorator
-        
\ No newline at end of file
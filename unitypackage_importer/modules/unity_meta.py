@@ -0,0 +1,153 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Reads the import settings Unity stores in asset.meta files, for the TextureImporter and ModelImporter sections.
+Only the handful of fields we apply in Blender are parsed (see UnityYamlFile.get_field), which takes a few microseconds
+per file, so settings can be read for every asset right when it's imported.
+
+"""
+import re
+import logging
+from typing import Any, NamedTuple, Union
+from ..config import log_level
+from .unity_yaml import UnityYamlFile, UnityYamlDocument
+
+
+logger = logging.getLogger("UnityMeta")
+logger.setLevel(log_level)
+
+
+_IMPORTER_SECTION = re.compile(rb'^(TextureImporter|ModelImporter):[ \t]*\r?$', re.MULTILINE)
+
+# TextureImporter.textureType values
+TEXTURE_TYPE_NORMAL_MAP = 1
+
+# TextureImporter.alphaUsage values
+ALPHA_USAGE_NONE = 0
+ALPHA_USAGE_FROM_INPUT = 1
+ALPHA_USAGE_FROM_GRAYSCALE = 2
+
+# TextureImporter.textureSettings.wrapU / wrapV values (-1 is Unity's default, which repeats)
+WRAP_MODE_REPEAT = 0
+WRAP_MODE_CLAMP = 1
+WRAP_MODE_MIRROR = 2
+WRAP_MODE_MIRROR_ONCE = 3
+
+
+class TextureImporterSettings(NamedTuple):
+    """
+    Import settings of a texture. Defaults are what Unity uses for fields missing from the .meta file.
+
+    """
+    srgb : bool = True # Color data, otherwise linear (non-color) data
+    is_normal_map : bool = False
+    alpha_usage : int = ALPHA_USAGE_FROM_INPUT
+    alpha_is_transparency : bool = False # Otherwise alpha is just another data channel
+    wrap_u : int = WRAP_MODE_REPEAT
+    wrap_v : int = WRAP_MODE_REPEAT
+    max_texture_size : Union[int, None] = None # Of the default platform
+
+
+class ModelImporterSettings(NamedTuple):
+    """
+    Import settings of a model. Defaults are what Unity uses for fields missing from the .meta file.
+
+    """
+    global_scale : float = 1.0 # Scale Factor
+    use_file_scale : bool = True # Apply the units stored in the file (Convert Units)
+
+
+def _get_int(yaml_file : UnityYamlFile, document : UnityYamlDocument, path : list[str], default : Any) -> Any:
+    value = yaml_file.get_field(document, path, None)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _get_float(yaml_file : UnityYamlFile, document : UnityYamlDocument, path : list[str], default : Any) -> Any:
+    value = yaml_file.get_field(document, path, None)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _read_texture_importer(yaml_file : UnityYamlFile, document : UnityYamlDocument) -> TextureImporterSettings:
+    # Older versions of Unity store linearTexture instead of sRGBTexture, and normalMap instead of a texture type
+    linear = _get_int(yaml_file, document, [ 'mipmaps', 'linearTexture' ], 0)
+    srgb = _get_int(yaml_file, document, [ 'mipmaps', 'sRGBTexture' ], 0 if linear else 1)
+    texture_type = _get_int(yaml_file, document, [ 'textureType' ], -1)
+    is_normal_map = texture_type == TEXTURE_TYPE_NORMAL_MAP or (texture_type == -1 and _get_int(yaml_file, document, [ 'bumpmap', 'convertToNormalMap' ], 0) == 0 and _get_int(yaml_file, document, [ 'normalMap' ], 0) == 1)
+
+    wrap_mode = _get_int(yaml_file, document, [ 'textureSettings', 'wrapMode' ], WRAP_MODE_REPEAT)
+    wrap_u = _get_int(yaml_file, document, [ 'textureSettings', 'wrapU' ], wrap_mode)
+    wrap_v = _get_int(yaml_file, document, [ 'textureSettings', 'wrapV' ], wrap_mode)
+
+    # The default platform's settings are the ones Unity actually uses, older files only have the top level one
+    max_texture_size = _get_int(yaml_file, document, [ 'maxTextureSize' ], None)
+    for platform_settings in yaml_file.get_field(document, 'platformSettings', None) or []:
+        if isinstance(platform_settings, dict) and platform_settings.get('buildTarget') == 'DefaultTexturePlatform':
+            try:
+                max_texture_size = int(platform_settings.get('maxTextureSize'))
+            except (TypeError, ValueError):
+                pass
+            break
+
+    return TextureImporterSettings(
+        srgb=bool(srgb),
+        is_normal_map=is_normal_map,
+        alpha_usage=_get_int(yaml_file, document, [ 'alphaUsage' ], ALPHA_USAGE_FROM_INPUT),
+        alpha_is_transparency=bool(_get_int(yaml_file, document, [ 'alphaIsTransparency' ], 0)),
+        wrap_u=wrap_u if wrap_u >= 0 else WRAP_MODE_REPEAT,
+        wrap_v=wrap_v if wrap_v >= 0 else WRAP_MODE_REPEAT,
+        max_texture_size=max_texture_size,
+    )
+
+
+def _read_model_importer(yaml_file : UnityYamlFile, document : UnityYamlDocument) -> ModelImporterSettings:
+    return ModelImporterSettings(
+        global_scale=_get_float(yaml_file, document, [ 'meshes', 'globalScale' ], 1.0),
+        use_file_scale=bool(_get_int(yaml_file, document, [ 'meshes', 'useFileScale' ], 1)),
+    )
+
+
+def parse_importer_settings(meta : Union[bytes, None]) -> Union[TextureImporterSettings, ModelImporterSettings, None]:
+    """
+    Reads the import settings from the contents of an asset.meta file.
+    Returns None if there is no TextureImporter or ModelImporter section (or no meta file at all).
+
+    """
+    if not meta:
+        return None
+    
+    match = _IMPORTER_SECTION.search(meta)
+    if not match:
+        return None
+
+    # The importer section is read like the root mapping of a Unity YAML document, it's the same format
+    # (.meta files have no document headers, so the file itself has no documents)
+    yaml_file = UnityYamlFile(meta)
+    document = UnityYamlDocument(0, 0, False, match.start(), len(meta))
+    try:
+        if match.group(1) == b'TextureImporter':
+            return _read_texture_importer(yaml_file, document)
+        return _read_model_importer(yaml_file, document)
+    except (UnicodeDecodeError, ValueError, IndexError) as e:
+        logger.warning(f"Couldn't read import settings: {e}")
+        return None
+
@@ -0,0 +1,420 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+"""
+Fast scanner for Unity's YAML based file formats (.unity, .prefab, .mat, .asset, ...).
+
+A Unity YAML file is a sequence of documents, each starting with a '--- !u!<classID> &<fileID>' header.
+Instead of parsing everything (which is what makes general purpose YAML parsers so slow on big scenes),
+the scanner only splits the file on those headers and remembers where each document starts and ends.
+Fields are then parsed on request, only for the documents and fields that are actually needed.
+The parser understands the subset of YAML Unity writes: block mappings and sequences, flow mappings / sequences
+and plain or quoted scalars. All scalars are returned as strings.
+
+"""
+import re
+import json
+import logging
+from typing import Any, Generator, List, Tuple, Union
+from ..config import log_level
+
+
+logger = logging.getLogger("UnityYaml")
+logger.setLevel(log_level)
+
+
+# Class IDs of document types we're interested in, see https://docs.unity3d.com/Manual/ClassIDReference.html
+MATERIAL_CLASS_ID = 21
+PREFAB_INSTANCE_CLASS_ID = 1001
+
+_DOCUMENT_HEADER = re.compile(rb'^--- !u!(\d+) &(-?\d+)( stripped)?[^\n]*\n?', re.MULTILINE)
+_MAPPING_KEY = re.compile(r'[^\s\-{\[\'"#][^:]*:(?: |$)')
+
+
+class UnityYamlDocument():
+    """
+    Location of a single document within a Unity YAML file.
+    start and end are byte offsets of the document body (everything after the header line).
+
+    """
+    __slots__ = ('class_id', 'file_id', 'is_stripped', 'start', 'end')
+
+    class_id : int
+    file_id : int
+    is_stripped : bool
+    start : int
+    end : int
+
+    def __init__(self, class_id : int, file_id : int, is_stripped : bool, start : int, end : int):
+        self.class_id = class_id
+        self.file_id = file_id
+        self.is_stripped = is_stripped
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"<UnityYamlDocument (Class ID: {self.class_id}, File ID: {self.file_id})>"
+
+
+class UnityYamlFile():
+    """
+    Index of the documents in a Unity YAML file, with on-demand parsing of individual documents or fields.
+
+    """
+    documents : List[UnityYamlDocument]
+
+    def __init__(self, data : bytes):
+        self._data = data
+        self.documents = []
+
+        headers = list(_DOCUMENT_HEADER.finditer(data))
+        for index, header in enumerate(headers):
+            end = headers[index + 1].start() if index + 1 < len(headers) else len(data)
+            self.documents.append(UnityYamlDocument(int(header.group(1)), int(header.group(2)), bool(header.group(3)), header.end(), end))
+
+        self._documents_by_file_id = { document.file_id: document for document in self.documents }
+
+    def find_documents(self, class_id : int) -> Generator[UnityYamlDocument, None, None]:
+        """
+        Generator to return all documents of the given class ID.
+
+        """
+        for document in self.documents:
+            if document.class_id == class_id:
+                yield document
+
+    def get_document(self, file_id : int) -> UnityYamlDocument:
+        """
+        Retrieves a document by its file ID (the anchor in the header).
+        Raises KeyError if not found.
+
+        """
+        return self._documents_by_file_id[file_id]
+
+    def get_class_name(self, document : UnityYamlDocument) -> str:
+        """
+        Returns the class name of a document (the key of its root mapping).
+
+        """
+        line_end = self._data.find(b'\n', document.start, document.end)
+        line = self._data[document.start:line_end if line_end >= 0 else document.end]
+        return line.decode('utf-8').strip().rstrip(':')
+
+    def parse_document(self, document : UnityYamlDocument) -> dict:
+        """
+        Fully parses a document. Returns the contents of its root mapping (without the class name).
+        Only use this for small documents, get_field is a lot cheaper if just a few fields are needed.
+
+        """
+        lines = _split_lines(self._data[document.start:document.end])
+        if not lines:
+            return {}
+
+        root = _BlockParser(lines).parse_mapping(0)
+        if not root:
+            return {}
+        
+        return next(iter(root.values())) or {}
+
+    def get_field(self, document : UnityYamlDocument, path : Union[str, List[str]], default : Any = KeyError) -> Any:
+        """
+        Parses a single field of a document, without parsing anything else.
+        path is either the name of a field of the document's root mapping, or a list of names for nested mappings
+        (e.g. ['m_SavedProperties', 'm_TexEnvs']).
+        Returns default if the field doesn't exist, or raises KeyError if no default was provided.
+
+        """
+        if type(path) == str:
+            path = [ path ]
+
+        start, end = document.start, document.end
+        indentation = 2 # Fields of the root mapping, the first line is the class name
+        for name in path:
+            block = self._find_field(name, indentation, start, end)
+            if not block:
+                if default is KeyError:
+                    raise KeyError('.'.join(path))
+                return default
+            start, end = block
+            indentation += 2
+
+        lines = _split_lines(self._data[start:end])
+        return next(iter(_BlockParser(lines).parse_mapping(indentation - 2).values()))
+
+    def _find_field(self, name : str, indentation : int, start : int, end : int) -> Union[Tuple[int, int], None]:
+        """
+        Finds a mapping key at the given indentation within start and end.
+        Returns the byte range of the key line and all lines belonging to its value.
+
+        """
+        needle = b'\n' + b' ' * indentation + name.encode('utf-8') + b':'
+        position = start - 1
+        while True:
+            position = self._data.find(needle, position + 1, end)
+            if position < 0:
+                return None
+            after = position + len(needle)
+            if after >= end or self._data[after] in b' \r\n':
+                break
+
+        # Value ends at the first line that's indented less or equal (except sequence items at the same level)
+        field_start = position + 1
+        line_start = self._data.find(b'\n', after, end) + 1
+        while 0 < line_start < end:
+            line_end = self._data.find(b'\n', line_start, end)
+            if line_end < 0:
+                line_end = end
+            
+            line = self._data[line_start:line_end]
+            content = line.lstrip(b' ')
+            if content.strip():
+                line_indentation = len(line) - len(content)
+                if line_indentation < indentation or (line_indentation == indentation and not content.startswith(b'-')):
+                    return field_start, line_start
+
+            line_start = line_end + 1
+
+        return field_start, end
+
+
+def _split_lines(data : bytes) -> List[str]:
+    return [ line for line in data.decode('utf-8').splitlines() if line.strip() ]
+
+
+def _get_indentation(line : str) -> int:
+    return len(line) - len(line.lstrip(' '))
+
+
+class _BlockParser():
+    """
+    Minimal block-style YAML parser for the subset Unity uses.
+    Works on a list of non-empty lines.
+
+    """
+    def __init__(self, lines : List[str]):
+        self._lines = lines
+        self._pos = 0
+
+    def parse_node(self, indentation : int) -> Any:
+        line = self._lines[self._pos]
+        line_indentation = _get_indentation(line)
+        if line.startswith('-', line_indentation):
+            return self.parse_sequence(line_indentation)
+        return self.parse_mapping(line_indentation)
+
+    def parse_mapping(self, indentation : int) -> dict:
+        result = {}
+        lines = self._lines
+        while self._pos < len(lines):
+            line = lines[self._pos]
+            line_indentation = _get_indentation(line)
+            if line_indentation != indentation or line.startswith('-', indentation):
+                break
+
+            key, _, value = line[indentation:].partition(':')
+            self._pos += 1
+            value = value.strip()
+            if value:
+                result[key] = self._parse_inline(value, indentation)
+            elif self._pos < len(lines) and self._is_child(lines[self._pos], indentation):
+                result[key] = self.parse_node(indentation + 1)
+            else:
+                result[key] = None
+
+        return result
+
+    def parse_sequence(self, indentation : int) -> list:
+        result = []
+        lines = self._lines
+        while self._pos < len(lines):
+            line = lines[self._pos]
+            if _get_indentation(line) != indentation or not line.startswith('-', indentation):
+                break
+
+            content = line[indentation + 1:].lstrip(' ')
+            if not content:
+                self._pos += 1
+                result.append(self.parse_node(indentation + 1) if self._pos < len(lines) and _get_indentation(lines[self._pos]) > indentation else None)
+            elif _MAPPING_KEY.match(content):
+                # Mapping as sequence item, continues on the following lines with the indentation of its first key
+                item_indentation = len(line) - len(content)
+                lines[self._pos] = ' ' * item_indentation + content
+                result.append(self.parse_mapping(item_indentation))
+            else:
+                self._pos += 1
+                result.append(self._parse_inline(content, indentation))
+
+        return result
+
+    def _is_child(self, line : str, indentation : int) -> bool:
+        line_indentation = _get_indentation(line)
+        return line_indentation > indentation or (line_indentation == indentation and line.startswith('-', indentation))
+
+    def _parse_inline(self, value : str, indentation : int) -> Any:
+        # Long scalars and flow collections continue on the following, deeper indented lines
+        lines = self._lines
+        is_flow = value[0] in '{['
+        while self._pos < len(lines) and _get_indentation(lines[self._pos]) > indentation:
+            if is_flow:
+                # Flow collection continues until all brackets are closed
+                if value.count('{') + value.count('[') <= value.count('}') + value.count(']'):
+                    break
+            elif _MAPPING_KEY.match(lines[self._pos].lstrip(' ')):
+                break
+            value += ' ' + lines[self._pos].strip()
+            self._pos += 1
+
+        if is_flow:
+            return _parse_flow(value, 0)[0]
+        return _parse_scalar(value)
+
+
+def _parse_scalar(value : str) -> str:
+    value = value.strip()
+    if value.startswith("'") and value.endswith("'") and len(value) > 1:
+        return value[1:-1].replace("''", "'")
+    if value.startswith('"') and value.endswith('"') and len(value) > 1:
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value[1:-1]
+    return value
+
+
+def _parse_flow(text : str, pos : int) -> Tuple[Any, int]:
+    """
+    Parses a flow collection or scalar starting at pos. Returns the value and the position after it.
+
+    """
+    while text[pos] == ' ':
+        pos += 1
+
+    if text[pos] == '{':
+        result = {}
+        pos += 1
+        while True:
+            while text[pos] in ' ,':
+                pos += 1
+            if text[pos] == '}':
+                return result, pos + 1
+            colon = text.index(':', pos)
+            key = text[pos:colon].strip()
+            value, pos = _parse_flow(text, colon + 1)
+            result[key] = value
+
+    if text[pos] == '[':
+        result = []
+        pos += 1
+        while True:
+            while text[pos] in ' ,':
+                pos += 1
+            if text[pos] == ']':
+                return result, pos + 1
+            value, pos = _parse_flow(text, pos)
+            result.append(value)
+
+    if text[pos] in '\'"':
+        quote = text[pos]
+        end = pos + 1
+        while True:
+            end = text.index(quote, end)
+            if quote == "'" and text.startswith("''", end):
+                end += 2
+            elif quote == '"' and text[end - 1] == '\\':
+                end += 1
+            else:
+                break
+        return _parse_scalar(text[pos:end + 1]), end + 1
+
+    end = pos
+    while end < len(text) and text[end] not in ',}]':
+        end += 1
+    return text[pos:end].strip(), end
+
+
+def parse_reference(value : Any) -> Tuple[int, Union[str, None], Union[int, None]]:
+    """
+    Splits an object reference ({fileID: <id>, guid: <guid>, type: <type>}) into (file_id, guid, type).
+    guid and type are None for references within the same file.
+
+    """
+    if not isinstance(value, dict):
+        return 0, None, None
+
+    guid = value.get('guid', None)
+    reference_type = value.get('type', None)
+    return int(value.get('fileID', 0)), guid, int(reference_type) if reference_type is not None else None
+
+
+def get_prefab_instances(yaml_file : UnityYamlFile) -> Generator[dict, None, None]:
+    """
+    Generator to return the relevant data of all PrefabInstances within a scene or prefab:
+    {
+        'file_id': <File ID of the PrefabInstance document>,
+        'source_prefab': (<File ID>, <GUID>, <Type>),
+        'modifications': [ { 'target': ..., 'propertyPath': ..., 'value': ..., 'objectReference': ... }, ... ]
+    }
+
+    """
+    for document in yaml_file.find_documents(PREFAB_INSTANCE_CLASS_ID):
+        modification = yaml_file.get_field(document, 'm_Modification', None) or {}
+        yield {
+            'file_id': document.file_id,
+            'source_prefab': parse_reference(yaml_file.get_field(document, 'm_SourcePrefab', None)),
+            'modifications': modification.get('m_Modifications', None) or [],
+        }
+
+
+def get_material(yaml_file : UnityYamlFile, file_id : Union[int, None] = None) -> Union[dict, None]:
+    """
+    Returns the relevant data of a material (the first one in the file, unless a file ID is given):
+    {
+        'file_id': <File ID of the Material document>,
+        'name': <Material Name>,
+        'shader': (<File ID>, <GUID>, <Type>),
+        'string_tags': { <Tag>: <Value>, ... },
+        'textures': [ { 'input_name': ..., 'texture': (<File ID>, <GUID>, <Type>), 'scale': { 'x': ..., 'y': ... }, 'offset': { 'x': ..., 'y': ... } }, ... ]
+    }
+    Returns None if there is no such material.
+
+    """
+    if file_id is not None:
+        document = yaml_file._documents_by_file_id.get(file_id, None)
+    else:
+        document = next(yaml_file.find_documents(MATERIAL_CLASS_ID), None)
+    if not document or document.class_id != MATERIAL_CLASS_ID:
+        return None
+
+    textures = []
+    for texture_env in yaml_file.get_field(document, ['m_SavedProperties', 'm_TexEnvs'], None) or []:
+        if not isinstance(texture_env, dict):
+            continue
+        for input_name, properties in texture_env.items(): # Always a dictionary with 1 item
+            properties = properties or {}
+            textures.append({
+                'input_name': input_name,
+                'texture': parse_reference(properties.get('m_Texture', None)),
+                'scale': properties.get('m_Scale', None),
+                'offset': properties.get('m_Offset', None),
+            })
+
+    return {
+        'file_id': document.file_id,
+        'name': yaml_file.get_field(document, 'm_Name', ''),
+        'shader': parse_reference(yaml_file.get_field(document, 'm_Shader', None)),
+        'string_tags': yaml_file.get_field(document, 'stringTagMap', None) or {},
+        'textures': textures,
+    }
@@ -14,90 +14,513 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 # ##### END GPL LICENSE BLOCK #####
+import io
 import os
+import bisect
 import tarfile
 import logging
+import threading
+from array import array
 from tarfile import TarFile, TarInfo
-from typing import Union, List, Generator, Any
-from ..config import log_level
+from typing import Union, List, Generator, Iterable, Tuple, BinaryIO
+from ..config import log_level, gzip_checkpoint_span, gzip_background_checkpoints, index_cache_max_size, extracted_cache_max_bytes, extracted_cache_pin_max_size
 from .tools import timer
+from .gzip_index import GzipCheckpointReader
+from .byte_cache import ByteBudgetCache
+from . import profiling
+from . import index_cache
+from .index_cache import IndexRecord
 
 
 logger = logging.getLogger("UnitypackageParser")
 logger.setLevel(log_level)
 
 
-class AssetEntry():
-    _tarfile : TarFile
-    _data : dict
-    
-    def __init__(self, tarfile : TarFile):
-        self._data = {}
-        self._tarfile = tarfile
+# Size of the chunks assets are read in when streaming them (see UnitypackageParser.open_asset)
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Amount of data decompressed at once while rebuilding checkpoints in the background, other reads wait for at most one step
+_CHECKPOINT_BUILD_STEP = 4 * 1024 * 1024
+
+
+class _TrackedFileReader():
+    """
+    Thin read-only wrapper around the raw file object of an uncompressed .unitypackage file.
+    Keeps track of how many bytes have been read from disk and how often reading started over
+    from the beginning of the file, mirroring the counters of GzipCheckpointReader.
+
+    """
+    name : str
+    mode : str
+    decompression_passes : int
+    compressed_bytes_read : int
+
+    def __init__(self, filepath : str):
+        self._fileobj = open(filepath, 'rb')
+        self.name = filepath
+        self.mode = 'rb'
+        self.decompression_passes = 0
+        self.compressed_bytes_read = 0
+
+    def read(self, size : int = -1) -> bytes:
+        if self._fileobj.tell() == 0:
+            # Reading from the start of the file (again), this is a new pass over the stream
+            self.decompression_passes += 1
+        
+        data = self._fileobj.read(size)
+        self.compressed_bytes_read += len(data)
+        return data
+
+    def seek(self, offset : int, whence : int = os.SEEK_SET) -> int:
+        return self._fileobj.seek(offset, whence)
 
-    def set_value(self, key : str, value : Union[TarInfo, bytes, str]):
+    def tell(self) -> int:
+        return self._fileobj.tell()
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'decompression_passes': self.decompression_passes,
+            'compressed_bytes_read': self.compressed_bytes_read,
+        }
+
+    def forget_passes(self):
         """
-        Sets attribute for the given key.
-        Raises Exception if value is already set.
-        Raises ValueError if value is empty or of unsupported type.
+        Resets the pass counter, for reads that only probed the start of the file (like opening it with tarfile does).
+        GzipCheckpointReader doesn't count those, since they're served from the data it decompressed first anyway.
 
         """
-        if key in self._data.keys(): 
-            raise Exception(f"Attribute '{key}' already set!")
-        if not value or type(value) not in [TarInfo, bytes, str]: 
-            raise ValueError()
+        self.decompression_passes = 0
 
-        self._data[key] = value
+    def close(self):
+        self._fileobj.close()
 
-    def get_value(self, key : str) -> Union[bytes, str]:
+
+def _parse_tar_number(field : bytes) -> int:
+    """
+    Parses a numeric field of a tar header (octal, or base-256 for large values).
+
+    """
+    if field[0] & 0x80:
+        # GNU base-256 encoding
+        value = int.from_bytes(field[1:], 'big')
+        return value - (1 << (8 * len(field) - 8)) if field[0] & 0x40 else value
+    
+    field = field.split(b'\x00', 1)[0].strip()
+    return int(field, 8) if field else 0
+
+
+def _parse_pax_headers(data : bytes) -> dict[str, str]:
+    """
+    Parses the records of a pax extended header ('<length> <key>=<value>\n').
+
+    """
+    headers = {}
+    offset = 0
+    while offset < len(data):
+        length_end = data.index(b' ', offset)
+        length = int(data[offset:length_end])
+        if length <= 0:
+            break
+        key, _, value = data[length_end + 1:offset + length - 1].partition(b'=')
+        headers[key.decode('utf-8')] = value.decode('utf-8', 'surrogateescape')
+        offset += length
+    
+    return headers
+
+
+def _iter_tar_members(fileobj) -> Generator[Tuple[str, int, int], None, None]:
+    """
+    Generator that reads through a tar stream and yields (name, offset_data, size) for every regular file.
+    This only parses the parts of the headers we need (name and size, including GNU long names and pax overrides)
+    and doesn't create TarInfo objects, which makes it a lot faster than iterating over a TarFile.
+    Directory names are yielded with a size of -1.
+
+    """
+    offset = 0
+    long_name = None
+    pax_headers = {}
+    while True:
+        fileobj.seek(offset)
+        header = fileobj.read(tarfile.BLOCKSIZE)
+        if len(header) < tarfile.BLOCKSIZE or header == tarfile.NUL * tarfile.BLOCKSIZE:
+            # End of archive
+            return
+        
+        # Unsigned checksum with the checksum field itself counting as spaces, see tarfile.calc_chksums
+        if _parse_tar_number(header[148:156]) != 256 + sum(header[:148]) + sum(header[156:]):
+            raise Exception(f"Invalid tar header checksum at offset {offset}! (Is the file corrupted?)")
+
+        size = _parse_tar_number(header[124:136])
+        typeflag = header[156:157]
+        offset_data = offset + tarfile.BLOCKSIZE
+        
+        if typeflag in (tarfile.GNUTYPE_LONGNAME, tarfile.XHDTYPE, tarfile.XGLTYPE, tarfile.SOLARIS_XHDTYPE):
+            # Extended header, applies to the next member
+            data = fileobj.read(size)
+            if typeflag == tarfile.GNUTYPE_LONGNAME:
+                long_name = data.split(b'\x00', 1)[0].decode('utf-8', 'surrogateescape')
+            elif typeflag != tarfile.XGLTYPE:
+                pax_headers = _parse_pax_headers(data)
+            offset = offset_data + -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            continue
+
+        name = header[0:100].split(b'\x00', 1)[0]
+        if header[257:262] == b'ustar' and header[345] != 0:
+            name = header[345:500].split(b'\x00', 1)[0] + b'/' + name
+        name = long_name or pax_headers.get('path') or name.decode('utf-8', 'surrogateescape')
+        if 'size' in pax_headers:
+            size = int(pax_headers['size'])
+        long_name = None
+        pax_headers = {}
+
+        offset = offset_data + -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        if typeflag in tarfile.REGULAR_TYPES:
+            yield name, offset_data, size
+        elif typeflag == tarfile.DIRTYPE:
+            yield name.rstrip('/'), offset_data, -1
+
+
+class _MemberReader(io.RawIOBase):
+    """
+    Seekable read-only file object over the data of a single archive member.
+    Every read seeks the parser's shared archive file object under its read lock, so any number of readers
+    (and the background extraction threads) can be used at the same time. Meant to be wrapped in an io.BufferedReader.
+
+    """
+    _parser : 'UnitypackageParser'
+    _offset : int
+    _size : int
+    _pos : int
+
+    def __init__(self, parser : 'UnitypackageParser', offset : int, size : int):
+        super().__init__()
+        self._parser = parser
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._size - self._pos)
+        if size <= 0:
+            return 0
+
+        profiling.count('parser.bytes_streamed', size)
+        with self._parser._read_lock:
+            self._parser._file.seek(self._offset + self._pos)
+            data = self._parser._file.read(size)
+        if len(data) != size:
+            raise Exception(f"Unexpected end of archive while reading member at offset {self._offset}!")
+
+        buffer[:size] = data
+        self._pos += size
+        return size
+
+    def seek(self, offset : int, whence : int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})!")
+
+        if pos < 0:
+            raise ValueError("Negative seek position!")
+
+        self._pos = pos
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def _make_tarinfo(name : str, offset_data : int, size : int) -> TarInfo:
+    """
+    Creates a TarInfo for a regular file member at a known position in the archive, for use with TarFile.extractfile.
+
+    """
+    tarinfo = TarInfo(name)
+    tarinfo.type = tarfile.REGTYPE
+    tarinfo.size = size
+    tarinfo.offset = offset_data - tarfile.BLOCKSIZE
+    tarinfo.offset_data = offset_data
+    return tarinfo
+
+
+class AssetIndex():
+    """
+    Compact, column-oriented storage for the asset entries of a .unitypackage file.
+    Every asset entry is a row, its values are stored in parallel arrays instead of individual objects.
+    GUIDs are stored as 16 raw bytes each, directory names and extensions are deduplicated into tables
+    and referenced by id, so comparing extensions of all entries is just comparing integers.
+    Member offsets point to the start of the member's data in the uncompressed tar stream, -1 if there is no member.
+
+    Once all rows are added, build_lookup_indexes creates case-insensitive secondary indexes by extension,
+    by directory and by path, so queries only cost as much as the number of results they return.
+
+    """
+    guids : bytearray
+    pathnames : List[str]
+    basename_offsets : array
+    dirname_ids : array
+    dirnames : List[str]
+    extension_ids : array
+    extensions : List[str]
+    asset_offsets : array
+    asset_sizes : array
+    meta_offsets : array
+    meta_sizes : array
+    preview_offsets : array
+    preview_sizes : array
+
+    def __init__(self):
+        self.guids = bytearray()
+        self.pathnames = []
+        self.basename_offsets = array('I')
+        self.dirname_ids = array('I')
+        self.dirnames = []
+        self.extension_ids = array('I')
+        self.extensions = []
+        self.asset_offsets = array('q')
+        self.asset_sizes = array('q')
+        self.meta_offsets = array('q')
+        self.meta_sizes = array('q')
+        self.preview_offsets = array('q')
+        self.preview_sizes = array('q')
+        
+        self._rows_by_guid : dict[bytes, int] = {}
+        self._dirname_ids : dict[str, int] = {}
+        self._extension_ids : dict[str, int] = {}
+
+        # Secondary indexes, see build_lookup_indexes
+        self._rows_by_extension : dict[str, array] = {}
+        self._rows_by_dirname : dict[str, array] = {}
+        self._rows_by_pathname : array = array('I')
+
+    def __len__(self) -> int:
+        return len(self.pathnames)
+
+    def append(
+            self, guid : str, pathname : str, asset_offset : int, asset_size : int, meta_offset : int = -1, meta_size : int = 0,
+            preview_offset : int = -1, preview_size : int = 0
+        ) -> int:
         """
-        Retrieves value for the given key.
-        If the value isn't yet extracted, it will be replaced by the result of tf.extract(item).
+        Adds a row to the index and returns its row number.
+        Raises ValueError if the GUID isn't 32 hexadecimal digits or already exists.
+
+        """
+        guid_bytes = bytes.fromhex(guid)
+        if len(guid_bytes) != 16:
+            raise ValueError(f"Unexpected GUID format '{guid}'!")
+        if guid_bytes in self._rows_by_guid:
+            raise ValueError(f"Duplicate GUID '{guid}'!")
+
+        dirname = os.path.dirname(pathname)
+        dirname_id = self._dirname_ids.get(dirname)
+        if dirname_id is None:
+            dirname_id = self._dirname_ids[dirname] = len(self.dirnames)
+            self.dirnames.append(dirname)
+
+        extension = os.path.splitext(pathname)[1]
+        extension_id = self._extension_ids.get(extension)
+        if extension_id is None:
+            extension_id = self._extension_ids[extension] = len(self.extensions)
+            self.extensions.append(extension)
+
+        row = len(self.pathnames)
+        self._rows_by_guid[guid_bytes] = row
+        self.guids += guid_bytes
+        self.pathnames.append(pathname)
+        self.basename_offsets.append(len(pathname) - len(os.path.basename(pathname)))
+        self.dirname_ids.append(dirname_id)
+        self.extension_ids.append(extension_id)
+        self.asset_offsets.append(asset_offset)
+        self.asset_sizes.append(asset_size)
+        self.meta_offsets.append(meta_offset)
+        self.meta_sizes.append(meta_size)
+        self.preview_offsets.append(preview_offset)
+        self.preview_sizes.append(preview_size)
+
+        return row
+
+    def build_lookup_indexes(self):
+        """
+        Builds the secondary indexes used by the find_rows_* functions. Needs to be called again after adding rows.
+        Extensions, directories and paths are matched case-insensitively, like Unity does.
 
-        Note that extraction only happens once! After calling this function the value will either be
-        of type bytes or str.
+        """
+        self._rows_by_extension = {}
+        for row, extension_id in enumerate(self.extension_ids):
+            self._rows_by_extension.setdefault(self.extensions[extension_id].lower(), array('I')).append(row)
         
+        self._rows_by_dirname = {}
+        for row, dirname_id in enumerate(self.dirname_ids):
+            self._rows_by_dirname.setdefault(self.dirnames[dirname_id].lower(), array('I')).append(row)
+
+        # Rows sorted by path, so all paths starting with a prefix are a contiguous range that can be found by bisecting
+        self._rows_by_pathname = array('I', sorted(range(len(self)), key=self._get_pathname_key))
+
+    def _get_pathname_key(self, row : int) -> str:
+        return self.pathnames[row].lower()
+
+    def find_rows_by_extension(self, extension : str) -> array:
         """
-        # Some quality of life pseudo-attributes
-        if key == 'basename': 
-            return os.path.basename(self.get_str_value('pathname'))
-        if key == 'dirname':
-            return os.path.dirname(self.get_str_value('pathname'))
-        if key == 'extension': 
-            return os.path.splitext(self.get_str_value('pathname'))[1]
+        Returns the rows of all entries with the given extension (including the dot), in archive order.
 
-        if not key in self._data.keys(): 
-            raise KeyError(key)
+        """
+        return self._rows_by_extension.get(extension.lower(), array('I'))
+
+    def find_rows_by_dirname(self, dirname : str) -> array:
+        """
+        Returns the rows of all entries directly within the given directory, in archive order.
+
+        """
+        return self._rows_by_dirname.get(dirname.rstrip('/').lower(), array('I'))
+
+    def find_rows_by_prefix(self, prefix : str) -> Generator[int, None, None]:
+        """
+        Generator to return the rows of all entries with a path starting with prefix, in alphabetical order of their paths.
+        Use a trailing slash to match everything below a directory.
+
+        """
+        prefix = prefix.lower()
+        rows = self._rows_by_pathname
+        for index in range(bisect.bisect_left(rows, prefix, key=self._get_pathname_key), len(rows)):
+            row = rows[index]
+            if not self.pathnames[row].lower().startswith(prefix):
+                break
+            yield row
+
+    def find_row(self, guid : str) -> int:
+        """
+        Returns the row number for a GUID.
+        Raises KeyError if not found.
+
+        """
+        try:
+            return self._rows_by_guid[bytes.fromhex(guid)]
+        except ValueError:
+            raise KeyError(guid)
+
+    def get_guid(self, row : int) -> str:
+        return self.guids[row * 16:(row + 1) * 16].hex()
+
+    def get_extension_ids(self, extensions : Iterable[str]) -> set[int]:
+        """
+        Returns the ids of all given extensions that exist in the index.
+
+        """
+        return { self._extension_ids[extension] for extension in extensions if extension in self._extension_ids }
+
+
+class AssetEntry():
+    """
+    Lightweight view of a single asset entry (a row in the index of a UnitypackageParser).
+    Values are looked up in the index on access, asset data is extracted from the archive on-demand.
+
+    """
+    __slots__ = ('_parser', '_row')
+
+    _parser : 'UnitypackageParser'
+    _row : int
+
+    def __init__(self, parser : 'UnitypackageParser', row : int):
+        self._parser = parser
+        self._row = row
+
+    @property
+    def guid(self) -> str:
+        return self._parser._index.get_guid(self._row)
+    
+    @property
+    def pathname(self) -> str:
+        return self._parser._index.pathnames[self._row]
+    
+    @property
+    def basename(self) -> str:
+        index = self._parser._index
+        return index.pathnames[self._row][index.basename_offsets[self._row]:]
+    
+    @property
+    def dirname(self) -> str:
+        index = self._parser._index
+        return index.dirnames[index.dirname_ids[self._row]]
+    
+    @property
+    def extension(self) -> str:
+        index = self._parser._index
+        return index.extensions[index.extension_ids[self._row]]
+
+    @property
+    def asset(self) -> bytes:
+        return self.get_value('asset')
+
+    @property
+    def asset_meta(self) -> bytes:
+        return self.get_value('asset_meta')
+
+    def get_member(self, key : str) -> Union[TarInfo, None]:
+        """
+        Returns the tar archive member for the given key, or None if the value doesn't come from the archive.
+
+        """
+        index = self._parser._index
+        if key == 'asset':
+            return _make_tarinfo(f"{self.guid}/asset", index.asset_offsets[self._row], index.asset_sizes[self._row])
+        if key == 'asset_meta' and index.meta_offsets[self._row] >= 0:
+            return _make_tarinfo(f"{self.guid}/asset.meta", index.meta_offsets[self._row], index.meta_sizes[self._row])
+        if key == 'preview' and index.preview_offsets[self._row] >= 0:
+            return _make_tarinfo(f"{self.guid}/preview.png", index.preview_offsets[self._row], index.preview_sizes[self._row])
         
-        value = self._data[key]
-        if type(value) == TarInfo:
-            # Not yet extracted, extract first
-            value = self._tarfile.extractfile(value).read()
-            self._data[key] = value # Update value in dict
+        return None
+
+    def get_value(self, key : str) -> Union[bytes, str]:
+        """
+        Retrieves value for the given key.
+        'asset', 'asset_meta' and 'preview' (the preview.png thumbnail) are extracted from the archive on first access and kept in the parser's cache afterwards
+        (see UnitypackageParser for how long).
+        Raises KeyError if the entry has no value for the key.
         
-        return value
+        """
+        if key in ('guid', 'pathname', 'basename', 'dirname', 'extension'):
+            return getattr(self, key)
 
-    def __getattr__(self, key : str) -> Any:
+        return self._parser._get_member_data(self, key, keep=True)
+
+    def open_value(self, key : str = 'asset') -> BinaryIO:
         """
-        Will be invoked if attempting to access attribute that doesn't exist in module.
-        If that happens, call get_value to allow accessing internal values as attributes.
+        Opens the value for the given key as a seekable binary file object, see UnitypackageParser.open_asset.
 
         """
-        return self.get_value(key)
+        return self._parser.open_asset(self.guid, key)
+
+    def read_value(self, key : str) -> bytes:
+        """
+        Retrieves the raw value for the given key like get_value, but without adding extracted data to the parser's cache.
+        Use this when processing large amounts of assets only once.
+
+        """
+        if key in ('guid', 'pathname', 'basename', 'dirname', 'extension'):
+            return getattr(self, key).encode('utf-8')
+
+        return self._parser._get_member_data(self, key, keep=False)
     
     def get_str_value(self, key : str) -> str:
         """
         Retrieves the attribute value for the given key as a string.
-        If the value is of type bytes, will return decoded string using text_encoding.
-        Raises ValueError if value is neither of type bytes or str.
+        If the value is of type bytes, will return decoded string using utf-8.
 
         See get_value for information about tar-file-extraction.
 
         """
         value = self.get_value(key)
-        if type(value) not in [bytes, str]: 
-            raise ValueError
-        
         if type(value) == bytes:
             # Return string-decoded value
             return value.decode('utf-8')
@@ -111,30 +534,84 @@ class AssetEntry():
 
         """
         if type(match_key) == str:
-            return match_key in self._data.keys()
+            if match_key == 'asset_meta':
+                return self._parser._index.meta_offsets[self._row] >= 0
+            if match_key == 'preview':
+                return self._parser._index.preview_offsets[self._row] >= 0
+            return True
         
         elif type(match_key) == list:
-            return all([key in self._data for key in match_key ])
+            return all([ self.has_keys(key) for key in match_key ])
         
         raise TypeError()
 
+    def __eq__(self, other) -> bool:
+        return isinstance(other, AssetEntry) and self._parser is other._parser and self._row == other._row
+
+    def __hash__(self) -> int:
+        return hash((id(self._parser), self._row))
+
     def __str__(self):
-        if 'guid' in self._data.keys():
-            return f"<AssetEntry instance (GUID: {self.get_value('guid')})>"
-        
-        return f"<AssetEntry instance>"
+        return f"<AssetEntry instance (GUID: {self.guid})>"
+
+
+def _make_index_record(asset_entry : AssetEntry) -> IndexRecord:
+    index = asset_entry._parser._index
+    row = asset_entry._row
+    return IndexRecord(
+        asset_entry.guid, asset_entry.pathname,
+        index.asset_offsets[row], index.asset_sizes[row],
+        index.meta_offsets[row], index.meta_sizes[row],
+        index.preview_offsets[row], index.preview_sizes[row]
+    )
 
 
 class UnitypackageParser():
     _filepath : str
+    _read_asset_meta : bool
+    _file : Union[GzipCheckpointReader, _TrackedFileReader]
     _tarfile : Union[TarFile, None]
-    _asset_entries : Union[dict[str, AssetEntry], None]
+    _index : Union[AssetIndex, None]
+    _extracted : ByteBudgetCache
 
-    def __init__(self, filepath : str):
+    def __init__(self, filepath : str, read_asset_meta : bool = False, use_index_cache : bool = True, cache_max_bytes : int = extracted_cache_max_bytes):
+        """
+        Opens and indexes the .unitypackage file at the given path.
+        If read_asset_meta is set, the (small) 'asset.meta' members are extracted during indexing as well,
+        otherwise they're extracted on-demand like the assets themselves.
+        If use_index_cache is set, the index is loaded from (and stored in) the on-disk index cache,
+        which skips reading through the archive entirely when the same file is opened again.
+
+        Extracted data is kept in a cache of up to cache_max_bytes, least recently used values are evicted
+        and extracted again on demand. Small members (see extracted_cache_pin_max_size) stay cached regardless,
+        up to extracted_cache_pin_max_bytes in total.
+
+        """
         self._filepath = filepath
+        self._read_asset_meta = read_asset_meta
+        self._extracted = ByteBudgetCache(cache_max_bytes, extracted_cache_pin_max_size)
+        self._read_lock = threading.Lock() # Extraction may happen on background threads, but the archive can only be read by one at a time
+        self._checkpoint_thread = None
+        self._is_closing = False
 
         self._init_tarfile() # 1. load the tarfile
-        self._init_asset_entries() # 2. Index the tarfile
+        if use_index_cache:
+            file_key = index_cache.get_file_key(self._filepath)
+            if records := index_cache.load_index(file_key):
+                self._init_asset_entries_from_records(records) # 2. Restore index from cache
+                if gzip_background_checkpoints and isinstance(self._file, GzipCheckpointReader):
+                    # The archive wasn't read, so there are no checkpoints for random access yet (see _build_checkpoints)
+                    self._checkpoint_thread = threading.Thread(target=self._build_checkpoints, name='UnitypackageCheckpoints', daemon=True)
+                    self._checkpoint_thread.start()
+            else:
+                self._init_asset_entries() # 2. Index the tarfile
+                index_cache.save_index(file_key, self._get_index_records(), index_cache_max_size)
+        else:
+            self._init_asset_entries() # 2. Index the tarfile
+
+    @property
+    def filepath(self) -> str:
+        return self._filepath
 
     def __enter__(self):
         return self
@@ -146,7 +623,29 @@ class UnitypackageParser():
         if not hasattr(self, '_tarfile'): return
         if not self._tarfile: return
 
+        self._is_closing = True
+        if self._checkpoint_thread:
+            self._checkpoint_thread.join()
+            self._checkpoint_thread = None
+
+        # The tarfile doesn't own the file object it was opened with, close it as well
         self._tarfile.close()
+        self._file.close()
+        self._extracted.clear()
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Returns I/O and cache counters for the underlying archive since it was opened.
+        'decompression_passes' is the number of times the file was read from its start. Indexing takes
+        exactly one pass, every additional pass means (part of) the archive was decompressed again.
+        For compressed archives, 'checkpoint_restores' counts how often decompression resumed from a checkpoint instead.
+        Counters of the extracted data cache are prefixed with 'cache_' ('cache_hits', 'cache_misses', 'cache_evictions', ...).
+
+        """
+        stats = self._file.get_stats()
+        for name, value in self._extracted.get_stats().items():
+            stats[f'cache_{name}'] = value
+        return stats
 
     @timer(logger)
     def _init_tarfile(self):
@@ -160,14 +659,29 @@ class UnitypackageParser():
             raise Exception(f"File '{self._filepath}' is not a tar archive! (Did you select a valid .unitypackage file?")
         
         logger.info(f"Opening file '{self._filepath}'...")
-        self._tarfile = tarfile.open(self._filepath)
+        with open(self._filepath, 'rb') as f:
+            is_gzip_file = f.read(2) == b'\x1f\x8b'
+        
+        if is_gzip_file:
+            # Gzip-compressed tar archive (the usual case), read through checkpoint index for fast random access
+            self._file = GzipCheckpointReader(self._filepath, gzip_checkpoint_span)
+        else:
+            self._file = _TrackedFileReader(self._filepath)
+
+        self._tarfile = tarfile.open(fileobj=self._file, mode='r:')
+        if isinstance(self._file, _TrackedFileReader):
+            # Opening the tarfile read the first header from the start of the file, indexing starts over from there
+            self._file.forget_passes()
 
     @timer(logger)
     def _init_asset_entries(self):
         """
-        Takes a .unitypackage tarfile and returns a dictionary of all assets,
-        using the extracted pathname (utf-8 string) as the key and the tarinfo of the asset as the value.
-        Only entries that contain a 'pathname' and an 'asset' attribute are included in the output dictionary.
+        Reads through the .unitypackage tar stream and builds the asset index from it.
+        Only entries that contain a 'pathname' and an 'asset' member are included in the index.
+
+        Pathnames (and asset.meta files if requested) are extracted right away while the archive is read front to back.
+        They're tiny, and extracting them later would mean seeking backwards in the compressed stream, which restarts
+        decompression from the start of the archive every single time.
         
         Note:
         I can't really add a progress indicator to this. The only way to know how many entries are in the tar
@@ -175,73 +689,264 @@ class UnitypackageParser():
         making a progress indicator afterwards meaningless.
 
         """
-        if hasattr(self, '_asset_entries'):
+        if hasattr(self, '_index'):
             raise Exception("Asset entries already initialized!")
         if not hasattr(self, '_tarfile'):
             raise Exception("No tarfile! (Was _init_tarfile already called?)")
 
-        self._asset_entries = {}
         logger.info("Indexing asset entries...")
 
-        for tarinfo in self._tarfile:
-            name_segments = tarinfo.name.split('/')
+        # Collect members per GUID first, the order of members within the archive isn't fixed
+        # { guid: [pathname, asset_offset, asset_size, meta_offset, meta_size, meta_data, preview_offset, preview_size] }
+        members = {}
+        header_count = 0
+        for name, offset_data, size in _iter_tar_members(self._file):
+            header_count += 1
+            name_segments = name.split('/')
             name_segments_len = len(name_segments)
             if name_segments_len == 2:
-                asset_entry : AssetEntry = self._asset_entries.setdefault(name_segments[0], AssetEntry(self._tarfile))
+                member = members.setdefault(name_segments[0], [None, -1, 0, -1, 0, None, -1, 0])
                 if name_segments[1] == 'pathname':
                     # UTF-8 encoded text-file contining relative path of file in Unity's virtual file explorer
-                    asset_entry.set_value('pathname', tarinfo) # Don't extract yet for performance, we will do that on-demand when (and if) we need to
-                    asset_entry.set_value('guid', name_segments[0]) # Store GUID in dict too (We need to do it somewhere but only once, pathname exists for all items)
+                    # Always extract inline, needed for every entry. Only the first line is the path, some versions of Unity add more lines after.
+                    self._file.seek(offset_data)
+                    member[0] = self._file.read(size).decode('utf-8').split('\n', 1)[0]
                 
                 elif name_segments[1] == 'asset':
                     # Asset or Unity Document, encoding varies on asset type 
-                    asset_entry.set_value('asset', tarinfo) # Don't extract yet for performance, we will do that on-demand when (and if) we need to
+                    member[1:3] = offset_data, size # Don't extract yet for performance, we will do that on-demand when (and if) we need to
                 
                 elif name_segments[1] == 'asset.meta':
                     # UTF-8 encoded text-file containing metadata for asset
-                    asset_entry.set_value('asset_meta', tarinfo) # Don't extract yet for performance, we will do that on-demand when (and if) we need to
+                    member[3:5] = offset_data, size # Don't extract yet for performance, we will do that on-demand when (and if) we need to
+                    if self._read_asset_meta:
+                        # Unless requested, then extract now while we're here
+                        self._file.seek(offset_data)
+                        member[5] = self._file.read(size)
                 
                 elif name_segments[1] == 'preview.png':
-                    # Preview image for Unity's virtual file explorer, we don't need this
-                    # d['preview_image'] = tarfile
-                    pass
+                    # Thumbnail for Unity's virtual file explorer, loaded on-demand for the import list
+                    member[6:8] = offset_data, size
                 
                 else:
                     # Something else that wasn't in my example files
-                    logger.warn(f"Unknown key in asset entry: '{name_segments[1]}'!")
+                    logger.warning(f"Unknown key in asset entry: '{name_segments[1]}'!")
             
             elif name_segments_len > 2:
                 # As far as I can tell .unitypackage tar-files will never exceed a depth of 2
-                raise Exception(f"Path in tarinfo too deep! Expected up to 2 segments, got {len(name_segments)}! ('{tarinfo.name}')")
+                raise Exception(f"Path in tarinfo too deep! Expected up to 2 segments, got {len(name_segments)}! ('{name}')")
+
+        profiling.count('tar.headers', header_count)
+
+        # Build index, filter out all entries that don't contain 'pathname' and 'asset' items
+        self._index = AssetIndex()
+        for guid, (pathname, asset_offset, asset_size, meta_offset, meta_size, meta_data, preview_offset, preview_size) in members.items():
+            if not pathname or asset_offset < 0:
+                continue
+            try:
+                row = self._index.append(guid, pathname, asset_offset, asset_size, meta_offset, meta_size, preview_offset, preview_size)
+            except ValueError as e:
+                logger.warning(f"Skipping asset entry '{pathname}': {e}")
+                continue
+            if meta_data is not None:
+                self._extracted.put((row, 'asset_meta'), meta_data)
+        self._index.build_lookup_indexes()
+        
+        logger.info(f"Done Indexing. {len(self._index)} relevant asset entries were found. ({self._file.decompression_passes} decompression pass(es))")
+
+    @timer(logger)
+    def _init_asset_entries_from_records(self, records : List[IndexRecord]):
+        """
+        Restores the asset index from records of the index cache, without reading through the archive.
+        Since the archive isn't read, asset.meta files will be extracted on-demand regardless of read_asset_meta.
+
+        """
+        if hasattr(self, '_index'):
+            raise Exception("Asset entries already initialized!")
+
+        self._index = AssetIndex()
+        for record in records:
+            self._index.append(*record)
+        self._index.build_lookup_indexes()
 
-        # Filter out all entries that don't contain 'pathname' and 'asset' items
-        self._asset_entries = { guid: entry for guid, entry in self._asset_entries.items() if entry.has_keys(['pathname', 'asset']) }
+        logger.info(f"Loaded index from cache. {len(self._index)} relevant asset entries were found.")
+
+    def _build_checkpoints(self):
+        """
+        Runs on a background thread after the index was loaded from the cache: Decompresses the whole archive once,
+        a step at a time, recording the checkpoints indexing would have recorded. Until then, extracting an asset
+        decompresses everything before it. Checkpoints hold zlib's internal state, which can't be stored in the index cache.
+        Uses a decompressor (and file handle) of its own, so it never moves the stream readers are in the middle of.
+        Only handing over the checkpoints after every step needs the read lock. Its work isn't included in get_stats.
+
+        """
+        with profiling.span('parser.build_checkpoints', 'parser'), GzipCheckpointReader(self._filepath, self._file.checkpoint_span) as builder:
+            handed_over = 0
+            while not self._is_closing:
+                has_more = builder.build_checkpoints(_CHECKPOINT_BUILD_STEP)
+                checkpoints = builder.get_checkpoints()[handed_over:]
+                handed_over += len(checkpoints)
+                with self._read_lock:
+                    self._file.add_checkpoints(checkpoints)
+                if not has_more:
+                    break
+
+    def wait_for_checkpoints(self, timeout : Union[float, None] = None):
+        """
+        Blocks until checkpoints for random access exist for the whole archive (see _build_checkpoints).
+
+        """
+        if self._checkpoint_thread:
+            self._checkpoint_thread.join(timeout)
+
+    def _get_index_records(self) -> List[IndexRecord]:
+        """
+        Returns the current index as records for the index cache.
+
+        """
+        return [ _make_index_record(asset_entry) for asset_entry in self.get_asset_entries() ]
+
+    def _get_member_data(self, asset_entry : AssetEntry, key : str, keep : bool) -> bytes:
+        """
+        Returns the data of an archive member of an asset entry, extracting it if necessary.
+        If keep is set, extracted data is added to the cache so it doesn't have to be extracted again.
+        Raises KeyError if the asset entry has no such member.
+
+        """
+        if (data := self._extracted.get((asset_entry._row, key))) is not None:
+            return data
+        
+        member = asset_entry.get_member(key)
+        if not member:
+            raise KeyError(key)
         
-        logger.info(f"Done Indexing. {len(self._asset_entries)} relevant asset entries were found.")
+        with profiling.span('parser.extract', 'parser', key=key, size=member.size), self._read_lock:
+            data = self._tarfile.extractfile(member).read()
+        profiling.count('parser.bytes_extracted', len(data))
+        if keep:
+            self._extracted.put((asset_entry._row, key), data)
+        
+        return data
+
+    def get_asset_entries(self) -> Generator[AssetEntry, None, None]:
+        """
+        Generator to return all asset entries of the .unitypackage.
+
+        """
+        for row in range(len(self._index)):
+            yield AssetEntry(self, row)
 
     def get_asset_entries_by_extension(self, match_extension: Union[str, list[str]]) -> Generator[AssetEntry, None, None]:
         """
-        Generator to return all assets from the .unitypackage matching a file extension.
+        Generator to return all assets from the .unitypackage matching a file extension (case-insensitive).
         match_extension can be either a string or a list of string to match against multiple items.
 
         """
         if type(match_extension) == str:
-            for asset_entry in self._asset_entries.values():
-                if asset_entry.extension == match_extension:
-                    yield asset_entry
-        
-        elif type(match_extension) == list:
-            for asset_entry in self._asset_entries.values():
-                if asset_entry.extension in match_extension:
-                    yield asset_entry
+            match_extension = [ match_extension ]
+        elif type(match_extension) != list:
+            raise TypeError()
 
+        for extension in dict.fromkeys(extension.lower() for extension in match_extension):
+            for row in self._index.find_rows_by_extension(extension):
+                yield AssetEntry(self, row)
+
+    def query_asset_entries(self, extensions : Union[str, List[str], None] = None, prefix : Union[str, None] = None, dirname : Union[str, None] = None) -> Generator[AssetEntry, None, None]:
+        """
+        Generator to return all asset entries matching all of the given conditions (case-insensitive):
+        - extensions: File extension or list of file extensions, including the dot
+        - prefix: Start of the path, for example 'Assets/Awtter/' for everything within that directory (recursively)
+        - dirname: Directory the entry is directly contained in (not recursive)
+        Results come from the most selective index, their order depends on which one that is.
+
+        """
+        if type(extensions) == str:
+            extensions = [ extensions ]
+        
+        index = self._index
+        extension_keys = { extension.lower() for extension in extensions } if extensions is not None else None
+        dirname_key = dirname.rstrip('/').lower() if dirname is not None else None
+        prefix_key = prefix.lower() if prefix is not None else None
+
+        # Start with the most selective index available, remaining conditions are checked per row
+        if extension_keys is not None:
+            rows = [ row for extension in extension_keys for row in index.find_rows_by_extension(extension) ]
+            if dirname_key is not None and len(dirname_rows := index.find_rows_by_dirname(dirname_key)) < len(rows):
+                rows = dirname_rows
+        elif dirname_key is not None:
+            rows = index.find_rows_by_dirname(dirname_key)
+        elif prefix_key is not None:
+            rows = index.find_rows_by_prefix(prefix_key)
         else:
-            raise TypeError()
+            rows = range(len(index))
+
+        for row in rows:
+            if extension_keys is not None and index.extensions[index.extension_ids[row]].lower() not in extension_keys:
+                continue
+            if dirname_key is not None and index.dirnames[index.dirname_ids[row]].lower() != dirname_key:
+                continue
+            if prefix_key is not None and not index.pathnames[row].lower().startswith(prefix_key):
+                continue
+            yield AssetEntry(self, row)
+
+    def iter_assets(self, guids : Iterable[str], key : str = 'asset') -> Generator[Tuple[AssetEntry, bytes], None, None]:
+        """
+        Generator to extract the values for the given key of multiple asset entries.
+        Yields tuples of (asset_entry, data), not in the given order but in the order the members are stored in the archive,
+        so everything is extracted in a single forward sweep through the (compressed) archive without seeking back.
+        Entries without the given key are skipped. Extracted data isn't added to the parser's cache.
+        Raises KeyError if a GUID doesn't exist.
+
+        """
+        asset_entries = [ self.get_asset_entry_by_guid(guid) for guid in dict.fromkeys(guids) ] # Deduplicate, keeping order
+        asset_entries = [ asset_entry for asset_entry in asset_entries if asset_entry.has_keys(key) ]
         
+        offsets = { 'asset': self._index.asset_offsets, 'asset_meta': self._index.meta_offsets, 'preview': self._index.preview_offsets }[key]
+        asset_entries.sort(key=lambda asset_entry: offsets[asset_entry._row])
+        for asset_entry in asset_entries:
+            yield asset_entry, asset_entry.read_value(key)
+        
+    def open_asset(self, guid : str, key : str = 'asset') -> BinaryIO:
+        """
+        Opens the value for the given key of an asset entry as a seekable binary file object, extracting it in chunks while it's read.
+        Unlike get_value, this never holds more than a single buffer of the member in memory, so it's the way to go for large assets.
+        Data that's cached already is returned from memory instead. Should be used as a context manager.
+        Raises KeyError if the GUID or the key doesn't exist.
+
+        """
+        asset_entry = self.get_asset_entry_by_guid(guid)
+        if (data := self._extracted.get((asset_entry._row, key))) is not None:
+            return io.BytesIO(data)
+
+        member = asset_entry.get_member(key)
+        if not member:
+            raise KeyError(key)
+
+        return io.BufferedReader(_MemberReader(self, member.offset_data, member.size), buffer_size=_STREAM_CHUNK_SIZE)
+
+    def copy_asset_to(self, guid : str, destination : Union[str, BinaryIO], key : str = 'asset') -> int:
+        """
+        Writes the value for the given key of an asset entry to a file path or a writable binary file object,
+        streaming it in chunks so memory usage stays the same no matter how large the asset is.
+        Returns the number of bytes written. Raises KeyError if the GUID or the key doesn't exist.
+
+        """
+        if isinstance(destination, str):
+            with open(destination, 'wb') as f:
+                return self.copy_asset_to(guid, f, key)
+
+        written = 0
+        with self.open_asset(guid, key) as source:
+            while chunk := source.read(_STREAM_CHUNK_SIZE):
+                destination.write(chunk)
+                written += len(chunk)
+
+        return written
+
     def get_asset_entry_by_guid(self, guid : str) -> AssetEntry:
         """
         Retrieves an asset entry by its GUID.
         Raises keyerror if not found.
 
         """
-        return self._asset_entries[guid]
\ No newline at end of file
+        return AssetEntry(self, self._index.find_row(guid))
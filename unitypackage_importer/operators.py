@@ -14,53 +14,112 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 # ##### END GPL LICENSE BLOCK #####
+import os
 import bpy
+import time
+import bisect
 import logging
+from array import array
+from contextlib import contextmanager
+from typing import Union
 from bpy.types import Operator, Panel
 from bpy_extras.io_utils import ImportHelper
 from bpy.props import BoolProperty, IntProperty, StringProperty, EnumProperty
-from .config import log_level
+from .config import log_level, catalog_refresh_workers
 from .modules.unitypackage_parser import UnitypackageParser
-from .importing import prepare_direct_import, do_direct_import, prepare_resolved_import, do_resolved_import
+from .modules.dependency_graph import DependencyGraph, build_dependency_graph
+from .modules.search_index import TrigramIndex
+from .modules.catalog import Catalog, CatalogRefreshJob
+from .thumbnails import ThumbnailCache
+from .modules import profiling
+from .importing import prepare_direct_import, DirectImportJob, prepare_resolved_import, do_resolved_import
 
 
 logger = logging.getLogger("Import Unitypackage")
 logger.setLevel(log_level)
 
 
-def update_import_list(self, context):
+# Maximum time (in seconds) spent importing per timer event, so Blender stays responsive during the import.
+import_time_slice = 0.05
+
+# Import job handed over from UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal to UNITYPACKAGE_IMPORTER_OT_run_import.
+# Operator properties can't hold python objects, so it's passed through here.
+_pending_import_job : Union[DirectImportJob, None] = None
+
+# While greater than 0, update_import_list callbacks of individual items are skipped (see batch_import_list_update)
+_suspend_updates = 0
+
+# Search index over the names of all import items, built on the first search (see UNITYPACKAGE_IMPORTER_UL_import_list)
+_search_index : Union[TrigramIndex, None] = None
+_search_paths : list[str] = []
+_search_subtree_ends : list[int] = []
+
+# Filter flags of the UI list per filter string, valid until the display list changes
+_filter_cache : dict[str, list[int]] = {}
+
+# Thumbnails of the package shown in the import dialog, loaded as the UI list draws them
+_thumbnails : Union[ThumbnailCache, None] = None
+
+# Parser of the package shown in the import dialog, for operators within the dialog that need more than the import list
+_dialog_parser : Union[UnitypackageParser, None] = None
+
+# Reference graph of that package, built the first time dependencies are selected (see UNITYPACKAGE_IMPORTER_OT_select_dependencies)
+_dependency_graph : Union[DependencyGraph, None] = None
+
+
+def _close_thumbnails():
+    global _thumbnails
+
+    if _thumbnails:
+        _thumbnails.close()
+        _thumbnails = None
+
+
+def _release_dialog_parser():
+    global _dialog_parser, _dependency_graph
+
+    _dialog_parser = None
+    _dependency_graph = None
+
+
+def init_import_list_hierarchy(context):
     """
-    Updates visibility and enabled states for all items.
-    Also creates display items for all visible items.
+    Computes index, parent_index and subtree_end of all import items from their indentation.
+    Needs to be called once after the import list was populated, before visibility is updated.
     
     """
-    # Get global lists
-    import_list = context.window_manager.unitypackage_importer_import_list
-    import_display_list = context.window_manager.unitypackage_importer_import_display_list
+    global _search_index
 
-    # Clear display list
-    import_display_list.clear()
+    import_list = context.window_manager.unitypackage_importer_import_list
+    indentations = [ item.indentation for item in import_list ]
+    _search_index = None # Built for the new list on the next search
 
-    # Reference loading indicator
-    # wm = context.window_manager
-    # wm.progress_begin(0, len(files))
-    # wm.progress_update(i)
-    # wm.progress_end()
-    
-    # Iterate over items and update visibility
-    hierachy_stack = []
-    prev_item = None
+    ancestors = [] # Indices of all ancestors of the current item
     for index, item in enumerate(import_list):
-        if prev_item:
-            if item.indentation > prev_item.indentation:
-                # Entered hierachy level
-                hierachy_stack.append(prev_item)
-            elif item.indentation < prev_item.indentation:
-                # Left hierachy level(s)
-                hierachy_stack = hierachy_stack[:(item.indentation - prev_item.indentation)]
+        # Every ancestor that's not indented less than this item ends its subtree here
+        while ancestors and indentations[ancestors[-1]] >= indentations[index]:
+            import_list[ancestors.pop()].subtree_end = index
         
-        # Determine hierachy parent item if there is one    
-        parent_item = hierachy_stack[-1] if hierachy_stack else None
+        item.index = index
+        item.parent_index = ancestors[-1] if ancestors else -1
+        ancestors.append(index)
+    
+    # Remaining subtrees reach until the end of the list
+    for index in ancestors:
+        import_list[index].subtree_end = len(import_list)
+
+
+def _update_item_states(import_list, start : int, end : int) -> list[int]:
+    """
+    Updates enabled state and visibility of the items in the range [start, end) from their parents.
+    Parents always come before their children, so they're up to date by the time their children are reached.
+    Returns the indices of all visible items in the range.
+
+    """
+    visible_indices = []
+    for index in range(start, end):
+        item = import_list[index]
+        parent_item = import_list[item.parent_index] if item.parent_index >= 0 else None
         
         # Determine own enabled state
         item.is_enabled = not parent_item or parent_item.is_enabled and parent_item.is_selected
@@ -68,12 +127,107 @@ def update_import_list(self, context):
         # Determine own visibility
         item.is_visible = not parent_item or parent_item.is_visible and parent_item.is_expanded
         if item.is_visible:
-            # Item is visible, create display item
+            visible_indices.append(index)
+    
+    return visible_indices
+
+
+def _splice_display_list(import_display_list, start : int, end : int, visible_indices : list[int]):
+    """
+    Replaces the display items referencing import items in the range [start, end) with ones for visible_indices.
+    Display items are ordered by the index they reference, so the affected range can be found with a binary search.
+    Existing display items are reused where possible, so only the difference in length is added or removed.
+    The Python side of this scales with the size of the range. Adding or removing in the middle of the collection
+    still shifts every display item after it (move() and remove() are linear, though done in C by Blender),
+    so that part scales with the difference in length times the number of display items after the range.
+    That's cheaper than rewriting all following display items for the usual small differences. For large ones
+    (expanding a big folder near the top of a long list), the whole display list is rebuilt instead, which is linear.
+
+    """
+    key = lambda display_item: display_item.referenced_item_index
+    display_start = bisect.bisect_left(import_display_list, start, key=key)
+    display_end = bisect.bisect_left(import_display_list, end, key=key)
+    old_count = display_end - display_start
+    new_count = len(visible_indices)
+
+    new_length = len(import_display_list) - old_count + new_count
+    if abs(new_count - old_count) * (len(import_display_list) - display_end) > new_length:
+        references = [ display_item.referenced_item_index for display_item in import_display_list ]
+        references[display_start:display_end] = visible_indices
+        import_display_list.clear()
+        for index in references:
             display_item = import_display_list.add()
             display_item.referenced_item_index = index
-        
-        # Set prev_item for next iteration
-        prev_item = item
+        return
+
+    # Point existing display items at their new import items
+    for offset in range(min(old_count, new_count)):
+        import_display_list[display_start + offset].referenced_item_index = visible_indices[offset]
+
+    if new_count > old_count:
+        # Display items can only be appended, move them into place afterwards
+        for offset in range(old_count, new_count):
+            display_item = import_display_list.add()
+            display_item.referenced_item_index = visible_indices[offset]
+            import_display_list.move(len(import_display_list) - 1, display_start + offset)
+    else:
+        for _ in range(old_count - new_count):
+            import_display_list.remove(display_start + new_count)
+
+
+@contextmanager
+def batch_import_list_update(context):
+    """
+    Context manager for changing many import items at once.
+    Update callbacks of individual items are suspended inside of it, afterwards the whole list is updated once.
+    Without it, every single assignment to is_selected or is_expanded would update (part of) the list.
+
+    """
+    global _suspend_updates
+    
+    _suspend_updates += 1
+    try:
+        yield
+    finally:
+        _suspend_updates -= 1
+    
+    if not _suspend_updates:
+        update_import_list(None, context)
+
+
+def update_import_list(self, context):
+    """
+    Updates visibility and enabled states of items and the display items for all visible items.
+    Used as update callback of import items, in which case only the subtree of the changed item (self) is updated
+    (see _splice_display_list for what that costs).
+    Pass None as self to update all items instead (requires init_import_list_hierarchy to have been called).
+    
+    """
+    if self is not None and _suspend_updates:
+        # Part of a batch update, which updates everything once it's done
+        return
+
+    # Get global lists
+    import_list = context.window_manager.unitypackage_importer_import_list
+    import_display_list = context.window_manager.unitypackage_importer_import_display_list
+    _filter_cache.clear()
+
+    if self is None:
+        # Rebuild everything
+        import_display_list.clear()
+        for index in _update_item_states(import_list, 0, len(import_list)):
+            display_item = import_display_list.add()
+            display_item.referenced_item_index = index
+        return
+    
+    # Selection and expansion of an item only affect its descendants
+    start, end = self.index + 1, self.subtree_end
+    if end <= start:
+        # No descendants (or the hierarchy isn't initialized yet while the list is being populated)
+        return
+
+    visible_indices = _update_item_states(import_list, start, end)
+    _splice_display_list(import_display_list, start, end, visible_indices)
 
 
 class UNITYPACKAGE_IMPORTER_PG_import_list_item(bpy.types.PropertyGroup):
@@ -88,6 +242,9 @@ class UNITYPACKAGE_IMPORTER_PG_import_list_item(bpy.types.PropertyGroup):
     guid : StringProperty(name="GUID")
     icon : StringProperty(name="Icon", default='NONE')
     indentation : IntProperty(name="Indentation", default=0)
+    index : IntProperty(name="Index", default=0)
+    parent_index : IntProperty(name="Parent Index", default=-1) # -1 for top level items
+    subtree_end : IntProperty(name="Subtree End", default=0) # Index after the last descendant
     is_selected : BoolProperty(name="Selected", default=False, update=update_import_list)
     is_expanded : BoolProperty(name="Expanded", default=False, update=update_import_list)
     is_enabled : BoolProperty(name="Enabled", default=True)
@@ -106,6 +263,51 @@ class UNITYPACKAGE_IMPORTER_PG_import_display_list_item(bpy.types.PropertyGroup)
     referenced_item_index : IntProperty(name="Reference Item Index")
 
 
+def _init_search_index(import_list):
+    """
+    Builds the search index for the current import list, if it wasn't built already.
+
+    """
+    global _search_index, _search_paths, _search_subtree_ends
+    
+    if _search_index is not None:
+        return
+
+    names = [ item.name for item in import_list ]
+    parent_indices = array('i', [0]) * len(import_list)
+    import_list.foreach_get('parent_index', parent_indices)
+    
+    # Full paths of all items, parents always come before their children
+    paths = []
+    for name, parent_index in zip(names, parent_indices):
+        paths.append(f"{paths[parent_index]}/{name}" if parent_index >= 0 else name)
+    
+    _search_index = TrigramIndex(names)
+    _search_paths = [ path.lower() for path in paths ]
+    _search_subtree_ends = [ item.subtree_end for item in import_list ]
+
+
+def _match_paths(query : str) -> bytearray:
+    """
+    Returns a flag for every import item, telling wether its full path contains query (case-insensitive).
+    
+    """
+    if '/' in query:
+        # Can span multiple path segments, check the full paths
+        query = query.lower()
+        return bytearray(query in path for path in _search_paths)
+
+    # Otherwise, a path contains the query if the item's own name or the path of its parent does.
+    # Descendants of an item are the range up to its subtree end, so a matching name matches its whole subtree.
+    matched = bytearray(len(_search_paths))
+    for item_index in _search_index.search(query):
+        if not matched[item_index]:
+            subtree_end = _search_subtree_ends[item_index]
+            matched[item_index:subtree_end] = b'\x01' * (subtree_end - item_index)
+    
+    return matched
+
+
 class UNITYPACKAGE_IMPORTER_UL_import_list(bpy.types.UIList):
     """
     UI List for import items.
@@ -115,11 +317,9 @@ class UNITYPACKAGE_IMPORTER_UL_import_list(bpy.types.UIList):
     layout_type = 'GRID'
     
     def draw_item(self, context, layout, data, display_item, icon, active_data, active_propname, index):
-        # Determine referenced and next item for this display item
+        # Determine referenced item for this display item
         import_list = context.window_manager.unitypackage_importer_import_list
-        item_index = display_item.referenced_item_index
-        item = import_list[item_index]
-        next_item = import_list[item_index + 1] if item_index < len(import_list) - 1 else None
+        item = import_list[display_item.referenced_item_index]
         
         row = layout.row(align=True)
         
@@ -128,19 +328,55 @@ class UNITYPACKAGE_IMPORTER_UL_import_list(bpy.types.UIList):
             row.separator(factor=3)
         
         # Draw expand arrow or empty space
-        if next_item and next_item.indentation > item.indentation:
+        if item.subtree_end > item.index + 1:
             expanded_icon = 'TRIA_DOWN' if item.is_expanded else 'TRIA_RIGHT'
             row.prop(item, "is_expanded", text="", icon=expanded_icon, emboss=False)
         else:
             row.separator(factor=3)
         
-        # Label & Checkbox
-        row.label(text=item.name, icon=item.icon)
+        # Label & Checkbox, with the asset's thumbnail once it's loaded
+        icon_id = _thumbnails.get_icon_id(item.guid) if _thumbnails and item.guid else 0
+        if icon_id:
+            row.label(text=item.name, icon_value=icon_id)
+        else:
+            row.label(text=item.name, icon=item.icon)
         row.prop(item, "is_selected", text="")
         
         # Enabled state
         row.enabled=item.is_enabled
 
+    def filter_items(self, context, data, propname):
+        """
+        Filters display items by the full path of their import item (case-insensitive, '*' matches anything).
+        Folders stay visible if anything within them matches, so matches keep their place in the hierarchy.
+        Results are cached per filter string until the display list changes.
+
+        """
+        if not self.filter_name.strip('*'):
+            return [], []
+        
+        if (flags := _filter_cache.get(self.filter_name)) is not None:
+            return flags, []
+
+        import_list = context.window_manager.unitypackage_importer_import_list
+        _init_search_index(import_list)
+
+        # Items need to contain every part between wildcards
+        matched = None
+        for part in self.filter_name.split('*'):
+            if part:
+                part_matched = _match_paths(part)
+                matched = part_matched if matched is None else bytearray(a & b for a, b in zip(matched, part_matched))
+
+        # An item is shown if it matches, or if anything within its subtree does
+        display_list = getattr(data, propname)
+        referenced_indices = array('i', [0]) * len(display_list)
+        display_list.foreach_get('referenced_item_index', referenced_indices)
+        flags = [ self.bitflag_filter_item if matched.find(1, item_index, _search_subtree_ends[item_index]) >= 0 else 0 for item_index in referenced_indices ]
+        
+        _filter_cache[self.filter_name] = flags
+        return flags, []
+
     def draw_filter(self, context, layout):
         """UI code for the filtering/sorting/search area."""
 
@@ -162,8 +398,9 @@ class UNITYPACKAGE_IMPORTER_OT_select_all(bpy.types.Operator):
     
     def execute(self, context):
         import_list = context.window_manager.unitypackage_importer_import_list
-        for item in import_list:
-            item.is_selected = True
+        with batch_import_list_update(context):
+            for item in import_list:
+                item.is_selected = True
         return { 'FINISHED' }
 
 
@@ -177,11 +414,165 @@ class UNITYPACKAGE_IMPORTER_OT_deselect_all(bpy.types.Operator):
     
     def execute(self, context):
         import_list = context.window_manager.unitypackage_importer_import_list
-        for item in import_list:
-            item.is_selected = False
+        with batch_import_list_update(context):
+            for item in import_list:
+                item.is_selected = False
+        return { 'FINISHED' }
+
+
+def _select_ancestors(import_list, indices : list[int]):
+    """
+    Selects all ancestors of the given items, so they're enabled for import.
+    Every ancestor is only visited once, no matter how many of the items share it.
+
+    """
+    visited = set()
+    for index in indices:
+        parent_index = import_list[index].parent_index
+        while parent_index >= 0 and parent_index not in visited:
+            visited.add(parent_index)
+            parent_item = import_list[parent_index]
+            parent_item.is_selected = True
+            parent_index = parent_item.parent_index
+
+
+# Keeps the strings of the extension enum items alive, Blender doesn't hold references to them
+_extension_enum_items = []
+
+def _get_extension_enum_items(self, context):
+    global _extension_enum_items
+
+    import_list = context.window_manager.unitypackage_importer_import_list
+    extensions = sorted({ os.path.splitext(item.name)[1].lower() for item in import_list if item.guid } - { '' })
+    _extension_enum_items = [ (extension, extension, f"Select all {extension} files") for extension in extensions ]
+    return _extension_enum_items
+
+
+class UNITYPACKAGE_IMPORTER_OT_select_by_extension(bpy.types.Operator):
+    """
+    Operator to select all import items with a file extension, along with the folders containing them.
+    
+    """
+    bl_idname = "unitypackage_importer.select_by_extension"
+    bl_label = "Select by Extension"
+    bl_property = 'extension'
+
+    extension : EnumProperty(name="Extension", items=_get_extension_enum_items)
+    extend : BoolProperty(name="Extend", description="Keep other assets selected", default=False)
+
+    def execute(self, context):
+        if not self.extension:
+            # No files in the list, every name would "end with" the empty string
+            return { 'CANCELLED' }
+
+        import_list = context.window_manager.unitypackage_importer_import_list
+        with batch_import_list_update(context):
+            matching_indices = []
+            for index, item in enumerate(import_list):
+                if not item.guid:
+                    # Folder
+                    continue
+                if item.name.lower().endswith(self.extension):
+                    item.is_selected = True
+                    matching_indices.append(index)
+                elif not self.extend:
+                    item.is_selected = False
+            
+            _select_ancestors(import_list, matching_indices)
         return { 'FINISHED' }
 
 
+class UNITYPACKAGE_IMPORTER_OT_select_subtree(bpy.types.Operator):
+    """
+    Operator to select the active import item with everything within it, along with the folders containing it.
+    
+    """
+    bl_idname = "unitypackage_importer.select_subtree"
+    bl_label = "Select Subtree"
+    
+    def execute(self, context):
+        import_list = context.window_manager.unitypackage_importer_import_list
+        import_display_list = context.window_manager.unitypackage_importer_import_display_list
+        display_index = context.window_manager.unitypackage_importer_import_display_list_index
+        if not 0 <= display_index < len(import_display_list):
+            return { 'CANCELLED' }
+
+        active_item = import_list[import_display_list[display_index].referenced_item_index]
+        with batch_import_list_update(context):
+            for index in range(active_item.index, active_item.subtree_end):
+                import_list[index].is_selected = True
+            
+            _select_ancestors(import_list, [ active_item.index ])
+        return { 'FINISHED' }
+
+
+class UNITYPACKAGE_IMPORTER_OT_invert_selection(bpy.types.Operator):
+    """
+    Operator to invert the selection of all assets. Folders are left as they are.
+    
+    """
+    bl_idname = "unitypackage_importer.invert_selection"
+    bl_label = "Invert"
+    
+    def execute(self, context):
+        import_list = context.window_manager.unitypackage_importer_import_list
+        with batch_import_list_update(context):
+            for item in import_list:
+                if item.guid:
+                    item.is_selected = not item.is_selected
+        return { 'FINISHED' }
+
+
+class UNITYPACKAGE_IMPORTER_OT_select_dependencies(bpy.types.Operator):
+    """
+    Operator to additionally select everything the selected assets need (like the textures of the materials a model uses),
+    along with the folders containing them. The package is scanned for references the first time this is used.
+    
+    """
+    bl_idname = "unitypackage_importer.select_dependencies"
+    bl_label = "Select Dependencies"
+    
+    def execute(self, context):
+        global _dependency_graph
+
+        if not _dialog_parser:
+            return { 'CANCELLED' }
+        if _dependency_graph is None:
+            _dependency_graph = build_dependency_graph(_dialog_parser)
+        
+        import_list = context.window_manager.unitypackage_importer_import_list
+        selected_guids = [ item.guid for item in import_list if all([ item.is_selected, item.is_enabled, item.guid ]) ]
+        dependencies = set(_dependency_graph.get_all_dependencies(selected_guids))
+        with batch_import_list_update(context):
+            matching_indices = []
+            for index, item in enumerate(import_list):
+                if item.guid in dependencies:
+                    item.is_selected = True
+                    matching_indices.append(index)
+            
+            _select_ancestors(import_list, matching_indices)
+        
+        self.report({ 'INFO' }, f"Selected {len(matching_indices)} dependencies.")
+        return { 'FINISHED' }
+
+
+def select_guids(context, guids : list[str]):
+    """
+    Selects exactly the import items with the given GUIDs (and the folders containing them), deselecting everything else.
+
+    """
+    import_list = context.window_manager.unitypackage_importer_import_list
+    guids = set(guids)
+    with batch_import_list_update(context):
+        matching_indices = []
+        for index, item in enumerate(import_list):
+            item.is_selected = item.guid in guids
+            if item.is_selected:
+                matching_indices.append(index)
+        
+        _select_ancestors(import_list, matching_indices)
+
+
 class UNITYPACKAGE_IMPORTER_OT_import_unitypackage(Operator, ImportHelper):
     bl_idname = 'unitypackage_importer.import_unitypackage'
     bl_label = "Import from Unitypackage"
@@ -196,18 +587,34 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage(Operator, ImportHelper):
         name="Mode", description="How to import files from this .unitypackage file",
         items=(
             ('DIRECT', "Direct", "Will directly import individual assets from the file without resolving scenes / prefabs."),
+            ('REIMPORT', "Re-import", "Will update assets imported from an earlier version of this .unitypackage file, loading only added or changed ones."),
             ('RESOLVED', "Resolved (WIP)", "Will resolve scenes and prefabs and import objects used within them while respecting existing relations.")
         ),
         default='DIRECT'
     )
+    downscale_textures : BoolProperty(
+        name="Downscale Textures", description="Reduce the resolution of large textures before loading them (requires the Pillow package)",
+        default=False
+    )
+    max_texture_size : IntProperty(
+        name="Max Texture Size", description="Largest width / height of downscaled textures. 0 uses the Max Size from Unity's import settings of each texture",
+        default=0, min=0, soft_max=8192
+    )
 
     def draw(self, context):
         self.layout.label(text="Import Options")
         self.layout.prop(self, 'import_mode')
+        self.layout.prop(self, 'downscale_textures')
+        row = self.layout.row()
+        row.enabled = self.downscale_textures
+        row.prop(self, 'max_texture_size')
 
     def execute(self, context):
         # Call internal operator to handle import
-        bpy.ops.unitypackage_importer.import_unitypackage_modal('INVOKE_DEFAULT', filepath=self.filepath, import_mode=self.import_mode)
+        bpy.ops.unitypackage_importer.import_unitypackage_modal(
+            'INVOKE_DEFAULT', filepath=self.filepath, import_mode=self.import_mode,
+            downscale_textures=self.downscale_textures, max_texture_size=self.max_texture_size
+        )
         return { 'FINISHED' }
 
 
@@ -219,6 +626,9 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal(Operator):
 
     filepath : StringProperty()
     import_mode : StringProperty()
+    downscale_textures : BoolProperty()
+    max_texture_size : IntProperty()
+    selected_guids : StringProperty() # Comma separated, preselects only these assets if set
 
     def draw(self, context):
         self.layout.label(text="Select assets for import:")
@@ -230,6 +640,11 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal(Operator):
         row = self.layout.row()
         row.operator("unitypackage_importer.select_all")
         row.operator("unitypackage_importer.deselect_all")
+        row.operator("unitypackage_importer.invert_selection")
+        row = self.layout.row()
+        row.operator("unitypackage_importer.select_subtree")
+        row.operator("unitypackage_importer.select_dependencies")
+        row.operator_menu_enum("unitypackage_importer.select_by_extension", 'extension', text="Select by Extension")
 
     def invoke(self, context, event):
         logger.info(f"Initiate import process for '{self.filepath}'...")
@@ -239,7 +654,7 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal(Operator):
         # Initialize parser for file
         self._parser = UnitypackageParser(filepath=self.filepath)
         
-        if self.import_mode == 'DIRECT':
+        if self.import_mode in ('DIRECT', 'REIMPORT'):
             # Direct import mode, just scan for all importable assets within archive
             prepare_direct_import(context, self._parser)
 
@@ -251,16 +666,37 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal(Operator):
             raise KeyError(self.import_mode)
 
         # Determine Initial Import List Item Visibility
+        init_import_list_hierarchy(context)
         update_import_list(None, context)
+        if self.selected_guids:
+            select_guids(context, self.selected_guids.split(','))
+
+        global _thumbnails, _dialog_parser
+        _close_thumbnails()
+        _thumbnails = ThumbnailCache(self._parser)
+        _release_dialog_parser()
+        _dialog_parser = self._parser
 
         # Warp cursor is a hack to make the dialog appear in the center of the window
         context.window.cursor_warp(int(context.window.width / 2), int(context.window.height / 2))
         return context.window_manager.invoke_props_dialog(self, width=600)
 
     def execute(self, context):
-        if self.import_mode == 'DIRECT':
+        global _pending_import_job
+
+        # Thumbnails read from the parser, stop them before it's handed over or closed
+        _close_thumbnails()
+        _release_dialog_parser()
+
+        if self.import_mode in ('DIRECT', 'REIMPORT'):
             # Direct import mode, just scan for all importable assets within archive
-            do_direct_import(context, self._parser)
+            # Runs in time slices in a separate modal operator, which takes over the parser and closes it when done
+            # Re-import mode is the same, except the job skips assets that didn't change since they were imported
+            _pending_import_job = DirectImportJob(
+                context, self._parser, self.downscale_textures, self.max_texture_size, reimport=self.import_mode == 'REIMPORT'
+            )
+            bpy.ops.unitypackage_importer.run_import('INVOKE_DEFAULT')
+            return { 'FINISHED' }
 
         elif self.import_mode == 'RESOLVED':
             # TODO: Resolved import mode, scan through all scenes / prefabs and find assets as they are implemented (keeping relations between them)
@@ -273,6 +709,9 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal(Operator):
         return { 'FINISHED' }
     
     def cancel(self, context):
+        _close_thumbnails()
+        _release_dialog_parser()
+
         # Close parser
         if self._parser:
             self._parser.close()
@@ -281,6 +720,210 @@ class UNITYPACKAGE_IMPORTER_OT_import_unitypackage_modal(Operator):
         self.report({ 'INFO' }, "Import aborted.")
 
 
+class UNITYPACKAGE_IMPORTER_OT_refresh_catalog(Operator):
+    """
+    Operator to add all .unitypackage files within a directory (an asset library) to the catalog,
+    or update them if they changed since they were last cataloged.
+
+    """
+    bl_idname = 'unitypackage_importer.refresh_catalog'
+    bl_label = "Refresh Unitypackage Catalog"
+    bl_description = "Add all .unitypackage files within a directory to the catalog, so assets can be found without opening every package."
+
+    directory : StringProperty(subtype='DIR_PATH')
+    hash_contents : BoolProperty(name="Hash Contents", description="Extract all assets to store content hashes of them as well (slow)", default=False)
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return { 'RUNNING_MODAL' }
+
+    def execute(self, context):
+        # Index packages in worker processes and store the results on a timer, so Blender stays responsive
+        self._catalog = Catalog()
+        try:
+            self._job = CatalogRefreshJob.for_directory(self._catalog, self.directory, catalog_refresh_workers, self.hash_contents)
+        except Exception:
+            self._catalog.close()
+            raise
+
+        context.window_manager.progress_begin(0, max(self._job.total, 1))
+        self._timer = context.window_manager.event_timer_add(0.01, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return { 'RUNNING_MODAL' }
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            # Packages stored so far stay in the catalog
+            self._finish(context)
+            self.report({ 'INFO' }, f"Catalog refresh cancelled after {self._job.stats['indexed']} indexed package(s).")
+            return { 'CANCELLED' }
+        
+        if event.type != 'TIMER':
+            return { 'PASS_THROUGH' }
+
+        try:
+            has_more = self._job.step(import_time_slice)
+        except Exception:
+            self._finish(context)
+            raise
+
+        context.window_manager.progress_update(self._job.done)
+        context.workspace.status_text_set(f"Refreshing Unitypackage catalog: {self._job.done} / {self._job.total} (Esc to cancel)")
+        
+        if has_more:
+            return { 'RUNNING_MODAL' }
+
+        self._finish(context)
+        stats = self._job.stats
+        self.report({ 'INFO' }, f"Catalog refreshed: {stats['indexed']} indexed, {stats['unchanged']} unchanged, {stats['removed']} removed, {stats['failed']} failed.")
+        return { 'FINISHED' }
+
+    def _finish(self, context):
+        global _catalog_query_cache
+
+        self._job.close()
+        self._catalog.close()
+        _catalog_query_cache = {}
+
+        context.window_manager.event_timer_remove(self._timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+
+
+# Catalog query results per (name pattern, extension), valid until the catalog is refreshed
+_catalog_query_cache : dict[tuple[str, str], dict[str, list[str]]] = {}
+
+# Keeps the strings of the package enum items alive, Blender doesn't hold references to them
+_package_enum_items = []
+
+def _query_catalog(name_pattern : str, extension : str) -> dict[str, list[str]]:
+    """
+    Returns the GUIDs of all cataloged assets matching the name pattern and extension, by package.
+
+    """
+    key = (name_pattern, extension)
+    if (result := _catalog_query_cache.get(key)) is None:
+        result = {}
+        with Catalog() as catalog:
+            for entry in catalog.query(name=name_pattern or None, extensions=[ extension ] if extension else None):
+                result.setdefault(entry.package_path, []).append(entry.guid)
+        _catalog_query_cache[key] = result
+    return result
+
+
+def _get_package_enum_items(self, context):
+    global _package_enum_items
+
+    matches = _query_catalog(self.name_pattern, self.extension)
+    _package_enum_items = [ (path, os.path.basename(path), f"{len(guids)} matching assets in {path}") for path, guids in matches.items() ]
+    return _package_enum_items
+
+
+class UNITYPACKAGE_IMPORTER_OT_import_from_catalog(Operator):
+    """
+    Operator to find assets in all cataloged packages (like all .fbx files named *Awtter*),
+    and open the package containing them with only the matching assets selected.
+
+    """
+    bl_idname = 'unitypackage_importer.import_from_catalog'
+    bl_label = "Import from Unitypackage Catalog"
+    bl_description = "Find assets in all cataloged .unitypackage files and import them from the package containing them."
+
+    name_pattern : StringProperty(name="Name", description="Pattern for the file name, ignoring case, like '*Awtter*'", default='*')
+    extension : StringProperty(name="Extension", description="File extension, ignoring case, like '.fbx' (empty for all)", default='')
+    package : EnumProperty(name="Package", items=_get_package_enum_items)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self, width=600)
+
+    def draw(self, context):
+        self.layout.prop(self, 'name_pattern')
+        self.layout.prop(self, 'extension')
+        matches = _query_catalog(self.name_pattern, self.extension)
+        if matches:
+            self.layout.prop(self, 'package')
+        else:
+            self.layout.label(text="No matching assets in the catalog.")
+
+    def execute(self, context):
+        guids = _query_catalog(self.name_pattern, self.extension).get(self.package)
+        if not guids:
+            self.report({ 'ERROR' }, "No matching assets in the catalog!")
+            return { 'CANCELLED' }
+        
+        bpy.ops.unitypackage_importer.import_unitypackage_modal('INVOKE_DEFAULT', filepath=self.package, import_mode='DIRECT', selected_guids=','.join(guids))
+        return { 'FINISHED' }
+
+
+class UNITYPACKAGE_IMPORTER_OT_run_import(Operator):
+    """
+    Internal modal operator that runs an import job in small time slices on a timer,
+    so Blender stays responsive and shows progress while importing. Can be cancelled with Esc,
+    which removes everything imported so far.
+
+    """
+    bl_idname = 'unitypackage_importer.run_import'
+    bl_label = "Importing from Unitypackage"
+    bl_options = { 'INTERNAL' }
+
+    def invoke(self, context, event):
+        global _pending_import_job
+
+        if not _pending_import_job:
+            self.report({ 'ERROR' }, "No import to run!")
+            return { 'CANCELLED' }
+        
+        self._job = _pending_import_job
+        _pending_import_job = None
+
+        context.window_manager.progress_begin(0, max(self._job.total, 1))
+        self._timer = context.window_manager.event_timer_add(0.001, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return { 'RUNNING_MODAL' }
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._job.rollback()
+            self._finish(context)
+            self.report({ 'INFO' }, "Import cancelled.")
+            return { 'CANCELLED' }
+        
+        if event.type != 'TIMER':
+            # Block all other input while importing
+            return { 'RUNNING_MODAL' }
+
+        try:
+            has_more = self._job.step(import_time_slice)
+        except Exception:
+            self._job.rollback()
+            self._finish(context)
+            raise
+
+        # Update progress indicator
+        context.window_manager.progress_update(self._job.done)
+        eta = self._job.get_eta()
+        eta_text = f", about {eta:.0f}s remaining" if eta is not None else ""
+        context.workspace.status_text_set(f"Importing from Unitypackage: {self._job.done} / {self._job.total}{eta_text} (Esc to cancel)")
+        
+        if has_more:
+            return { 'RUNNING_MODAL' }
+
+        self._job.close()
+        self._finish(context)
+        self.report({ 'INFO' }, self._job.get_summary())
+        return { 'FINISHED' }
+
+    def _finish(self, context):
+        context.window_manager.event_timer_remove(self._timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+
+        if profiling.is_enabled():
+            # Keep a trace of the whole import (including indexing) to attach to reports of slow imports
+            profiling.export_chrome_trace(os.path.join(bpy.app.tempdir, f"unitypackage_import_{time.strftime('%Y%m%d_%H%M%S')}.trace.json"))
+            profiling.reset()
+
+
 def add_test_items(context):
     import_list = context.window_manager.unitypackage_importer_import_list
     import_list.clear()
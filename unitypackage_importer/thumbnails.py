@@ -0,0 +1,218 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# ##### END GPL LICENSE BLOCK #####
+import os
+import bpy
+import bpy.utils.previews
+import shutil
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Union
+from .config import log_level, thumbnail_cache_max_count
+from .modules.unitypackage_parser import UnitypackageParser
+from .modules import profiling
+
+
+logger = logging.getLogger("Thumbnails")
+logger.setLevel(log_level)
+
+
+# Interval (in seconds) in which extracted thumbnails are handed over to Blender while some are still loading
+_APPLY_INTERVAL = 0.1
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _tag_redraw():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            area.tag_redraw()
+
+
+class ThumbnailCache():
+    """
+    Thumbnails of asset entries for the import list, loaded from their preview.png members the first time they're drawn,
+    so only rows that are actually visible ever cost anything. Nothing but the (tiny) preview members is extracted.
+
+    Members are extracted (in archive order) into temporary files on a background thread. A timer on the main thread,
+    the only one allowed to touch bpy, loads those files into a bpy.utils.previews collection and tags the UI for redraw.
+    Blender decodes the images itself (in its own preview jobs, without holding Python's GIL), so the main thread
+    only ever does a cheap load call per thumbnail. The files have to stay around as long as their previews do.
+    At most max_count thumbnails stay loaded, the least recently drawn ones are released first.
+    Has to be closed before its parser is.
+
+    """
+    max_count : int
+
+    def __init__(self, parser : UnitypackageParser, max_count : int = thumbnail_cache_max_count):
+        self._parser = parser
+        self.max_count = max_count
+        self._previews = bpy.utils.previews.new()
+        self._temp_dir = tempfile.mkdtemp(prefix='unitypackage_thumbnails_', dir=bpy.app.tempdir)
+        self._icon_ids = OrderedDict() # { guid: icon_id }, least recently drawn first
+        self._requested = set() # GUIDs that are being loaded
+        self._unavailable = set() # GUIDs without a (readable) thumbnail
+        
+        # Shared with the background thread
+        self._pending = [] # GUIDs to load
+        self._extracted = [] # (guid, filepath), filepath being None if there's no usable thumbnail
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self._timer = None # Bound methods are new objects on every access, keep the registered one to unregister it
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def get_icon_id(self, guid : str) -> int:
+        """
+        Returns the icon id of the thumbnail of an asset entry, to be drawn with icon_value in UI layouts.
+        Returns 0 if the asset entry doesn't have a thumbnail, or if it isn't loaded yet (loading starts in the background then).
+
+        """
+        icon_id = self._icon_ids.get(guid)
+        if icon_id is not None:
+            self._icon_ids.move_to_end(guid)
+            return icon_id
+        
+        if self._closed or guid in self._requested or guid in self._unavailable:
+            return 0
+        
+        try:
+            has_preview = self._parser.get_asset_entry_by_guid(guid).has_keys('preview')
+        except KeyError:
+            has_preview = False
+        if not has_preview:
+            self._unavailable.add(guid)
+            return 0
+        
+        self._requested.add(guid)
+        with self._condition:
+            self._pending.append(guid)
+            self._condition.notify()
+        
+        if not self._thread:
+            self._thread = threading.Thread(target=self._run, name="ThumbnailLoader", daemon=True)
+            self._thread.start()
+        if not self._timer:
+            self._timer = self._apply_extracted
+            bpy.app.timers.register(self._timer, first_interval=_APPLY_INTERVAL)
+        return 0
+
+    def _run(self):
+        """
+        Background thread extracting requested thumbnails into temporary files, until the cache is closed.
+
+        """
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                guids = self._pending
+                self._pending = []
+            
+            try:
+                # Everything requested since the last batch at once, in archive order (see UnitypackageParser.iter_assets)
+                for asset_entry, data in self._parser.iter_assets(guids, 'preview'):
+                    if self._closed:
+                        return
+                    
+                    filepath = None
+                    if data.startswith(PNG_SIGNATURE):
+                        filepath = os.path.join(self._temp_dir, f"{asset_entry.guid}.png")
+                        try:
+                            with profiling.span('thumbnail.write', 'thumbnail'), open(filepath, 'wb') as f:
+                                f.write(data)
+                        except OSError as e:
+                            logger.debug(f"Couldn't write thumbnail of '{asset_entry.pathname}': {e}")
+                            filepath = None
+                    else:
+                        logger.debug(f"Thumbnail of '{asset_entry.pathname}' isn't a PNG image.")
+                    
+                    with self._condition:
+                        self._extracted.append((asset_entry.guid, filepath))
+
+            except Exception as e:
+                # Most likely the parser was closed underneath us
+                logger.warning(f"Stopped loading thumbnails: {e}")
+                return
+
+    def _apply_extracted(self) -> Union[float, None]:
+        """
+        Timer function (see bpy.app.timers) loading previews for everything extracted so far.
+        Keeps running until all requested thumbnails are done.
+
+        """
+        with self._condition:
+            extracted = self._extracted
+            self._extracted = []
+        
+        for guid, filepath in extracted:
+            self._requested.discard(guid)
+            if filepath is None:
+                self._unavailable.add(guid)
+                continue
+
+            preview = self._previews.load(guid, filepath, 'IMAGE')
+            self._icon_ids[guid] = preview.icon_id
+            while len(self._icon_ids) > self.max_count:
+                evicted_guid, _ = self._icon_ids.popitem(last=False)
+                del self._previews[evicted_guid]
+                self._remove_file(evicted_guid)
+        
+        if extracted:
+            _tag_redraw()
+        
+        if self._requested and not self._closed:
+            return _APPLY_INTERVAL
+        
+        self._timer = None
+        return None
+
+    def close(self):
+        """
+        Stops the background thread and releases all thumbnails, along with their temporary files.
+
+        """
+        if self._closed:
+            return
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+        
+        if self._timer and bpy.app.timers.is_registered(self._timer):
+            bpy.app.timers.unregister(self._timer)
+        self._timer = None
+        
+        bpy.utils.previews.remove(self._previews)
+        self._icon_ids.clear()
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+    def _remove_file(self, guid : str):
+        try:
+            os.remove(os.path.join(self._temp_dir, f"{guid}.png"))
+        except OSError as e:
+            logger.debug(f"Couldn't remove thumbnail file of '{guid}': {e}")